@@ -1,22 +1,57 @@
 # -*- coding: utf-8 -*-
 
 import time
+import threading
 import os
 import numpy as np
 import matplotlib.pyplot as plt
-import pyvisa as visa
-import clr
 import random
+import tempfile
+import json
+
+from scope_waveform import (
+    ScopeLink, Waveform, round_trips_since, window_preamble, window_range,
+)
+from scpi_metrics import InstrumentedResource, ScpiMetrics
+from shot_stats import ShotTarget, integral_noise, shot_integrals, summarize_shots
+from sweep_pipeline import SweepPipeline
+from adaptive_sweep import AdaptiveAngles, run_adaptive
+from polar_fit import PolarFit, interleaved
+from run_store import RunStore, export_csv
+from live_view import LiveView
+from elliptec_motion import (
+    PULSES_PER_REV, SettleRecord, home_command, home_concurrently, move_command,
+    move_concurrently, wait_for_position
+)
+
+# SHG_SIMULATE=1 runs the sweep against sim_instruments: no scope, no
+# Elliptec DLL, any OS
+SIMULATE = os.environ.get("SHG_SIMULATE") == "1"
+if SIMULATE:
+    from sim_instruments import SimElliptecDll, SimResourceManager
+else:
+    import pyvisa as visa
+    import clr
 
 # ============================================================
 # Oscilloscope Class (Keysight EXR)
 # ============================================================
 
 class Oscilloscope:
-    def __init__(self, resource):
-        self.rm = visa.ResourceManager()
-        self.scope = self.rm.open_resource(resource)
+    def __init__(self, resource, metrics=None):
+        self.rm = SimResourceManager() if SIMULATE else visa.ResourceManager()
+        link = self.rm.open_resource(resource)
+        if metrics is not None:
+            # opt-in per-command latency/throughput recording
+            link = InstrumentedResource(link, metrics)
+        self.scope = ScopeLink(link)
         self.scope.timeout = 60000
+        self.last_round_trips = None
+        self.segments = None
+        self.window = None
+        self.area_gate = None
+        self.baseline_gate = None
+        self.gate = None
         self.initialize()
 
     def initialize(self):
@@ -44,36 +79,149 @@ class Oscilloscope:
         self.scope.query("*OPC?")
         print("Averaging enabled.")
 
+    def set_segmented(self, count=256):
+        """Keep every trigger: capture count segments per arm instead of averaging."""
+        print(f"Setting segmented memory to {count} segments...")
+        self.scope.write(":ACQuire:AVERage OFF")
+        self.scope.write(":ACQuire:MODE SEGMented")
+        self.scope.write(f":ACQuire:SEGMented:COUNt {count}")
+        self.scope.write(":WAVeform:SEGMented:ALL ON")
+        self.scope.query("*OPC?")
+        self.segments = count
+        print("Segmented memory enabled.")
+
     def trigger_single_blocking(self):
         self.scope.write(":SINGle")
         self.scope.query("*OPC?")
 
-    def acquire_waveform_binary(self, channel):
-        """Acquire waveform using 16-bit signed format for full resolution."""
-        self.scope.write(f":WAVeform:SOURce CHAN{channel}")
-        self.scope.write(":WAVeform:FORMat WORD")
-        self.scope.write(":WAVeform:UNSigned 0")
-        self.scope.write(":WAVeform:POINts:MODE RAW")
-        self.scope.write(":WAVeform:POINts MAX")
-
-        # Scaling parameters
-        yinc = float(self.scope.query(":WAVeform:YINCrement?"))
-        yorg = float(self.scope.query(":WAVeform:YORigin?"))
-        yref = float(self.scope.query(":WAVeform:YREFerence?"))
-        xinc = float(self.scope.query(":WAVeform:XINCrement?"))
-        xorg = float(self.scope.query(":WAVeform:XORigin?"))
+    def set_window(self, t_start=None, t_stop=None):
+        """Transfer only t_start..t_stop (s) of each record; None for all."""
+        self.window = None if t_start is None else (t_start, t_stop)
+
+    def _fetch(self, channel):
+        self.scope.ensure_source(channel)
+        pre = self.scope.preamble(channel)
+
+        command = ":WAVeform:DATA?"
+        if self.window is not None:
+            # start,size of the part of the record to send; points count from 1
+            first, size = window_range(pre, *self.window)
+            command = f":WAVeform:DATA? {first + 1},{size}"
+            pre = window_preamble(pre, first, size)
 
         raw = self.scope.query_binary_values(
-            ":WAVeform:DATA?",
+            command,
             datatype='h',      # signed 16-bit
             is_big_endian=True,
             container=np.array
         )
+        return pre, raw
 
-        voltage = (raw - yref) * yinc + yorg
-        time_axis = xorg + np.arange(len(voltage)) * xinc
+    def acquire_waveform_binary(self, channel):
+        """Acquire waveform using 16-bit signed format for full resolution.
+
+        The format block and the preamble are only sent/queried when the
+        cached setup no longer matches, so a steady sweep costs one data query
+        per shot. The per-call counts end up in self.last_round_trips.
+        """
+        before = self.scope.counters()
+        wf = self.fetch_raw([channel])
+        self.last_round_trips = round_trips_since(self.scope, before)
+        return wf.time_axis(), wf.volts(0)
+
+    def digitize(self, channels):
+        """Single blocking acquisition of a channel subset."""
+        sources = ",".join(f"CHANnel{ch}" for ch in channels)
+        self.scope.write(f":DIGitize {sources}")
+        self.scope.query("*OPC?")
 
-        return time_axis, voltage
+    def fetch_raw(self, channels):
+        """Transfer the last acquisition of several channels back-to-back.
+
+        Returns a Waveform holding the (len(channels), samples) raw codes and
+        one preamble per channel; nothing is converted to volts here.
+        """
+        self.scope.ensure_format("WORD", unsigned=False)
+        fetched = [self._fetch(ch) for ch in channels]
+        return Waveform(np.vstack([raw for _, raw in fetched]),
+                        [pre for pre, _ in fetched])
+
+    def acquire_channels(self, channels):
+        """Digitize several channels in one acquisition and fetch them all.
+
+        Returns one time axis and a (len(channels), samples) float32 array.
+        """
+        before = self.scope.counters()
+        self.digitize(channels)
+        wf = self.fetch_raw(channels)
+        self.last_round_trips = round_trips_since(self.scope, before)
+        return wf.time_axis(), wf.volts()
+
+    def acquire_segments(self, channel):
+        """Arm once, capture self.segments triggers and fetch them in one block.
+
+        Returns the time axis of a single segment and a (segments, samples)
+        voltage array for host-side averaging and shot statistics.
+        """
+        if not self.segments:
+            raise RuntimeError("Call set_segmented() before acquire_segments()")
+
+        before = self.scope.counters()
+        self.digitize([channel])
+        wf = self.fetch_segments(channel)
+        self.last_round_trips = round_trips_since(self.scope, before)
+        return wf.time_axis(), wf.volts()
+
+    def fetch_segments(self, channel):
+        """Transfer every segment of the last acquisition in one block.
+
+        Returns a Waveform of (segments, samples) raw codes.
+        """
+        if self.window is not None:
+            raise RuntimeError("Windowed transfers need a single record; "
+                               "use set_window(None) with segmented memory")
+        return self.fetch_raw([channel]).segments(self.segments)
+
+    def set_area_gate(self, t_start, t_stop, baseline=None):
+        """Gate scope measurements to t_start..t_stop (s).
+
+        baseline is a pre-pulse (t_start, t_stop) window; read_area then
+        subtracts its mean voltage times the gate width.
+        """
+        self.area_gate = (t_start, t_stop)
+        self.baseline_gate = baseline
+        self.scope.write(":MEASure:GATing ON")
+        self._set_gate(t_start, t_stop)
+
+    def _set_gate(self, t_start, t_stop):
+        # keep start <= stop at every step when the gate moves later
+        if self.gate is not None and t_start > self.gate[1]:
+            self.scope.write(f":MEASure:GATing:STOP {t_stop:E}")
+            self.scope.write(f":MEASure:GATing:STARt {t_start:E}")
+        else:
+            self.scope.write(f":MEASure:GATing:STARt {t_start:E}")
+            self.scope.write(f":MEASure:GATing:STOP {t_stop:E}")
+        self.gate = (t_start, t_stop)
+
+    def _measure(self, query):
+        value = float(self.scope.query(query))
+        # the scope reports 9.99999E+37 when it cannot measure
+        return np.nan if abs(value) > 1e37 else value
+
+    def read_area(self, channel):
+        """Scope-computed area (V·s) of the last acquisition inside the gate.
+
+        Nothing is downloaded.  With a baseline window the offset is the
+        gated average voltage there; without one the area is taken from 0 V.
+        NaN if the scope could not measure.
+        """
+        offset = 0.0
+        if self.baseline_gate is not None:
+            self._set_gate(*self.baseline_gate)
+            offset = self._measure(f":MEASure:VAVerage? DISPlay,CHANnel{channel}")
+            self._set_gate(*self.area_gate)
+        area = self._measure(f":MEASure:AREA? DISPlay,CHANnel{channel}")
+        return area - offset * (self.area_gate[1] - self.area_gate[0])
 
     def set_channel_input_impedance(self, channel, impedance):
         if impedance in [50, '50']:
@@ -99,16 +247,29 @@ class Oscilloscope:
 # Elliptec Motor Control
 # ============================================================
 
-clr.AddReference(r"C:\Program Files\Thorlabs\Elliptec\Thorlabs.Elliptec.ELLO_DLL.dll")
-from Thorlabs.Elliptec.ELLO_DLL import *
-clr.AddReference("System")
-from System import Decimal as NetDecimal
+if SIMULATE:
+    _dll = SimElliptecDll(n_motors=3)
+    ELLDevicePort, ELLDevices = _dll.ELLDevicePort, _dll.ELLDevices
+    ELLBaseDevice, NetDecimal = _dll.ELLBaseDevice, _dll.NetDecimal
+else:
+    clr.AddReference(r"C:\Program Files\Thorlabs\Elliptec\Thorlabs.Elliptec.ELLO_DLL.dll")
+    from Thorlabs.Elliptec.ELLO_DLL import *
+    clr.AddReference("System")
+    from System import Decimal as NetDecimal
 
 class ElliptecController:
     def __init__(self, comport="COM4"):
         self.comport = comport
         self.devices = ELLDevices()
         self.motors = {}
+        self.tolerance = 0.1        # deg
+        self.move_timeout = 10.0    # s
+        self.home_timeout = 20.0    # s
+        self.settle_log = []
+        self.pulses_per_rev = PULSES_PER_REV
+        # every mount talks over the one ELLDevicePort; a DLL call blocks
+        # until its reply, so only one call may be on the bus at a time
+        self.bus_lock = threading.Lock()
 
     def connect(self):
         print("Connecting to Elliptec...")
@@ -126,9 +287,53 @@ class ElliptecController:
         if not self.motors:
             raise RuntimeError("No motors detected.")
 
-    def move_motor_absolute(self, motor, angle_deg):
-        motor.MoveAbsolute(NetDecimal.Parse(str(angle_deg)))
-        
+    def _address_of(self, motor):
+        for addr, m in self.motors.items():
+            if m is motor:
+                return addr
+        return None
+
+    def read_position(self, motor):
+        with self.bus_lock:
+            motor.GetPosition()
+            return float(str(motor.Position))
+
+    def wait_settled(self, motor, angle_deg, timeout=None):
+        """Block until motor reports angle_deg; returns the settle time in s."""
+        position, seconds = wait_for_position(
+            lambda: self.read_position(motor), angle_deg,
+            tolerance=self.tolerance,
+            timeout=self.move_timeout if timeout is None else timeout,
+        )
+        self.settle_log.append(
+            SettleRecord(self._address_of(motor), angle_deg, position, seconds)
+        )
+        return seconds
+
+    def send_command(self, command):
+        """Write a raw command to the bus without waiting for its reply.
+
+        The mount answers with its position once the move is done; polling
+        with GetPosition reads the position either way.
+        """
+        with self.bus_lock:
+            ELLDevicePort.SendString(command)
+
+    def home_motor(self, motor, wait=True):
+        if not wait:
+            # the DLL's Home only returns once the mount is home
+            return self.send_command(home_command(self._address_of(motor)))
+        with self.bus_lock:
+            motor.Home(ELLBaseDevice.DeviceDirection.AntiClockwise)
+        return self.wait_settled(motor, 0.0, timeout=self.home_timeout)
+
+    def move_motor_absolute(self, motor, angle_deg, wait=True):
+        if not wait:
+            return self.send_command(move_command(self._address_of(motor), angle_deg,
+                                                  self.pulses_per_rev))
+        with self.bus_lock:
+            motor.MoveAbsolute(NetDecimal.Parse(str(angle_deg)))
+        return self.wait_settled(motor, angle_deg)
 
 # ============================================================
 # MAIN SCRIPT
@@ -136,32 +341,72 @@ class ElliptecController:
 
 if __name__ == "__main__":
 
-    plt.ion()
-    fig, ax = plt.subplots()
-    scatter = ax.scatter([], [])
-    ax.set_xlabel("Time (s)")
-    ax.set_ylabel("Voltage (V)")
-    ax.set_title("Live Waveform (Scatter)")
+    # --------------------------------------------------------
+    # Acquisition settings (checked before anything is connected)
+    # --------------------------------------------------------
+    # On-scope averaging only returns the mean; segmented memory keeps all
+    # n_shots triggers so they can be averaged and screened on the host.
+    # Segmented runs record channel 8 only (no ch7 reference) and export
+    # shot std + mean as *_shots.csv instead of reference + signal.
+    n_shots = 256
+    use_segmented = False
+    # Adaptive averaging (segmented only): a point gets batches of
+    # batch_shots until the SEM of its integral is below sem_target (fraction
+    # of the mean), within min_shots..max_shots.  Near the nodes the SEM only
+    # has to reach the baseline noise of min_shots shots.
+    adaptive_averaging = False
+    sem_target = 0.01
+    min_shots, max_shots = 128, 4096
+    batch_shots = 64
+    # What comes back per point: the "full" record, only the "window" around
+    # the pulse, or only the scope's "area" over that window (no download).
+    # The last two average on the scope.
+    transfer = "full"
+    pulse_window = (10E-9, 40E-9)
+    baseline_window = (0, 8E-9)     # pre-pulse, for the "area" offset
+    if transfer != "full":
+        use_segmented = False
+    if adaptive_averaging and not use_segmented:
+        raise ValueError("adaptive_averaging needs use_segmented = True "
+                         "and transfer = \"full\"")
+    if adaptive_averaging:
+        n_shots = batch_shots
+
+    # live plot in its own process; the sweep only hands frames over
+    view = LiveView(xlabel="Time (s)", ylabel="Voltage (V)",
+                    xlim=(0, 80E-9), ylim=(0, 0.5)).start()
 
     # --------------------------------------------------------
     # Create output folder
     # --------------------------------------------------------
     timestamp = time.strftime("%Y%m%d_%H%M%S")
     output_folder = rf"C:\Users\colin\Documents\Polarization_Measurements\Run_{timestamp}"
+    if SIMULATE:
+        output_folder = os.path.join(tempfile.gettempdir(),
+                                     "Polarization_Measurements", f"Run_{timestamp}")
     os.makedirs(output_folder, exist_ok=True)
     print(f"Saving data to:\n{output_folder}")
 
     # --------------------------------------------------------
     # Connect Oscilloscope
     # --------------------------------------------------------
-    scope = Oscilloscope("TCPIP0::192.168.8.225::hislip0::INSTR")
+    # SHG_SCPI_METRICS=1 records the latency of every SCPI command
+    scpi_metrics = ScpiMetrics() if os.environ.get("SHG_SCPI_METRICS") == "1" else None
+    scope = Oscilloscope("TCPIP0::192.168.8.225::hislip0::INSTR", metrics=scpi_metrics)
     scope.invert_channel(8, "ON")
     scope.disable_channel(1)
     scope.enable_channel(7)
     scope.enable_channel(8)
     scope.set_trigger_channel(7)
     scope.set_trigger_level(7, 0.4)
-    scope.set_averaging(256)
+    if use_segmented:
+        scope.set_segmented(n_shots)
+    else:
+        scope.set_averaging(n_shots)
+    if transfer == "window":
+        scope.set_window(*pulse_window)
+    elif transfer == "area":
+        scope.set_area_gate(*pulse_window, baseline=baseline_window)
     scope.set_channel_input_impedance(7, 50)
     scope.set_channel_input_impedance(8, 50)
 
@@ -178,9 +423,7 @@ if __name__ == "__main__":
     motor_B = elliptec.motors["2"]
 
     print("Homing motors...")
-    motor_A.Home(ELLBaseDevice.DeviceDirection.AntiClockwise)
-    motor_B.Home(ELLBaseDevice.DeviceDirection.AntiClockwise)
-    time.sleep(5)
+    home_concurrently([(elliptec, motor_A), (elliptec, motor_B)])
 
     # --------------------------------------------------------
     # Fixed Motor Angles
@@ -191,48 +434,196 @@ if __name__ == "__main__":
     fixed_angle_B = 110
     fixed_angle_A = 65
     print(f"Setting Motor B to fixed angle: {fixed_angle_B}°")
-    elliptec.move_motor_absolute(motor_B, fixed_angle_B)
-    elliptec.move_motor_absolute(motor_C, fixed_angle_C)
-    elliptec.move_motor_absolute(motor_A, fixed_angle_A)
-    time.sleep(2.5)
+    move_concurrently([
+        (elliptec, motor_B, fixed_angle_B),
+        (elliptec, motor_C, fixed_angle_C),
+        (elliptec, motor_A, fixed_angle_A),
+    ])
 
     # --------------------------------------------------------
     # Measurement Angles (Motor A)
     # --------------------------------------------------------
     angles_A = np.arange(0, 180, 5)
 
+    # Adaptive mode ignores angles_A: it starts on a coarse grid and adds
+    # angles where the integrated signal bends most, until intervals are
+    # down to the resolution or the point budget is spent.
+    adaptive = False
+    sampler = AdaptiveAngles(0, 180, coarse_step=30, resolution=2.5, budget=72)
+
+    # A + B cos^2(n*A + phi) is refitted after every angle.  With early_stop
+    # the angles go in interleaved order and the sweep ends once every
+    # parameter error is within tolerance (A, B relative to B; phi in deg).
+    fit = PolarFit(n=3, tolerance={"A": 0.02, "B": 0.02, "phi": 1.0})
+    early_stop = False
+    if early_stop and not adaptive:
+        angles_A = interleaved(angles_A)
+
     # --------------------------------------------------------
     # Acquisition Loop
     # --------------------------------------------------------
-    for angA in angles_A:
-        elliptec.move_motor_absolute(motor_A, angA)
-        time.sleep(1.5)
-
-        scope.trigger_single_blocking()
-        t, v = scope.acquire_waveform_binary(8)  # channel 8
+    # Pipelined: motor A heads to the next angle as soon as the scope has
+    # triggered; transfer overlaps the move and save/reduce run on workers.
+    channels = [8] if use_segmented else [7, 8]
+
+    # Raw ADC codes, scaling and angles of every point go to one run store;
+    # the per-angle CSVs are exported from it once the sweep is done.
+    store = RunStore(
+        output_folder,
+        labels=["Voltage (V)"] if use_segmented else ["Reference (V)", "Voltage (V)"],
+        kind="segments" if use_segmented else "channels",
+        attrs={"fixed_angle_B": fixed_angle_B, "fixed_angle_C": fixed_angle_C,
+               "n_shots": n_shots,
+               "adaptive_averaging": adaptive_averaging,
+               "sem_target": sem_target},
+    )
+
+    def move_A(angA):
+        settle = elliptec.move_motor_absolute(motor_A, angA)
+        print(f"A={angA}°: settled in {settle:.2f} s")
+
+    batches = []
+    skipped = []                # area mode: angles the scope gave no area for
+
+    def trigger_until_sem():
+        # the batches are transferred here, not during the next move: whether
+        # another batch is needed depends on the data
+        target = ShotTarget(sem_target, min_shots, max_shots, relative=True)
+        batches.clear()
+        while not target.done():
+            scope.digitize(channels)
+            wf = scope.fetch_segments(8)
+            shots, dt = wf.volts(), wf.preambles[0].xinc
+            if not batches:
+                target.floor = integral_noise(shots, dt) / np.sqrt(min_shots)
+            target.add(shot_integrals(shots, dt))
+            batches.append(wf)
+        print(f"{target.count} shots, integral {target.mean:.4g} V*s "
+              f"+/- {target.sem:.2g}")
+
+    def fetch():
+        if transfer == "area":
+            return scope.read_area(8)
+        if adaptive_averaging:
+            return Waveform(np.vstack([b.raw for b in batches]), batches[0].preambles)
+        if use_segmented:
+            # all shots of this angle came from one arm
+            return scope.fetch_segments(8)
+        return scope.fetch_raw(channels)
+
+    def save(angA, wf):
+        if transfer == "area":
+            return wf       # no waveform; the areas are written at the end
+        if adaptive_averaging:
+            # one record per batch so every record has the run's shape
+            for k in range(0, len(wf.raw), n_shots):
+                store.append(Waveform(wf.raw[k:k + n_shots], wf.preambles),
+                             A=angA, B=fixed_angle_B, C=fixed_angle_C,
+                             batch=k // n_shots)
+            return wf
+        store.append(wf, A=angA, B=fixed_angle_B, C=fixed_angle_C)
+        return wf
+
+    def reduce(angA, wf):
+        if transfer == "area":
+            if np.isnan(wf):
+                # kept out of the fit and areas.csv
+                print(f"A={angA}°: the scope could not measure the area, skipped")
+                skipped.append(angA)
+                return None, None, wf
+            print(f"A={angA}°: area {wf:.4e} V·s")
+            fit.add(angA, wf)
+            return None, None, wf
+
+        # raw codes are only converted here, in float32
+        sigma = None
+        t = wf.time_axis()
+        if use_segmented:
+            shots = wf.volts()
+            stats = summarize_shots(shots)
+            v = stats.mean
+            print(f"A={angA}°: kept {stats.kept.sum()}/{len(wf.raw)} shots")
+            # shot-to-shot scatter of the integral weights the fit
+            kept = shot_integrals(shots[stats.kept], t[1] - t[0])
+            if len(kept) > 1:
+                sigma = kept.std(ddof=1) / np.sqrt(len(kept))
+        else:
+            v = wf.volts(-1)
 
         # baseline removal
         baseline = np.mean(v[:50])
-        v -= baseline
-
-        # Save waveform
-        filename = f"B_{fixed_angle_B}_A_{angA}.csv"
-        filepath = os.path.join(output_folder, filename)
-        np.savetxt(filepath, np.column_stack((t, v)), delimiter=",",
-                   header="Time (s), Voltage (V)", comments="")
-
-        # Update live scatter plot
-        scatter.set_offsets(np.column_stack((t, v)))
-        plt.xlim(0,80E-9)
-        plt.ylim(0,0.5)
-        ax.set_title(f"B={fixed_angle_B}°, A={angA}°")
-        fig.canvas.draw()
-        fig.canvas.flush_events()
-        plt.pause(0.01)
+        v = v - baseline
+
+        view.publish(t, v, f"B={fixed_angle_B}°, A={angA}°")
+
+        integral = np.trapezoid(v, t)
+        fit.add(angA, integral, sigma)
+        fitted = fit.parameters()
+        if fitted is not None:
+            values, errors = fitted
+            print(f"A={angA}°: fit " + ", ".join(
+                f"{k}={values[k]:.4g}±{errors[k]:.2g}" for k in values))
+        return t, v, integral
+
+    sweep = SweepPipeline(
+        move=move_A,
+        trigger=trigger_until_sem if adaptive_averaging
+        else lambda: scope.digitize(channels),
+        fetch=fetch,
+        stages=[save, reduce],
+        stop=fit.converged if early_stop and not adaptive else None,
+    )
+    if adaptive:
+        def measure(angles):
+            # one pipelined pass per round; reduce returned (t, v, integral)
+            results = dict(sweep.run(angles))
+            print(f"Round {sampler.rounds}: {len(angles)} angles, "
+                  f"{len(sampler.measured) + len(angles)} measured")
+            return [results[a][2] for a in angles]
+
+        angles_done, integrals = run_adaptive(sampler, measure)
+        print(f"Adaptive sweep: {len(angles_done)} angles in "
+              f"{sampler.rounds + 1} rounds")
+    else:
+        sweep.run(angles_A)
+        print("Per-point timing (s):", sweep.summary())
+        if sweep.stopped_early:
+            print(f"Fit converged: stopped after {len(sweep.results)} "
+                  f"of {len(angles_A)} angles")
+    store.close()
+
+    fit_summary = fit.summary()
+    print("Polar fit:", fit_summary)
+    with open(os.path.join(output_folder, "polar_fit.json"), "w") as f:
+        json.dump(fit_summary, f, indent=2)
+
+    if transfer == "area":
+        # every angle with an area went through the fit
+        np.savetxt(os.path.join(output_folder, "areas.csv"),
+                   np.column_stack([fit.angles, fit.values]), delimiter=",",
+                   header="Angle A (deg), Area (V s)", comments="")
+        if skipped:
+            print("No area at A = " + ", ".join(f"{a:g}°" for a in skipped)
+                  + " (not in areas.csv)")
+    else:
+        # CSV copies in the usual layout for Polarization plot script.py
+        export_csv(output_folder, filename="B_{B}_A_{A}_shots.csv" if use_segmented
+                   else "B_{B}_A_{A}.csv")
+
+    if scpi_metrics is not None:
+        scpi_metrics.report()
+        scpi_metrics.to_json(os.path.join(output_folder, "scpi_metrics.json"))
+        scpi_metrics.to_prometheus(os.path.join(output_folder, "scpi_metrics.prom"))
+
+    total_settle = sum(r.seconds for r in elliptec.settle_log)
+    print(f"Motors spent {total_settle:.1f} s settling over "
+          f"{len(elliptec.settle_log)} moves.")
 
     # --------------------------------------------------------
     # Clean shutdown
     # --------------------------------------------------------
+    view.close()
+
     try:
         scope.scope.close()
         scope.rm.close()
@@ -1,20 +1,43 @@
 # -*- coding: utf-8 -*-
 
 import time
+import threading
+import os
 import numpy as np
 import matplotlib.pyplot as plt
-import pyvisa as visa
-import clr
+
+from scope_waveform import ScopeLink, Waveform, round_trips_since
+from scpi_metrics import InstrumentedResource, ScpiMetrics
+from sweep_pipeline import SweepPipeline
+from live_view import LiveView
+from elliptec_motion import (
+    PULSES_PER_REV, SettleRecord, home_command, home_concurrently, move_command,
+    move_concurrently, wait_for_position
+)
+
+# SHG_SIMULATE=1 runs the sweep against sim_instruments: no scope, no
+# Elliptec DLL, any OS
+SIMULATE = os.environ.get("SHG_SIMULATE") == "1"
+if SIMULATE:
+    from sim_instruments import SimElliptecDll, SimResourceManager
+else:
+    import pyvisa as visa
+    import clr
 
 # ============================================================
 # Oscilloscope Class (Keysight EXR)
 # ============================================================
 
 class Oscilloscope:
-    def __init__(self, resource):
-        self.rm = visa.ResourceManager()
-        self.scope = self.rm.open_resource(resource)
+    def __init__(self, resource, metrics=None):
+        self.rm = SimResourceManager() if SIMULATE else visa.ResourceManager()
+        link = self.rm.open_resource(resource)
+        if metrics is not None:
+            # opt-in per-command latency/throughput recording
+            link = InstrumentedResource(link, metrics)
+        self.scope = ScopeLink(link)
         self.scope.timeout = 20000
+        self.last_round_trips = None
         self.initialize()
 
     def initialize(self):
@@ -34,41 +57,66 @@ class Oscilloscope:
     def trigger_single(self):
         self.scope.write(":SINGle")
 
-    def acquire_waveform_binary(self, channel):
-        self.scope.write(f":WAVeform:SOURce CHAN{channel}")
-        self.scope.write(":WAVeform:FORMat BYTE")
-        self.scope.write(":WAVeform:UNSigned 1")
-        self.scope.write(":WAVeform:POINts:MODE RAW")
-        self.scope.write(":WAVeform:POINts MAX")
-
-        yinc = float(self.scope.query(":WAVeform:YINCrement?"))
-        yorg = float(self.scope.query(":WAVeform:YORigin?"))
-        yref = float(self.scope.query(":WAVeform:YREFerence?"))
-
-        xinc = float(self.scope.query(":WAVeform:XINCrement?"))
-        xorg = float(self.scope.query(":WAVeform:XORigin?"))
+    def _fetch(self, channel):
+        self.scope.ensure_source(channel)
+        pre = self.scope.preamble(channel)
 
         raw = self.scope.query_binary_values(
             ":WAVeform:DATA?",
             datatype="B",
             container=np.array
         )
+        return pre, raw
+
+    def acquire_waveform_binary(self, channel):
+        before = self.scope.counters()
+        wf = self.fetch_raw([channel])
+        self.last_round_trips = round_trips_since(self.scope, before)
+        return wf.time_axis(), wf.volts(0)
+
+    def digitize(self, channels):
+        """Single blocking acquisition of a channel subset."""
+        sources = ",".join(f"CHANnel{ch}" for ch in channels)
+        self.scope.write(f":DIGitize {sources}")
+        self.scope.query("*OPC?")
+
+    def fetch_raw(self, channels):
+        """Transfer the last acquisition of several channels back-to-back.
+
+        Returns a Waveform holding the (len(channels), samples) raw codes and
+        one preamble per channel; nothing is converted to volts here.
+        """
+        self.scope.ensure_format("BYTE", unsigned=True)
+        fetched = [self._fetch(ch) for ch in channels]
+        return Waveform(np.vstack([raw for _, raw in fetched]),
+                        [pre for pre, _ in fetched])
 
-        voltage = (raw - yref) * yinc + yorg
-        time_axis = xorg + np.arange(len(voltage)) * xinc
+    def acquire_channels(self, channels):
+        """Digitize several channels in one acquisition and fetch them all.
 
-        return time_axis, voltage
+        Returns one time axis and a (len(channels), samples) float32 array.
+        """
+        before = self.scope.counters()
+        self.digitize(channels)
+        wf = self.fetch_raw(channels)
+        self.last_round_trips = round_trips_since(self.scope, before)
+        return wf.time_axis(), wf.volts()
 
 
 # ============================================================
 # Elliptec Motor Control
 # ============================================================
 
-clr.AddReference(r"C:\Program Files\Thorlabs\Elliptec\Thorlabs.Elliptec.ELLO_DLL.dll")
-from Thorlabs.Elliptec.ELLO_DLL import *
+if SIMULATE:
+    _dll = SimElliptecDll(n_motors=3)
+    ELLDevicePort, ELLDevices = _dll.ELLDevicePort, _dll.ELLDevices
+    ELLBaseDevice, NetDecimal = _dll.ELLBaseDevice, _dll.NetDecimal
+else:
+    clr.AddReference(r"C:\Program Files\Thorlabs\Elliptec\Thorlabs.Elliptec.ELLO_DLL.dll")
+    from Thorlabs.Elliptec.ELLO_DLL import *
 
-clr.AddReference("System")
-from System import Decimal as NetDecimal
+    clr.AddReference("System")
+    from System import Decimal as NetDecimal
 
 
 class ElliptecController:
@@ -78,6 +126,14 @@ class ElliptecController:
         self.max_address = max_address
         self.devices = ELLDevices()
         self.motors = {}
+        self.tolerance = 0.1        # deg
+        self.move_timeout = 10.0    # s
+        self.home_timeout = 20.0    # s
+        self.settle_log = []
+        self.pulses_per_rev = PULSES_PER_REV
+        # every mount talks over the one ELLDevicePort; a DLL call blocks
+        # until its reply, so only one call may be on the bus at a time
+        self.bus_lock = threading.Lock()
 
     def connect(self):
         print("Connecting to Elliptec...")
@@ -99,11 +155,53 @@ class ElliptecController:
     def get_motor(self, addr):
         return self.motors[addr]
 
-    def home_motor(self, motor):
-        motor.Home(ELLBaseDevice.DeviceDirection.AntiClockwise)
-
-    def move_motor_absolute(self, motor, angle_deg):
-        motor.MoveAbsolute(NetDecimal.Parse(str(angle_deg)))
+    def _address_of(self, motor):
+        for addr, m in self.motors.items():
+            if m is motor:
+                return addr
+        return None
+
+    def read_position(self, motor):
+        with self.bus_lock:
+            motor.GetPosition()
+            return float(str(motor.Position))
+
+    def wait_settled(self, motor, angle_deg, timeout=None):
+        """Block until motor reports angle_deg; returns the settle time in s."""
+        position, seconds = wait_for_position(
+            lambda: self.read_position(motor), angle_deg,
+            tolerance=self.tolerance,
+            timeout=self.move_timeout if timeout is None else timeout,
+        )
+        self.settle_log.append(
+            SettleRecord(self._address_of(motor), angle_deg, position, seconds)
+        )
+        return seconds
+
+    def send_command(self, command):
+        """Write a raw command to the bus without waiting for its reply.
+
+        The mount answers with its position once the move is done; polling
+        with GetPosition reads the position either way.
+        """
+        with self.bus_lock:
+            ELLDevicePort.SendString(command)
+
+    def home_motor(self, motor, wait=True):
+        if not wait:
+            # the DLL's Home only returns once the mount is home
+            return self.send_command(home_command(self._address_of(motor)))
+        with self.bus_lock:
+            motor.Home(ELLBaseDevice.DeviceDirection.AntiClockwise)
+        return self.wait_settled(motor, 0.0, timeout=self.home_timeout)
+
+    def move_motor_absolute(self, motor, angle_deg, wait=True):
+        if not wait:
+            return self.send_command(move_command(self._address_of(motor), angle_deg,
+                                                  self.pulses_per_rev))
+        with self.bus_lock:
+            motor.MoveAbsolute(NetDecimal.Parse(str(angle_deg)))
+        return self.wait_settled(motor, angle_deg)
 
 
 class DualMotorController:
@@ -114,9 +212,14 @@ class DualMotorController:
 
     def home_both(self):
         print("Homing motors...")
-        self.ctrl.home_motor(self.motor_A)
-        self.ctrl.home_motor(self.motor_B)
-        time.sleep(5)
+        home_concurrently([(self.ctrl, self.motor_A), (self.ctrl, self.motor_B)])
+
+    def move_both(self, angle_A, angle_B):
+        """Move A and B together; returns when both have settled."""
+        return move_concurrently([
+            (self.ctrl, self.motor_A, angle_A),
+            (self.ctrl, self.motor_B, angle_B),
+        ])
 
 
 # ============================================================
@@ -128,7 +231,9 @@ if __name__ == "__main__":
     # -------------------------------
     # Connect to Oscilloscope
     # -------------------------------
-    scope = Oscilloscope("TCPIP0::192.168.8.225::hislip0::INSTR")
+    # SHG_SCPI_METRICS=1 records the latency of every SCPI command
+    scpi_metrics = ScpiMetrics() if os.environ.get("SHG_SCPI_METRICS") == "1" else None
+    scope = Oscilloscope("TCPIP0::192.168.8.225::hislip0::INSTR", metrics=scpi_metrics)
 
     scope.enable_channel(1)
     scope.enable_channel(8)
@@ -161,47 +266,56 @@ if __name__ == "__main__":
     # -------------------------------
     # Live Plot
     # -------------------------------
-    plt.ion()
-    fig, ax = plt.subplots()
-    line, = ax.plot([], [])
-    ax.set_xlabel("Time (s)")
-    ax.set_ylabel("Voltage (V)")
+    view = LiveView(xlabel="Time (s)", ylabel="Voltage (V)").start()
 
     # -------------------------------
     # Acquisition Loop
     # -------------------------------
-    for angB in angles_B:
-        for angA in angles_A:
-
-            print(f"\nMoving motors → A={angA}°, B={angB}°")
-
-            elliptec.move_motor_absolute(dual.motor_A, angA)
-            elliptec.move_motor_absolute(dual.motor_B, angB)
-            time.sleep(2)
-
-            scope.trigger_single()
-            time.sleep(0.2)
-
-            t, v = scope.acquire_waveform_binary(channel=8)
-
-            baseline = np.mean(v[:50])
-            v -= baseline
-
-            integral = np.trapz(v, t)
-
-            waveforms[(angA, angB)] = v
-            integrals[(angA, angB)] = integral
-
-            print(f"Integrated signal: {integral:.3e} V·s")
-
-            line.set_data(t, v)
-            ax.relim()
-            ax.autoscale_view()
-            ax.set_title(f"A={angA}°  B={angB}°  ∫Vdt={integral:.3e}")
-            fig.canvas.draw()
-            fig.canvas.flush_events()
-
-    plt.ioff()
-    plt.show()
+    # The next (A, B) move starts as soon as the scope has triggered, so the
+    # waveform transfer and the integration overlap the motion.
+    grid = [(angA, angB) for angB in angles_B for angA in angles_A]
+
+    def move(point):
+        angA, angB = point
+        print(f"\nMoving motors → A={angA}°, B={angB}°")
+        dual.move_both(angA, angB)
+
+    def integrate(point, wf):
+        t = wf.time_axis()
+        v = wf.volts(1)
+
+        baseline = np.mean(v[:50])
+        v = v - baseline
+
+        integral = np.trapezoid(v, t)
+
+        # raw 8-bit codes + scaling; wf.volts() when the volts are needed
+        waveforms[point] = wf
+        integrals[point] = integral
+
+        print(f"Integrated signal: {integral:.3e} V·s")
+
+        angA, angB = point
+        view.publish(t, v, f"A={angA}°  B={angB}°  ∫Vdt={integral:.3e}")
+        return integral
+
+    sweep = SweepPipeline(
+        move=move,
+        trigger=lambda: scope.digitize([1, 8]),
+        fetch=lambda: scope.fetch_raw([1, 8]),
+        stages=[integrate],
+    )
+    sweep.run(grid)
+    print("Per-point timing (s):", sweep.summary())
+
+    if scpi_metrics is not None:
+        scpi_metrics.report()
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        scpi_metrics.to_json(f"scpi_metrics_{stamp}.json")
+        scpi_metrics.to_prometheus(f"scpi_metrics_{stamp}.prom")
+
+    # keep the last frame up until the window is closed
+    view.wait()
+    view.close()
 
     print("\nMeasurement complete.")
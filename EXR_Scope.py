@@ -5,39 +5,36 @@ import numpy as np
 import scipy
 import serial
 import pyvisa as visa
-import socket
 import time
 import elliptec
 
-#connecting to board(s)
-s = serial.Serial('COM5', 115200, timeout=1) 
+from delay_generator import DelayGenerator
+from grbl_stage import GrblStage
+from live_view import LiveView
+from raster_scheduler import RasterScheduler, format_duration, project, serpentine_path
+from run_store import RasterStore
+from scope_waveform import parse_preamble
+
+#connecting to board(s); the GRBL port stays open for the whole scan and
+#waits for GRBL's banner instead of a fixed sleep
+stage = GrblStage('COM5', 115200)
 #connecting to motorized rotating mount(s)
 controller = elliptec.Controller('COM6')
-# Wake up GRBL (send newline characters)
-s.write(b"\r\n\r\n") 
-time.sleep(2) # Wait for GRBL to initialize
-s.flushInput() # Flush startup text in serial input
 
 # Send G-code commands
-#s.write(b"G90\n")  # Set absolute positioning, for zeroing purposes only
-#s.write(b"G00 X10 Y20 Z5 F400\n") # Move to X=10, Y=20, Z=5 at 400mm/min UPDATE TO ACTUAL ZERO
-#time.sleep(5)  # Allow time for movement
-
-s.write(b"G91/n") #set to relative positioning
-
+#stage.stream(["G90", "G00 X10 Y20 Z5 F400"])  # absolute move to zero, for zeroing purposes only UPDATE TO ACTUAL ZERO
+#stage.wait_idle()  # Allow time for movement
 
-# Close the serial port(s) or other connections
-s.close() 
+stage.stream(["G91"]) #set to relative positioning
 
-#delay generator code
+#delay generator code; one connection for the whole scan, replies are read
+#and errors (LERR?) raised instead of going unnoticed
 target_ip = "192.168.8.150"  # Replace with the actual IP address
-target_port = 5024           # Replace with the actual port number (e.g., 80 for HTTP)
-s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-s.connect((target_ip, target_port))
-#set the trigger to be external or internal 
-s.send(b"tsrc 0\n")
-#set the trigger rate 
-s.send(b"trat 50\n")
+target_port = 5025           # raw socket; 5024 is telnet, whose echo garbles the replies
+delay_gen = DelayGenerator(target_ip, target_port)
+#set the trigger to be external or internal (tsrc) and the trigger rate (trat),
+#both in one round trip
+delay_gen.set_trigger(source=0, rate=50)
 #control of each of the channels for the scope
 #The channels start range from 2 to 9 and A to H respectively 
 #channel A controls ....
@@ -83,54 +80,72 @@ scope.write(":VOLTage 2") # Set pulse amplitude to 2Vpeak
 scope.write(":FREQuency 1000") # Set pulse frequency to 1 kHz
 #enable and trigger output
 scope.write("OUTPut ON")
-waveforms = []
-# positions of waveform acquisition
-x_coords = [] 
-z_coords = []
-
-for k in range(iter_z):
-    for i in range(iter_x): 
-        #data collection options
-        x_coords.append(i)
-        z_coords.append(k)
-        scope.write(":ACQuire:COUNt 1")
-        scope.write('acq:aver ON')
-        scope.write('wav:VIEW ALL')
-        scope.write('digitize')
-        scope.timeout = 50000
-        waveform_data = scope.query_binary_values('waveform:data?',datatype='b')
-        waveforms.append(waveform_data)
-        plt.plot(waveform_data, label=f'Acquisition {i+1}') # Using raw data for simplicity; scale with preamble for actual voltage/time
-        plt.xlabel('Sample Index')
-        plt.ylabel('Raw Data Value')
-        plt.title('Oscilloscope Waveforms')
-        plt.legend()
-        plt.grid(True)
-        plt.pause(0.1) # Pause to allow plot to update
-        scope.write_ascii_values("WLISt:WAVeform:DATA somename,", waveform_data)
-        scope.write("SOURce1:FUNCtion ARB") # Set function to arbitrary
-        #scope.write(f"SOURce1:FUNCtion:ARBitrary:SRATe {num_points * frequency}") # Set sample rate
-        #send out waveform to stepper motors
-        s.open()
-        if k % 2 == 0:
-            s.write(b"G0 X.0025 /n")
-        else:
-            s.write(b"G0 X-.0025 /n")t
-        time.sleep(5)
-        s.close()
-    s.open()
-    s.write(b"G0 Z.0025 /n")
-    time.sleep(5)
-    s.close()
-    
-        
-    
-        if i == num_iteration:
-         break
-plt.show() # Display the final plot after all acquisitions
-     
+# Every waveform goes straight into a preallocated (z, x, sample) array on
+# disk indexed by pixel, so memory stays flat however large the scan is.
+# Open it from another session with run_store.open_raster(folder).
+raster = RasterStore(time.strftime("raster_%Y%m%d_%H%M%S"),
+                     shape=(iter_z, iter_x), dtype=np.int8, flush_every=iter_x,
+                     attrs={"step_mm": 0.0025, "vRange": vRange, "tRange": tRange})
+preamble = None
+
+# live plot in its own process; the scan never waits for a redraw
+view = LiveView(xlabel='Sample Index', ylabel='Raw Data Value').start()
+
+#data collection options, set once for the whole scan
+scope.write(":ACQuire:COUNt 1")
+scope.write('acq:aver ON')
+scope.write('wav:VIEW ALL')
+scope.timeout = 50000
+
+def trigger():
+    scope.write('digitize')
+    scope.query('*opc?')
+
+def fetch():
+    return scope.query_binary_values('waveform:data?',datatype='b', container=np.array)
+
+def store(pixel, waveform_data):
+    global preamble
+    if preamble is None:
+        preamble = parse_preamble(scope.query(':WAVeform:PREamble?'))
+    raster.write(pixel.z, pixel.x, waveform_data, preamble)
+
+def show(pixel, waveform_data):
+    # Using raw data for simplicity; scale with preamble for actual voltage/time
+    view.publish(np.arange(len(waveform_data)), waveform_data,
+                 f'Oscilloscope Waveform (z={pixel.z}, x={pixel.x})')
 
+def upload(pixel, waveform_data):
+    scope.write_ascii_values("WLISt:WAVeform:DATA somename,", waveform_data)
+    scope.write("SOURce1:FUNCtion ARB") # Set function to arbitrary
+    #scope.write(f"SOURce1:FUNCtion:ARBitrary:SRATe {num_points * frequency}") # Set sample rate
 
+# serpentine path planned up front; the stage is sent to the next pixel as
+# soon as the trigger has fired, and transfer/storage/plot/upload run while
+# it moves
+path = serpentine_path(iter_z, iter_x, step_x=0.0025, step_z=0.0025)
 
+# size the scan before starting it: one timed trigger and transfer, and one
+# step out and back, projected over the whole raster (per-pixel storage,
+# plotting and upload overlap the move and are not included)
+t0 = time.perf_counter()
+trigger()
+t1 = time.perf_counter()
+fetch()
+t2 = time.perf_counter()
+step_time = (stage.move_relative(x=0.0025) + stage.move_relative(x=-0.0025)) / 2
+print(f"{len(path)} pixels, projected scan time "
+      f"{format_duration(project(iter_z, iter_x, t1 - t0, t2 - t1, step_time))} "
+      f"(trigger {(t1 - t0) * 1e3:.1f} ms, transfer {(t2 - t1) * 1e3:.1f} ms, "
+      f"step {step_time * 1e3:.1f} ms)")
 
+scheduler = RasterScheduler(stage, trigger, fetch, process=[store, show, upload],
+                            report_every=iter_x)
+scheduler.run(path)
+print("Per-pixel breakdown (s):", scheduler.breakdown())
 
+raster.close()
+stage.close()
+delay_gen.close()
+view.wait() # Keep the final plot up until its window is closed
+view.close()
@@ -13,6 +13,10 @@ import sys, os
 import clr
 from datetime import datetime
 
+from live_view import LiveView
+from run_store import RunStore, export_csv
+from scope_waveform import parse_preamble
+
 # ----------------------------------------
 # Add reference to Thorlabs Elliptec DLL
 # ----------------------------------------
@@ -81,8 +85,13 @@ scope.write('waveform:format BYTE')
 # ----------------------------------------
 # Data collection
 # ----------------------------------------
-plt.ion()
-plt.figure(figsize=(8,5))
+# live plot in its own process, redrawn at a capped rate
+view = LiveView(xlabel='Time (ns)', ylabel='Amplitude (a.u.)').start()
+
+# raw codes + scaling for every angle, exported to per-angle CSVs at the end
+# (in volts on the scope's time axis, no longer raw codes over tRange)
+store = RunStore(os.path.join(save_folder, datetime.now().strftime("Run_%Y%m%d_%H%M%S")),
+                 labels=["Voltage (V)"])
 
 for angle in angles:
     net_angle = NetDecimal.Parse(str(angle))
@@ -95,29 +104,25 @@ for angle in angles:
     scope.write(f'ACQuire:COUNt {avgCount}')
 
     # Acquire waveform
-    wf = scope.query_binary_values('waveform:data?', datatype='b')
-    wf = np.array(wf, dtype=np.float32)
+    raw = scope.query_binary_values('waveform:data?', datatype='b', container=np.array)
+    preamble = parse_preamble(scope.query(':WAVeform:PREamble?'))
+    store.append(raw, preamble, angle=angle)
+    wf = np.array(raw, dtype=np.float32)
 
     # Generate time axis (you can adjust sampling rate if known)
     dt = tRange / len(wf)
     time_axis = np.arange(len(wf)) * dt
 
-    # Save to CSV file
-    filename = os.path.join(save_folder, f"waveform_{angle}deg.csv")
-    np.savetxt(filename, np.column_stack((time_axis, wf)), delimiter=',', header='Time(s),Amplitude', comments='')
-    print(f"Saved waveform for {angle} deg to {filename}")
+    print(f"Stored waveform for {angle} deg in {store.folder}")
 
     # Plot live
-    plt.clf()
-    plt.plot(time_axis * 1e9, wf, label=f'{angle} deg')
-    plt.xlabel('Time (ns)')
-    plt.ylabel('Amplitude (a.u.)')
-    plt.title('Waveform at Different Polarization Angles')
-    plt.legend()
-    plt.grid(True)
-    plt.pause(0.5)
-
-plt.ioff()
-plt.show(block=True)
+    view.publish(time_axis * 1e9, wf, f'Waveform at {angle} deg')
+
+store.close()
+export_csv(store.folder, save_folder, filename="waveform_{angle}deg.csv",
+           time_label="Time (s)", baseline_points=None)
+
+view.wait()
+view.close()
 
 print("\nAll waveforms collected and saved successfully!")
@@ -1,16 +1,15 @@
-import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
-import glob
-import os
-import re
+
+from shg_analysis.extractors import FieldExtractor
+from shg_analysis.pipeline import analyze
+from shg_analysis.reducers import PolarPlot
 
 # ============================================================
 # USER SETTINGS
 # ============================================================
 
 data_folder = r"C:\Users\colin\Documents\252026"
-baseline_end = 0.5           # ps (pre-pulse region)
+baseline_end = 0.5E-12       # s (pre-pulse region, 0.5 ps)
 integrate_squared = False    # True if detector ~ |E|^2
 
 # -------- polarization angle extraction --------
@@ -19,110 +18,27 @@ integrate_squared = False    # True if detector ~ |E|^2
 angle_field_index = 5
 # ------------------------------------------------
 
-# ============================================================
-# LOAD CSV FILES
-# ============================================================
-
-csv_files = sorted(glob.glob(os.path.join(data_folder, "*.csv")))
-
-if len(csv_files) == 0:
-    raise RuntimeError(f"No CSV files found in {data_folder}")
-
-# ============================================================
-# STEP 1 + 2: INTERACTIVE SELECTION OF INTEGRATION WINDOW
-# ============================================================
-
-df0 = pd.read_csv(csv_files[0])
-t0 = df0.iloc[:, 0].values
-signal0 = df0.iloc[:, 2].values
-
-baseline0 = np.mean(signal0[t0 < baseline_end])
-signal0_corr = signal0 - baseline0
-
-plt.figure(figsize=(7, 4))
-plt.plot(t0, signal0_corr)
-plt.xlabel("Time (ps)")
-plt.ylabel("Signal (baseline subtracted)")
-plt.title("Click START then END of SHG pulse")
-
-points = plt.ginput(2)
-plt.show()
-
-t_start = min(p[0] for p in points)
-t_end   = max(p[0] for p in points)
-
-print(f"Integration window selected: {t_start:.3f} – {t_end:.3f} ps")
-
-# ============================================================
-# MAIN INTEGRATION LOOP
-# ============================================================
-
-angles = []
-intensities = []
-
-for fname in csv_files:
-
-    basename = os.path.basename(fname)
-    name_no_ext = os.path.splitext(basename)[0]
-    parts = name_no_ext.split("_")
-
-    if len(parts) <= angle_field_index:
-        print(f"Skipping file (not enough fields): {basename}")
-        continue
-
-    try:
-        angle = float(parts[angle_field_index])
-    except ValueError:
-        print(f"Skipping file (angle not numeric): {basename}")
-        continue
-
-    # --- load waveform ---
-    df = pd.read_csv(fname)
-    t = df.iloc[:, 0].values
-    signal = df.iloc[:, 2].values
-
-    # --- baseline subtraction ---
-    baseline = np.mean(signal[t < baseline_end])
-    signal_corr = signal - baseline
-
-    # --- integration window ---
-    mask = (t > t_start) & (t < t_end)
-    if not np.any(mask):
-        print(f"WARNING: empty window for {basename}")
-        continue
-
-    if integrate_squared:
-        I = np.trapezoid(signal_corr[mask]**2, t[mask])
-    else:
-        I = np.trapezoid(signal_corr[mask], t[mask])
-
-    angles.append(angle)
-    intensities.append(I)
+# -------- integration window --------
+# None: detected on the mean waveform, "pick": click START and END on the
+# first waveform, (t_start, t_end) in seconds: used as given
+window = None
+window_method = "threshold"  # "threshold", "fwhm" or "matched"
+# ------------------------------------------------
 
 # ============================================================
-# POLARIZATION PLOT
+# LOAD, INTEGRATE, POLARIZATION PLOT
 # ============================================================
+# Same pipeline as
+#   python -m shg_analysis <data_folder> --field 5 --reducer polar
+# The CSV parsing pool re-imports this script on Windows, hence the guard.
 
-angles = np.array(angles)
-intensities = np.array(intensities)
-
-if len(intensities) == 0:
-    raise RuntimeError("No intensities integrated")
-
-order = np.argsort(angles)
-angles = angles[order]
-intensities = intensities[order]
-
-intensities /= intensities.max()
-
-theta = np.deg2rad(angles)
-
-fig = plt.figure(figsize=(6, 6))
-ax = fig.add_subplot(111, projection="polar")
-
-ax.plot(theta, intensities, "o-", lw=2)
-ax.set_theta_zero_location("E")
-ax.set_theta_direction(-1)
-ax.set_title("SHG Polarization – Monolayer MoS₂")
+if __name__ == "__main__":
 
-plt.show()
+    analyze(data_folder,
+            FieldExtractor(angle_field_index, label="angle"),
+            PolarPlot(title="SHG Polarization – Monolayer MoS₂"),
+            baseline_end,
+            window=window,
+            window_method=window_method,
+            squared=integrate_squared)
+    plt.show()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""Adaptive angle sampling for the polarization sweeps.
+
+A sweep starts on a coarse grid and then measures in rounds.  After every
+round each interval between neighbouring measured angles gets a score: the
+estimated error of a straight line drawn across it, as a fraction of the
+signal range.  That error comes from how fast the slope changes at the
+interval's ends (the second difference), so flat stretches and straight
+flanks are left alone and the angles go to the lobes, nodes and kinks.
+When a model is given its residual at the interval's ends counts too.  The
+best-scoring intervals wider than the target resolution are split at their
+midpoints and measured next.  The sweep ends when no interval scores above
+the threshold, none is wider than the resolution, or the point budget is
+spent.  Errors below the measurement noise are not worth chasing, so a
+noise level can be given to keep the sweep from refining shot noise.
+
+    sampler = AdaptiveAngles(0, 180, coarse_step=30, resolution=2.5, budget=60)
+    angles, values = run_adaptive(sampler, measure)
+
+where measure(angles) moves through the angles in order and returns one
+integrated signal per angle.
+"""
+
+import numpy as np
+
+
+class AdaptiveAngles:
+    """Chooses the angles of an adaptive sweep over [start, stop).
+
+    With periodic=True the pattern repeats after stop - start degrees and the
+    interval from the last angle back to the first (wrapped) is refined too.
+    model, if given, is called as model(angles) and returns predicted
+    values (e.g. a polar-pattern fit); its residual then drives refinement.
+    threshold is the interpolation error, as a fraction of the signal range,
+    below which an interval is left alone; noise (in signal units) is
+    subtracted from every error estimate first.  Angles measured as NaN (no
+    reading) count against the budget but are not refined or tried again.
+    """
+
+    def __init__(self, start=0.0, stop=180.0, coarse_step=30.0, resolution=2.5,
+                 budget=None, batch=4, threshold=0.01, noise=0.0,
+                 periodic=True, model=None):
+        self.start = float(start)
+        self.stop = float(stop)
+        self.coarse_step = float(coarse_step)
+        self.resolution = float(resolution)
+        self.budget = budget
+        self.batch = batch
+        self.threshold = threshold
+        self.noise = noise
+        self.periodic = periodic
+        self.model = model
+        self.measured = {}
+        self.failed = set()
+        self.rounds = 0
+
+    # --------------------------------------------------------
+
+    @property
+    def period(self):
+        return self.stop - self.start
+
+    def initial(self):
+        """Coarse grid to measure first."""
+        angles = np.arange(self.start, self.stop, self.coarse_step)
+        if not self.periodic and angles[-1] < self.stop:
+            angles = np.append(angles, self.stop)
+        return [float(a) for a in angles]
+
+    def add(self, angle, value):
+        if not np.isfinite(value):
+            self.failed.add(round(float(angle), 3))
+            return
+        self.measured[round(float(angle), 6)] = float(value)
+
+    @property
+    def angles(self):
+        return np.array(sorted(self.measured))
+
+    @property
+    def values(self):
+        return np.array([self.measured[a] for a in sorted(self.measured)])
+
+    def remaining(self):
+        if self.budget is None:
+            return None
+        return max(self.budget - len(self.measured) - len(self.failed), 0)
+
+    # --------------------------------------------------------
+
+    def intervals(self):
+        """(left, width, score) of every interval between measured angles."""
+        a = self.angles
+        v = self.values
+        if len(a) < 2:
+            return []
+        scale = np.ptp(v) or 1.0
+        if self.periodic:
+            # wrap so the last interval runs to the first angle + period
+            a = np.concatenate((a[-1:] - self.period, a, a[:1] + self.period,
+                                a[1:2] + self.period))
+            v = np.concatenate((v[-1:], v, v[:1], v[1:2]))
+            lo, hi = 1, len(a) - 2
+        else:
+            a = np.concatenate((a[:1], a, a[-1:]))
+            v = np.concatenate((v[:1], v, v[-1:]))
+            lo, hi = 1, len(a) - 2
+
+        residual = None
+        if self.model is not None:
+            residual = np.abs(v - np.asarray(self.model(a), dtype=float))
+            residual = np.maximum(residual - self.noise, 0.0) / scale
+
+        out = []
+        for i in range(lo, hi):
+            width = a[i + 1] - a[i]
+            if width <= 0:
+                continue
+            # second differences at both ends estimate the interpolation
+            # error |f''| * width**2 / 8 of the straight line across
+            error = 0.0
+            for j in (i, i + 1):
+                h0, h1 = a[j] - a[j - 1], a[j + 1] - a[j]
+                if h0 > 0 and h1 > 0:
+                    d2 = 2.0 * ((v[j + 1] - v[j]) / h1 - (v[j] - v[j - 1]) / h0) / (h0 + h1)
+                    error = max(error, abs(d2) * width ** 2 / 8.0)
+            score = max(error - self.noise, 0.0) / scale
+            if residual is not None:
+                score = max(score, residual[i], residual[i + 1])
+            out.append((float(a[i]), float(width), float(score)))
+        return out
+
+    def next_batch(self):
+        """Midpoints to measure next, in increasing order; [] when done."""
+        remaining = self.remaining()
+        if remaining == 0:
+            return []
+        candidates = [(score, left + width / 2.0)
+                      for left, width, score in self.intervals()
+                      if width > self.resolution and score > self.threshold]
+        candidates.sort(reverse=True)
+        n = self.batch if remaining is None else min(self.batch, remaining)
+        picked = []
+        for _, angle in candidates:
+            angle = (angle - self.start) % self.period + self.start \
+                if self.periodic else angle
+            if round(angle, 3) not in self.failed:
+                picked.append(round(angle, 3))
+            if len(picked) == n:
+                break
+        self.rounds += bool(picked)
+        return sorted(picked)
+
+
+def run_adaptive(sampler, measure, on_round=None):
+    """Measure sampler.initial(), then its batches until it is satisfied.
+
+    measure(angles) returns one value per angle. on_round(sampler), if
+    given, runs after every round (e.g. to refit a model or replot).
+    Returns the measured (angles, values), sorted by angle.
+    """
+    angles = sampler.initial()
+    if sampler.budget is not None:
+        angles = angles[:sampler.budget]
+    while angles:
+        for angle, value in zip(angles, measure(angles)):
+            sampler.add(angle, value)
+        if on_round is not None:
+            on_round(sampler)
+        angles = sampler.next_batch()
+    return sampler.angles, sampler.values
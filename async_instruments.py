@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""asyncio layer over the instrument drivers, and an async sweep.
+
+The drivers stay blocking (pyvisa, the Elliptec DLL, pyserial); each wrapper
+runs its driver's calls on worker threads of its own, so a call on one
+instrument never waits for another and a single VISA session or serial port
+is never used from two threads at once.  Any driver method can be awaited:
+
+    scope = AsyncScope(Oscilloscope(...))
+    await scope.digitize([8])           # Oscilloscope.digitize on its thread
+
+The delay generator is a plain TCP line protocol and is spoken natively with
+asyncio streams.  AsyncSweep strings the pieces together like SweepPipeline:
+the next move starts as soon as the scope has triggered and transfer,
+processing and file writes overlap the motion, but the overlap comes from
+awaiting instead of hand-made threads.
+
+    python async_instruments.py         # simulated sweep, no hardware
+"""
+
+import asyncio
+import functools
+import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from delay_generator import batch, check_replies, delay_command, reply_count
+
+_DONE = object()
+
+
+# ============================================================
+# Blocking drivers on worker threads
+# ============================================================
+
+class AsyncInstrument:
+    """Awaitable proxy of a blocking driver.
+
+    driver.name(*args) becomes await wrapper.name(*args), run on one of
+    workers threads reserved for this driver (1 keeps its calls in order).
+    """
+
+    def __init__(self, driver, workers=1):
+        self.driver = driver
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    async def call(self, function, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(function, *args, **kwargs))
+
+    def __getattr__(self, name):
+        attr = getattr(self.driver, name)
+        if not callable(attr):
+            return attr
+
+        async def method(*args, **kwargs):
+            return await self.call(attr, *args, **kwargs)
+        return method
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+class AsyncScope(AsyncInstrument):
+    """Scope driver (the Oscilloscope classes, or a pyvisa resource)."""
+
+    async def acquire(self, channels):
+        """Digitize channels and transfer them, as one call on the scope thread."""
+        def run():
+            self.driver.digitize(channels)
+            return self.driver.fetch_raw(channels)
+        return await self.call(run)
+
+
+class AsyncElliptec(AsyncInstrument):
+    """ElliptecController; one worker, since all its mounts share one bus.
+
+    Mounts on the same controller therefore move one after the other; wrap
+    each controller (bus) separately to move mounts on different buses in
+    parallel.
+    """
+
+    async def move(self, motor, angle):
+        """Move one mount and wait for it to settle; returns the settle time."""
+        return await self.call(self.driver.move_motor_absolute, motor, angle)
+
+    async def move_many(self, moves):
+        """[(motor, angle)] queued together; done when the last has settled."""
+        return await asyncio.gather(*(self.move(m, a) for m, a in moves))
+
+    async def home(self, motor):
+        return await self.call(self.driver.home_motor, motor)
+
+
+class AsyncGrbl(AsyncInstrument):
+    """GrblStage; one thread, as GRBL takes its lines in order."""
+
+    async def move(self, feed=None, **axes):
+        """Relative move, awaited until the stage reports Idle."""
+        return await self.call(self.driver.move_relative, wait=True, feed=feed, **axes)
+
+    async def stream(self, lines):
+        return await self.call(self.driver.stream, lines)
+
+    async def wait_idle(self, timeout=60.0):
+        return await self.call(self.driver.wait_idle, timeout)
+
+
+# ============================================================
+# Delay generator (native asyncio)
+# ============================================================
+
+class AsyncDelayGenerator:
+    """DG645-style delay generator over TCP with asyncio streams.
+
+    Same line protocol as delay_generator.DelayGenerator, and the same
+    batching and LERR? check: commands passed to one send() go out in a
+    single ";"-joined line, so a batch costs one round trip.
+    """
+
+    def __init__(self, host, port=5025, timeout=2.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+        self._lock = asyncio.Lock()
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout)
+        return self
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+            self.writer = None
+
+    async def send(self, *commands, check=True):
+        """Send commands in one line; returns the replies to their queries.
+
+        With check, LERR? is appended and any queued error is raised.
+        """
+        commands, line = batch(commands, check)
+        async with self._lock:
+            self.writer.write(line)
+            await self.writer.drain()
+            replies = []
+            for _ in range(reply_count(commands)):
+                line = await asyncio.wait_for(self.reader.readline(), self.timeout)
+                if not line:
+                    raise ConnectionError("Delay generator closed the connection")
+                replies.append(line.decode("ascii").strip())
+        return check_replies(commands, replies, check)
+
+    async def query(self, command):
+        return (await self.send(command))[0]
+
+    async def set_delay(self, channel, seconds, reference=0):
+        """Delay of channel after reference (T0 by default)."""
+        await self.send(delay_command(channel, seconds, reference))
+
+
+# ============================================================
+# Sweep
+# ============================================================
+
+async def _maybe_await(function, *args):
+    """Await coroutine functions; run plain ones on the default executor."""
+    if inspect.iscoroutinefunction(function):
+        return await function(*args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(function, *args))
+
+
+class AsyncSweep:
+    """Async counterpart of SweepPipeline.
+
+    move(point), trigger() and fetch() are coroutine functions (e.g. methods
+    of the wrappers above); stages are stage(point, item) -> item, coroutine
+    functions or plain functions (run on the default executor, e.g. a
+    RunStore.append), each fed in order through a bounded queue.
+    """
+
+    def __init__(self, move, trigger, fetch, stages=(), queue_size=4):
+        self.move = move
+        self.trigger = trigger
+        self.fetch = fetch
+        self.stages = list(stages)
+        self.queue_size = queue_size
+        self.timings = []
+        self.results = []
+        self.elapsed = 0.0
+        self._error = None
+
+    async def _worker(self, stage, inbox, outbox):
+        while True:
+            job = await inbox.get()
+            if job is _DONE:
+                if outbox is not None:
+                    await outbox.put(_DONE)
+                return
+            if self._error is not None:
+                continue    # drain so the producer never blocks
+            point, item = job
+            try:
+                item = await _maybe_await(stage, point, item)
+            except Exception as exc:
+                self._error = exc
+                continue
+            if outbox is not None:
+                await outbox.put((point, item))
+            else:
+                self.results.append((point, item))
+
+    async def run(self, points):
+        points = list(points)
+        self.timings = []
+        self.results = []
+        self._error = None
+        if not points:
+            return self.results
+
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        workers = [asyncio.create_task(self._worker(
+            stage, queues[i], queues[i + 1] if i + 1 < len(queues) else None))
+            for i, stage in enumerate(self.stages)]
+
+        start = time.perf_counter()
+        pending = asyncio.create_task(self.move(points[0]))
+        try:
+            for i, point in enumerate(points):
+                if self._error is not None:
+                    raise self._error
+
+                t0 = time.perf_counter()
+                await pending
+                t1 = time.perf_counter()
+                await self.trigger()
+                t2 = time.perf_counter()
+
+                # motors travel to the next point while this one transfers
+                if i + 1 < len(points):
+                    pending = asyncio.create_task(self.move(points[i + 1]))
+                item = await self.fetch()
+                t3 = time.perf_counter()
+
+                if queues:
+                    await queues[0].put((point, item))
+                else:
+                    self.results.append((point, item))
+                t4 = time.perf_counter()
+
+                self.timings.append({
+                    "point": point,
+                    "move_wait": t1 - t0,
+                    "trigger": t2 - t1,
+                    "fetch": t3 - t2,
+                    "queue_wait": t4 - t3,
+                    "total": time.perf_counter() - t0,
+                })
+            if queues:
+                await queues[0].put(_DONE)
+            await asyncio.gather(*workers)
+        finally:
+            if not pending.done():
+                pending.cancel()
+            for worker in workers:
+                worker.cancel()
+
+        self.elapsed = time.perf_counter() - start
+        if self._error is not None:
+            raise self._error
+        return self.results
+
+    def summary(self):
+        """Mean time per stage and overall points per second."""
+        n = len(self.timings)
+        if n == 0:
+            return {}
+        keys = ("move_wait", "trigger", "fetch", "queue_wait", "total")
+        out = {k: sum(t[k] for t in self.timings) / n for k in keys}
+        out["points"] = n
+        out["points_per_s"] = n / self.elapsed if self.elapsed else float("nan")
+        return out
+
+
+# ============================================================
+# Simulated sweep
+# ============================================================
+
+async def demo(n_angles=18, delays=(10e-9, 20e-9)):
+    """Polar sweep x delay scan against the sim_instruments stand-ins."""
+    import tempfile
+
+    import numpy as np
+
+    from run_store import RunStore
+    from scope_waveform import ScopeLink, Waveform
+    from sim_instruments import SimDelayGenerator, SimEllMotor, SimScope
+
+    link = ScopeLink(SimScope(points=2000))
+    link.write(":ACQuire:TYPE AVERage")
+    link.write(":ACQuire:COUNt 64")
+    scope = AsyncInstrument(link)
+    mount = AsyncInstrument(SimEllMotor("1"))
+    server = SimDelayGenerator()
+    dg = await AsyncDelayGenerator(*server.address).connect()
+    folder = tempfile.mkdtemp(prefix="async_sweep_")
+    store = RunStore(folder, labels=["Voltage (V)"])
+
+    async def move(point):
+        angle, delay = point
+        # mount and delay generator are independent: wait for both at once
+        await asyncio.gather(mount.MoveAbsolute(angle), dg.set_delay(2, delay))
+
+    async def trigger():
+        await scope.write(":DIGitize CHANnel8")
+        await scope.query("*OPC?")
+
+    async def fetch():
+        await scope.ensure_format("WORD", False)
+        pre = await scope.preamble(8)
+        raw = await scope.query_binary_values(
+            ":WAVeform:DATA?", datatype="h", is_big_endian=True, container=np.array)
+        return Waveform(raw, pre)
+
+    def save(point, wf):
+        store.append(wf, A=point[0], delay=point[1])
+        return wf
+
+    def integrate(point, wf):
+        v = wf.volts()
+        return float(np.trapezoid(v - v[:50].mean(), wf.time_axis()))
+
+    grid = [(a, d) for d in delays for a in np.linspace(0, 180, n_angles, endpoint=False)]
+    sweep = AsyncSweep(move, trigger, fetch, stages=[save, integrate])
+    try:
+        await sweep.run(grid)
+    finally:
+        store.close()
+        await dg.close()
+        server.close()
+        for instrument in (scope, mount):
+            instrument.close()
+    print(f"{len(sweep.results)} points in {sweep.elapsed:.2f} s, run in {folder}")
+    print("Per-point timing (s):", sweep.summary())
+    print("Delay generator saw:", server.lines[:2], "...")
+    return sweep
+
+
+if __name__ == "__main__":
+    asyncio.run(demo())
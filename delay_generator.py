@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""Persistent client for the DG645-style delay generator.
+
+One TCP connection is kept open for the whole session.  Commands given to
+one send() go out as a single ";"-joined line and every query in the line
+is answered with one line, so reprogramming a step (new delay plus an error
+check) costs one round trip.  Errors are read back with LERR? and raised.
+The line batching and error check are shared with AsyncDelayGenerator in
+async_instruments.
+
+Port 5025 is the DG645's raw socket.  Port 5024 is its telnet port, whose
+option negotiation and echo end up in the replies.
+
+    dg = DelayGenerator("192.168.8.150")
+    dg.set_trigger(source=0, rate=50)
+    for delay, wf in dg.sweep("A", np.linspace(0, 50e-9, 51), acquire):
+        ...
+"""
+
+import socket
+
+# DG645 output numbering: T0, T1, then A..H
+CHANNELS = {"T0": 0, "T1": 1, "A": 2, "B": 3, "C": 4, "D": 5, "E": 6, "F": 7,
+            "G": 8, "H": 9}
+
+
+class DelayGeneratorError(RuntimeError):
+    pass
+
+
+def channel_number(channel):
+    """Channel as the instrument numbers it; accepts 2 or "A"."""
+    if isinstance(channel, str):
+        key = channel.strip().upper()
+        if key in CHANNELS:
+            return CHANNELS[key]
+        return int(key)
+    return int(channel)
+
+
+def delay_command(channel, seconds, reference=0):
+    return (f"DLAY {channel_number(channel)},{channel_number(reference)},"
+            f"{seconds:.12e}")
+
+
+def batch(commands, check=True):
+    """(commands, line) for one send; with check, LERR? is appended."""
+    commands = list(commands)
+    if check:
+        commands.append("LERR?")
+    return commands, (";".join(commands) + "\n").encode("ascii")
+
+
+def reply_count(commands):
+    """Number of reply lines the instrument sends for a batch."""
+    return sum("?" in c for c in commands)
+
+
+def check_replies(commands, replies, check=True):
+    """Strip the LERR? reply of a checked batch and raise if it is an error."""
+    if check:
+        error = replies.pop()
+        if error != "0":
+            raise DelayGeneratorError(
+                f"Error {error} after {';'.join(commands[:-1])!r}")
+    return replies
+
+
+def parse_delay(reply):
+    """'0,+1.000000000000e-08' -> (reference channel, seconds)."""
+    reference, _, seconds = reply.partition(",")
+    return int(reference), float(seconds)
+
+
+class DelayGenerator:
+    """Delay generator on a TCP port, with replies read and errors checked."""
+
+    def __init__(self, host, port=5025, timeout=2.0):
+        self.host = host
+        self.port = port
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self.sock.makefile("rb")
+        self.round_trips = 0
+
+    def close(self):
+        self._reader.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --------------------------------------------------------
+    # Line protocol
+    # --------------------------------------------------------
+
+    def _readline(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Delay generator closed the connection")
+        return line.decode("ascii").strip()
+
+    def send(self, *commands, check=True):
+        """Send commands in one line; returns the replies to their queries.
+
+        With check, LERR? is appended and any queued error is raised.
+        """
+        commands, line = batch(commands, check)
+        self.sock.sendall(line)
+        replies = [self._readline() for _ in range(reply_count(commands))]
+        self.round_trips += 1
+        return check_replies(commands, replies, check)
+
+    def query(self, command):
+        return self.send(command)[0]
+
+    def clear_errors(self):
+        """Read out the error queue; returns the codes that were pending."""
+        errors = []
+        while True:
+            code = self.send("LERR?", check=False)[0]
+            if code == "0":
+                return errors
+            errors.append(int(code))
+
+    # --------------------------------------------------------
+    # Settings
+    # --------------------------------------------------------
+
+    def idn(self):
+        return self.query("*IDN?")
+
+    def set_trigger(self, source=None, rate=None, level=None):
+        """Trigger source (0 internal, 1/2 external edges, ...), rate in Hz."""
+        commands = []
+        if source is not None:
+            commands.append(f"TSRC {int(source)}")
+        if rate is not None:
+            commands.append(f"TRAT {rate:g}")
+        if level is not None:
+            commands.append(f"TLVL {level:g}")
+        self.send(*commands)
+
+    def set_delay(self, channel, seconds, reference=0):
+        """Delay channel by seconds after reference (T0 by default)."""
+        self.set_delays({channel: (reference, seconds)})
+
+    def set_delays(self, delays):
+        """{channel: (reference, seconds)} in one round trip."""
+        self.send(*(delay_command(ch, t, ref) for ch, (ref, t) in delays.items()))
+
+    def delay(self, channel):
+        """(reference channel, seconds) currently set for channel."""
+        return parse_delay(self.query(f"DLAY?{channel_number(channel)}"))
+
+    # --------------------------------------------------------
+    # Delay scans
+    # --------------------------------------------------------
+
+    def sweep(self, channel, delays, acquire=None, reference=0):
+        """Step channel through delays, yielding (delay, acquire(delay)).
+
+        Each step is one round trip to the delay generator before acquire
+        runs (e.g. a scope digitize and transfer for a pump-probe scan).
+        """
+        for seconds in delays:
+            self.set_delay(channel, seconds, reference)
+            yield seconds, (acquire(seconds) if acquire is not None else None)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Completion-based settling for the Elliptec rotation mounts.
+
+Instead of sleeping a fixed time after every move, the controllers poll the
+mount position until it has stayed within tolerance of the target, and keep a
+record of how long each move actually took.  Moves on several mounts can be
+dispatched together and joined once, and the slowest mount sets the pace.
+The DLL's MoveAbsolute and Home hold the serial port until the move is done,
+so mounts sharing one bus could only move in turn through them; instead the
+raw "ma"/"ho" command is written to every address (the bus is held only for
+the write) and all mounts are then polled until they have settled.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import namedtuple
+
+SettleRecord = namedtuple("SettleRecord", "motor target position seconds")
+
+PULSES_PER_REV = 143360     # ELL14/ELL18 rotation mounts
+
+
+def move_command(address, angle, pulses_per_rev=PULSES_PER_REV):
+    """Raw absolute move, e.g. '1ma00008C00' for 90° on address 1."""
+    pulses = int(round((angle % 360.0) * pulses_per_rev / 360.0)) % pulses_per_rev
+    return f"{address}ma{pulses & 0xFFFFFFFF:08X}"
+
+
+def home_command(address, clockwise=False):
+    return f"{address}ho{0 if clockwise else 1}"
+
+
+def angular_error(position, target):
+    """Smallest distance between two angles in degrees (wraps at 360)."""
+    return abs((position - target + 180.0) % 360.0 - 180.0)
+
+
+def wait_for_position(read_position, target, tolerance=0.1, timeout=10.0,
+                      poll_interval=0.02, stable_reads=2):
+    """Poll read_position() until it settles on target.
+
+    The position has to be within tolerance for stable_reads consecutive
+    polls. Returns (position, seconds waited); raises TimeoutError if the
+    mount has not settled after timeout seconds.
+    """
+    start = time.perf_counter()
+    hits = 0
+    while True:
+        position = read_position()
+        if position is not None and angular_error(position, target) <= tolerance:
+            hits += 1
+            if hits >= stable_reads:
+                return position, time.perf_counter() - start
+        else:
+            hits = 0
+
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError(
+                f"Motor did not settle at {target}° within {timeout} s "
+                f"(last position {position})"
+            )
+        time.sleep(poll_interval)
+
+
+# ============================================================
+# Concurrent dispatch
+# ============================================================
+
+def run_concurrently(calls):
+    """Run (function, *args) tuples on one thread each and join them all.
+
+    Returns the results in order; the first exception is re-raised after
+    every call has finished, so no mount is left moving unobserved.
+    """
+    if not calls:
+        return []
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        futures = [pool.submit(call[0], *call[1:]) for call in calls]
+        errors = [f.exception() for f in futures]
+    for error in errors:
+        if error is not None:
+            raise error
+    return [f.result() for f in futures]
+
+
+def move_concurrently(moves):
+    """Move several mounts at once; moves are (controller, motor, angle).
+
+    Every move is started before any is waited for, so mounts on one bus
+    travel together.  Returns the settle time of every move, in order.
+    """
+    for ctrl, motor, angle in moves:
+        ctrl.move_motor_absolute(motor, angle, wait=False)
+    return run_concurrently(
+        [(ctrl.wait_settled, motor, angle) for ctrl, motor, angle in moves]
+    )
+
+
+def home_concurrently(homes):
+    """Home several mounts at once; homes are (controller, motor) pairs."""
+    for ctrl, motor in homes:
+        ctrl.home_motor(motor, wait=False)
+    return run_concurrently(
+        [(ctrl.wait_settled, motor, 0.0, ctrl.home_timeout) for ctrl, motor in homes]
+    )
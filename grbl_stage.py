@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""Persistent GRBL stage driver.
+
+One serial connection is kept open for the whole scan.  G-code is streamed
+with GRBL's character-counting protocol: lines are sent as long as the
+controller's 128 byte receive buffer has room, and every "ok"/"error" frees
+the space of the oldest line in flight.  Motion completion is detected from
+the "ok" to a zero dwell (G4 P0), which GRBL holds back until the planner has
+run empty, and the "?" real-time status report (state Idle) rather than
+fixed sleeps.
+"""
+
+import time
+from collections import deque
+
+import serial
+
+RX_BUFFER_SIZE = 128
+
+
+class GrblError(RuntimeError):
+    pass
+
+
+def parse_status(line):
+    """Parse a status report into (state, {field: value}).
+
+    Handles both the GRBL 1.1 form <Idle|MPos:0.000,0.000,0.000|FS:0,0>
+    and the 0.9 form <Idle,MPos:0.000,0.000,0.000,WPos:...>.
+    """
+    body = line.strip().lstrip("<").rstrip(">")
+    if "|" in body:
+        parts = body.split("|")
+        fields = dict(p.split(":", 1) for p in parts[1:] if ":" in p)
+        return parts[0], fields
+
+    state, _, rest = body.partition(",")
+    fields = {}
+    key = None
+    for token in rest.split(","):
+        if ":" in token:
+            key, token = token.split(":", 1)
+            fields[key] = token
+        elif key is not None:
+            fields[key] += "," + token
+    return state, fields
+
+
+class GrblStage:
+    """GRBL controller on a serial port (or anything pyserial can open)."""
+
+    def __init__(self, port, baudrate=115200, timeout=1.0, wake=True):
+        self.port = port
+        self.timeout = timeout
+        self.ser = serial.serial_for_url(port, baudrate=baudrate, timeout=0.05)
+        self._in_flight = deque()
+        self.last_status = None
+        self.messages = []
+        if wake:
+            self.wake()
+
+    # --------------------------------------------------------
+    # Connection
+    # --------------------------------------------------------
+
+    def wake(self, banner_timeout=3.0):
+        """Wake GRBL and wait for its banner instead of a fixed sleep."""
+        self.ser.write(b"\r\n\r\n")
+        deadline = time.perf_counter() + banner_timeout
+        while time.perf_counter() < deadline:
+            line = self._readline()
+            if line.startswith("Grbl"):
+                break
+        self.ser.reset_input_buffer()
+        self._in_flight.clear()
+
+    def close(self):
+        self.ser.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --------------------------------------------------------
+    # Streaming
+    # --------------------------------------------------------
+
+    def _readline(self):
+        return self.ser.readline().decode("ascii", errors="replace").strip()
+
+    def _handle(self, line):
+        """Dispatch one line received from GRBL."""
+        if not line:
+            return
+        if line == "ok" or line.startswith("error"):
+            sent = self._in_flight.popleft() if self._in_flight else None
+            if line.startswith("error"):
+                raise GrblError(f"GRBL rejected {sent[1]!r}: {line}" if sent else line)
+        elif line.startswith("<"):
+            self.last_status = parse_status(line)
+        elif line.startswith("ALARM"):
+            raise GrblError(line)
+        else:
+            self.messages.append(line)
+
+    def _wait_for_ack(self, timeout=None):
+        deadline = time.perf_counter() + (self.timeout if timeout is None else timeout)
+        pending = len(self._in_flight)
+        while len(self._in_flight) == pending:
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"No acknowledgement from GRBL on {self.port}")
+            self._handle(self._readline())
+
+    def send(self, line):
+        """Queue one G-code line, blocking only while GRBL's buffer is full."""
+        data = (line.strip() + "\n").encode("ascii")
+        while self._in_flight and \
+                sum(n for n, _ in self._in_flight) + len(data) > RX_BUFFER_SIZE:
+            self._wait_for_ack()
+        self.ser.write(data)
+        self._in_flight.append((len(data), line.strip()))
+
+    def stream(self, lines):
+        for line in lines:
+            self.send(line)
+        self.sync()
+
+    def sync(self, timeout=None):
+        """Wait until every line sent so far has been acknowledged."""
+        while self._in_flight:
+            self._wait_for_ack(timeout)
+
+    # --------------------------------------------------------
+    # Motion
+    # --------------------------------------------------------
+
+    def status(self):
+        """Request a real-time status report; returns (state, fields)."""
+        self.last_status = None
+        self.ser.write(b"?")
+        deadline = time.perf_counter() + self.timeout
+        while self.last_status is None:
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"No status report from GRBL on {self.port}")
+            self._handle(self._readline())
+        return self.last_status
+
+    def wait_idle(self, timeout=60.0, poll_interval=0.01):
+        """Block until all queued motion has finished; returns seconds waited.
+
+        A move is acknowledged as soon as it is planned and GRBL can still
+        report Idle before it starts, so a zero dwell goes first: G4 is only
+        acknowledged once the planner has run empty.
+        """
+        start = time.perf_counter()
+        self.send("G4 P0")
+        self.sync(timeout)
+        while True:
+            state, _ = self.status()
+            if state == "Idle":
+                return time.perf_counter() - start
+            if state.startswith("Alarm"):
+                raise GrblError("GRBL in alarm state while waiting for motion")
+            if time.perf_counter() - start > timeout:
+                raise TimeoutError(f"GRBL still {state} after {timeout} s")
+            time.sleep(poll_interval)
+
+    def move_relative(self, wait=True, feed=None, **axes):
+        """Rapid (or feed-rate) move by the given offsets, e.g. x=0.0025."""
+        words = " ".join(f"{axis.upper()}{delta:.4f}" for axis, delta in axes.items())
+        command = f"G91 G1 {words} F{feed}" if feed else f"G91 G0 {words}"
+        self.send(command)
+        if wait:
+            return self.wait_idle()
+
+    def position(self):
+        """Machine position from a fresh status report, as floats."""
+        _, fields = self.status()
+        return tuple(float(v) for v in fields.get("MPos", "").split(",") if v)
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""Live waveform view running in its own process.
+
+The acquisition loop calls LiveView.publish(), which reduces the waveform to
+a min/max envelope at screen resolution and copies it into a small ring of
+shared-memory slots.  publish() never waits: if the viewer is slow, older
+frames are simply overwritten.  The viewer process redraws at most fps times
+per second and always shows the newest complete frame, so plotting cost no
+longer grows with the sweep or stalls the instruments.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+TITLE_BYTES = 256
+
+
+def envelope(x, y, pixels=1000):
+    """Min/max envelope of y over pixels bins, as interleaved (x, y) points.
+
+    Drawing the result as one line shows every peak of the full record while
+    keeping the point count at 2 * pixels.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(y) <= 2 * pixels:
+        return x, y
+    per_bin = len(y) // pixels
+    n = per_bin * pixels
+    bins = y[:n].reshape(pixels, per_bin)
+    lo = bins.min(axis=1)
+    hi = bins.max(axis=1)
+    xs = x[:n:per_bin]
+    return np.repeat(xs, 2), np.column_stack((lo, hi)).ravel()
+
+
+class LiveView:
+    """Throttled live plot in a separate process fed through shared memory.
+
+    The viewer is started as a separate Python process running this module,
+    so it does not re-run the acquisition script the way a spawned
+    multiprocessing child would.
+    """
+
+    def __init__(self, xlabel="Time (s)", ylabel="Voltage (V)", xlim=None,
+                 ylim=None, fps=10, pixels=1000, slots=3):
+        self.options = dict(xlabel=xlabel, ylabel=ylabel, xlim=xlim, ylim=ylim,
+                            fps=fps, pixels=pixels, slots=slots)
+        self.pixels = pixels
+        self.slots = slots
+        self.points = 2 * pixels
+        self._shm = shared_memory.SharedMemory(create=True,
+                                               size=_layout_size(slots, pixels))
+        self._seq, self._frames, self._titles = _layout(self._shm, slots, pixels)
+        self._seq[:] = 0
+        self._next = 0
+        self.published = 0
+        self._process = None
+
+    def start(self):
+        self._process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), self._shm.name,
+             json.dumps(self.options)])
+        return self
+
+    def publish(self, x, y, title=""):
+        """Hand a waveform to the viewer without ever blocking."""
+        xs, ys = envelope(x, y, self.pixels)
+        n = min(len(ys), self.points)
+        slot = self._next % self.slots
+        self._next += 1
+
+        self._seq[slot] = -1        # mark the slot as being written
+        frame = self._frames[slot]
+        frame[0] = n
+        frame[1:1 + n] = xs[:n]
+        frame[1 + self.points:1 + self.points + n] = ys[:n]
+        text = title.encode("utf-8")[:TITLE_BYTES - 1]
+        self._titles[slot, :] = 0
+        self._titles[slot, :len(text)] = np.frombuffer(text, dtype=np.uint8)
+        self._seq[slot] = self._next
+        self.published += 1
+
+    def wait(self):
+        """Block until the user closes the plot window (keeps the last frame up)."""
+        if self._process is not None:
+            self._process.wait()
+
+    def close(self):
+        self._seq[self.slots] = 1   # stop flag
+        if self._process is not None:
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._seq = self._frames = self._titles = None
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ============================================================
+# Shared-memory layout
+# ============================================================
+# int64 sequence number per slot (-1 while being written) and a stop flag,
+# then per slot [n, x * points, y * points] as float64, then the titles.
+
+def _layout_size(slots, pixels):
+    return 8 * (slots + 1) + 8 * slots * (1 + 4 * pixels) + slots * TITLE_BYTES
+
+
+def _layout(shm, slots, pixels):
+    slot_size = 1 + 4 * pixels
+    seq = np.ndarray((slots + 1,), dtype=np.int64, buffer=shm.buf)
+    offset = 8 * (slots + 1)
+    frames = np.ndarray((slots, slot_size), dtype=np.float64, buffer=shm.buf,
+                        offset=offset)
+    offset += 8 * slots * slot_size
+    titles = np.ndarray((slots, TITLE_BYTES), dtype=np.uint8, buffer=shm.buf,
+                        offset=offset)
+    return seq, frames, titles
+
+
+# ============================================================
+# Viewer process
+# ============================================================
+
+_HEADLESS_BACKENDS = ("agg", "cairo", "pdf", "pgf", "ps", "svg", "template")
+
+
+def _viewer_main(shm_name, options):
+    import matplotlib.pyplot as plt
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    if os.name != "nt":
+        # the acquisition process owns the segment and unlinks it
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    if plt.get_backend().lower() in _HEADLESS_BACKENDS:
+        # no display (CI, simulated runs): frames are published but not shown
+        print("Live view: no display, plotting disabled.")
+        shm.close()
+        return
+    slots = options["slots"]
+    points = 2 * options["pixels"]
+    seq, frames, titles = _layout(shm, slots, options["pixels"])
+
+    plt.ion()
+    fig, ax = plt.subplots()
+    line, = ax.plot([], [])
+    ax.set_xlabel(options["xlabel"])
+    ax.set_ylabel(options["ylabel"])
+    if options["xlim"]:
+        ax.set_xlim(*options["xlim"])
+    if options["ylim"]:
+        ax.set_ylim(*options["ylim"])
+    plt.show(block=False)
+
+    period = 1.0 / options["fps"]
+    shown = 0
+    while not seq[slots] and plt.fignum_exists(fig.number):
+        tick = time.perf_counter()
+        newest = int(np.argmax(seq[:slots]))
+        number = seq[newest]
+        if number > shown:
+            frame = frames[newest].copy()
+            title = bytes(titles[newest]).rstrip(b"\0").decode("utf-8", "replace")
+            if seq[newest] == number:   # not overwritten while copying
+                n = int(frame[0])
+                line.set_data(frame[1:1 + n], frame[1 + points:1 + points + n])
+                if not options["xlim"] or not options["ylim"]:
+                    ax.relim()
+                    ax.autoscale_view(scalex=not options["xlim"],
+                                      scaley=not options["ylim"])
+                ax.set_title(title)
+                fig.canvas.draw_idle()
+                shown = number
+        plt.pause(max(period - (time.perf_counter() - tick), 0.001))
+
+    plt.close(fig)
+    del seq, frames, titles
+    shm.close()
+
+
+if __name__ == "__main__":
+    _viewer_main(sys.argv[1], json.loads(sys.argv[2]))
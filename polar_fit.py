@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""Streaming fit of the SHG polar pattern while a sweep is running.
+
+The pattern model is
+
+    I(theta) = A + B * cos^2(n*theta + phi)
+
+which is linear in A + B/2, (B/2)cos(2phi) and (B/2)sin(2phi) on the basis
+1, cos(2n*theta), sin(2n*theta).  Every new angle therefore costs one small
+least-squares solve, and A, B and phi with their standard errors follow from
+the coefficient covariance.  Extra harmonics of 2n can be added to the basis
+to absorb anisotropy the single-term model misses.
+
+A sweep can stop as soon as every parameter error is below its tolerance:
+
+    fit = PolarFit(n=3, tolerance={"A": 0.02, "B": 0.02, "phi": 1.0})
+    for angle in interleaved(angles):
+        fit.add(angle, measure(angle))
+        if fit.converged():
+            break
+"""
+
+import math
+import threading
+
+import numpy as np
+
+PARAMS = ("A", "B", "phi")
+
+
+def interleaved(angles):
+    """Angles reordered so that every prefix spreads over the whole range.
+
+    Bit-reversed (van der Corput) order: 0, 8, 4, 12, 2, ... of a 16-point
+    grid.  An early-stopped sweep then still covers the full pattern.
+    """
+    angles = list(angles)
+    bits = max(len(angles) - 1, 1).bit_length()
+    reverse = lambda i: int(format(i, f"0{bits}b")[::-1], 2)
+    return [angles[i] for i in sorted(range(len(angles)), key=reverse)]
+
+
+class PolarFit:
+    """Least-squares fit of A + B cos^2(n theta + phi), updated per point.
+
+    Angles are in degrees, phi is reported in degrees.  harmonics lists extra
+    multiples k of the fundamental 2n whose cos/sin terms join the basis;
+    A, B and phi are always taken from the fundamental.
+
+    tolerance maps "A", "B" and "phi" to the largest acceptable standard
+    error; with relative=True the A and B entries are fractions of |B|.
+    min_points is the fewest points converged() will accept.
+    """
+
+    def __init__(self, n=3, harmonics=(), tolerance=None, relative=True,
+                 min_points=None):
+        self.n = n
+        self.harmonics = tuple(harmonics)
+        self.tolerance = dict(tolerance or {})
+        self.relative = relative
+        self.terms = 1 + 2 * (1 + len(self.harmonics))
+        self.min_points = min_points or self.terms + 3
+        self.angles = []
+        self.values = []
+        self.weights = []
+        self.coef = None
+        self.cov = None
+        self._lock = threading.Lock()
+
+    # --------------------------------------------------------
+
+    def basis(self, angles):
+        x = np.deg2rad(np.asarray(angles, dtype=float)) * 2 * self.n
+        cols = [np.ones_like(x), np.cos(x), np.sin(x)]
+        for k in self.harmonics:
+            cols += [np.cos(k * x), np.sin(k * x)]
+        return np.column_stack(cols)
+
+    def add(self, angle, value, sigma=None):
+        """Add one point and refit; sigma weights it by 1/sigma^2."""
+        with self._lock:
+            self.angles.append(float(angle))
+            self.values.append(float(value))
+            self.weights.append(1.0 if not sigma else 1.0 / float(sigma))
+            self._solve()
+
+    def _solve(self):
+        n = len(self.values)
+        if n < self.terms:
+            return
+        w = np.asarray(self.weights)
+        X = self.basis(self.angles) * w[:, None]
+        y = np.asarray(self.values) * w
+        coef, _, rank, _ = np.linalg.lstsq(X, y, rcond=None)
+        if rank < self.terms:
+            return      # angles do not constrain every term yet
+        self.coef = coef
+        dof = n - self.terms
+        if dof == 0:
+            self.cov = None
+            return
+        # covariance scaled by the residual variance (as curve_fit does)
+        chi2 = float(np.sum((y - X @ coef) ** 2))
+        self.cov = np.linalg.inv(X.T @ X) * (chi2 / dof)
+
+    # --------------------------------------------------------
+
+    def predict(self, angles):
+        if self.coef is None:
+            raise RuntimeError("PolarFit: not enough points to fit yet")
+        return self.basis(angles) @ self.coef
+
+    def parameters(self):
+        """A, B and phi (degrees) with their standard errors, or None."""
+        with self._lock:
+            coef, cov = self.coef, self.cov
+        if coef is None:
+            return None
+        c0, c1, c2 = coef[:3]
+        r = math.hypot(c1, c2)
+        values = {"A": c0 - r, "B": 2 * r,
+                  "phi": math.degrees(math.atan2(-c2, c1) / 2)}
+        errors = dict.fromkeys(PARAMS, math.inf)
+        if cov is not None and r > 0:
+            jac = np.zeros((3, len(coef)))
+            jac[0, :3] = (1.0, -c1 / r, -c2 / r)
+            jac[1, :3] = (0.0, 2 * c1 / r, 2 * c2 / r)
+            jac[2, :3] = (0.0, c2 / (2 * r * r), -c1 / (2 * r * r))
+            jac[2] *= 180 / math.pi
+            var = np.einsum("ij,jk,ik->i", jac, cov, jac)
+            errors = dict(zip(PARAMS, np.sqrt(np.maximum(var, 0.0))))
+        return values, errors
+
+    def converged(self):
+        """True once every toleranced parameter error is within tolerance."""
+        if not self.tolerance or len(self.values) < self.min_points:
+            return False
+        fitted = self.parameters()
+        if fitted is None:
+            return False
+        values, errors = fitted
+        for key, tol in self.tolerance.items():
+            if self.relative and key in ("A", "B"):
+                tol = tol * abs(values["B"])
+            if not errors[key] <= tol:
+                return False
+        return True
+
+    def summary(self):
+        """Dict of the fit in the style of the analysis reducers."""
+        out = {"n": self.n, "points": len(self.values),
+               "converged": self.converged()}
+        fitted = self.parameters()
+        if fitted is not None:
+            values, errors = fitted
+            for key in PARAMS:
+                out[key] = float(values[key])
+                out[key + "_err"] = float(errors[key])
+            # analyzer angle of the first maximum, in [0, 180/n)
+            out["theta_max"] = float((-values["phi"] / self.n) % (180.0 / self.n))
+        return out
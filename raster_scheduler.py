@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""Serpentine raster scheduler for the EXR stage scans.
+
+The serpentine path yields its pixels as the scan goes, so even a 915 x 915
+raster takes no memory up front.  At every pixel the scheduler waits for the
+stage, triggers the scope, and as soon as the trigger has completed sends
+the stage on to the next pixel; the waveform transfer, storage and any other
+per-pixel work then run while the stage is travelling.  Running sums of the
+per-pixel timings (plus the last few pixel times, for a moving ETA) let the
+scan report its time-to-completion as it goes without memory growing with
+the scan, and project() sizes a scan before it is started.
+"""
+
+import time
+from collections import deque, namedtuple
+from types import MappingProxyType
+
+Pixel = namedtuple("Pixel", "z x move")
+
+STAGES = ("stage_wait", "trigger", "fetch", "process", "total")
+
+
+class SerpentinePath:
+    """Serpentine raster of Pixel(z, x, move to the next pixel).
+
+    Even rows run towards +X and odd rows back towards -X; x is the pixel's
+    column index, so the same column always maps to the same stage position.
+    The move is a read-only mapping of relative stage offsets (one of three
+    shared by all pixels), or None after the last pixel.  Pixels are made
+    while iterating; len() is n_z * n_x.
+    """
+
+    def __init__(self, n_z, n_x, step_x, step_z):
+        self.n_z = n_z
+        self.n_x = n_x
+        self.forward = MappingProxyType({"x": step_x})
+        self.back = MappingProxyType({"x": -step_x})
+        self.next_row = MappingProxyType({"z": step_z})
+
+    def __len__(self):
+        return self.n_z * self.n_x
+
+    def __iter__(self):
+        n_z, n_x = self.n_z, self.n_x
+        for z in range(n_z):
+            forward = z % 2 == 0
+            along = self.forward if forward else self.back
+            for j in range(n_x):
+                x = j if forward else n_x - 1 - j
+                if j < n_x - 1:
+                    move = along
+                elif z < n_z - 1:
+                    move = self.next_row
+                else:
+                    move = None
+                yield Pixel(z, x, move)
+
+
+def serpentine_path(n_z, n_x, step_x, step_z):
+    """Plan a serpentine raster; see SerpentinePath."""
+    return SerpentinePath(n_z, n_x, step_x, step_z)
+
+
+def project(n_z, n_x, trigger, transfer, move, row_move=None):
+    """Projected duration in seconds of an overlapped n_z x n_x raster.
+
+    trigger, transfer (fetch plus per-pixel processing), move and row_move
+    are per-pixel times in seconds; transfer overlaps the move, trigger
+    does not.
+    """
+    row_move = move if row_move is None else row_move
+    in_row = n_z * (n_x - 1) * (trigger + max(transfer, move))
+    row_ends = (n_z - 1) * (trigger + max(transfer, row_move))
+    return in_row + row_ends + trigger + transfer
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    text = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+    return f"{days}d {text}" if days else text
+
+
+class RasterScheduler:
+    """Run a planned raster with stage motion overlapping the data handling.
+
+    stage       needs move_relative(wait=False, **offsets) and wait_idle()
+    trigger()   blocking acquisition of one pixel
+    fetch()     transfer of the captured waveform
+    process     functions process(pixel, data) run while the stage moves
+                (storage, plotting, ...)
+    recent      number of latest pixels the ETA is averaged over
+    keep_timings  also keep every pixel's timings in self.timings (for
+                benchmarks; grows with the scan)
+    """
+
+    def __init__(self, stage, trigger, fetch, process=(), report_every=100,
+                 recent=1000, keep_timings=False):
+        self.stage = stage
+        self.trigger = trigger
+        self.fetch = fetch
+        self.process = list(process)
+        self.report_every = report_every
+        self.keep_timings = keep_timings
+        self.timings = []
+        self.sums = dict.fromkeys(STAGES, 0.0)
+        self.count = 0
+        self.recent = deque(maxlen=recent)
+
+    def _record(self, timing):
+        for k in STAGES:
+            self.sums[k] += timing[k]
+        self.count += 1
+        self.recent.append(timing["total"])
+        if self.keep_timings:
+            self.timings.append(timing)
+
+    def breakdown(self):
+        """Mean seconds per pixel for every stage of the loop."""
+        if self.count == 0:
+            return {}
+        return {k: self.sums[k] / self.count for k in STAGES}
+
+    def eta(self, remaining):
+        """Seconds left, at the mean pace of the most recent pixels."""
+        if not self.recent:
+            return 0.0
+        return remaining * sum(self.recent) / len(self.recent)
+
+    def report(self, done, total):
+        b = self.breakdown()
+        parts = ", ".join(f"{k} {b[k] * 1e3:.1f} ms" for k in STAGES)
+        print(f"{done}/{total} pixels | {parts} | "
+              f"ETA {format_duration(self.eta(total - done))}")
+
+    def run(self, path):
+        """Scan path (a SerpentinePath, or any sequence of Pixels)."""
+        total = len(path)
+        self.timings = []
+        self.sums = dict.fromkeys(STAGES, 0.0)
+        self.count = 0
+        self.recent.clear()
+        moving = False
+        for n, pixel in enumerate(path, start=1):
+            t0 = time.perf_counter()
+            if moving:
+                self.stage.wait_idle()
+            t1 = time.perf_counter()
+            self.trigger()
+            t2 = time.perf_counter()
+
+            # the stage heads for the next pixel while this one is handled
+            moving = pixel.move is not None
+            if moving:
+                self.stage.move_relative(wait=False, **pixel.move)
+            data = self.fetch()
+            t3 = time.perf_counter()
+            for step in self.process:
+                step(pixel, data)
+            t4 = time.perf_counter()
+
+            self._record({
+                "stage_wait": t1 - t0,
+                "trigger": t2 - t1,
+                "fetch": t3 - t2,
+                "process": t4 - t3,
+                "total": t4 - t0,
+            })
+            if self.report_every and n % self.report_every == 0:
+                self.report(n, total)
+
+        if moving:
+            self.stage.wait_idle()
+        return self.breakdown()
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+"""Appendable binary store for sweep runs.
+
+A run is a folder holding
+
+    run.json        layout of the run (record shape, dtype, row labels, kind)
+    waveforms.raw   fixed-size records of raw ADC codes, appended back to back
+    records.jsonl   one line per record: scaling of every row, motor angles
+                    and any other metadata, plus the wall-clock timestamp
+
+Records are written as they arrive, so a crash loses at most the record in
+flight, and RunReader memory-maps the raw file for random access without
+loading the run.  export_csv() writes the per-point CSV files the analysis
+scripts read.
+
+Raster scans, where every pixel has the same record length and the number of
+pixels is known up front, go to a RasterStore instead: one preallocated
+(z, x, samples) .npy that can be opened lazily while the scan is running.
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from scope_waveform import Preamble, Waveform
+
+RUN_FILE = "run.json"
+RAW_FILE = "waveforms.raw"
+RECORDS_FILE = "records.jsonl"
+
+
+def _jsonable(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    return value
+
+
+# ============================================================
+# Writer
+# ============================================================
+
+class RunStore:
+    """Append raw waveform records to a run folder.
+
+    kind is "channels" when the rows of a record are different scope channels
+    and "segments" when they are the shots of one segmented acquisition.
+    """
+
+    def __init__(self, folder, labels, kind="channels", attrs=None):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.header = {
+            "kind": kind,
+            "labels": list(labels),
+            "dtype": None,
+            "shape": None,
+            "created": time.time(),
+            "attrs": _jsonable(attrs or {}),
+        }
+        self.count = 0
+        self._raw = open(os.path.join(folder, RAW_FILE), "ab")
+        self._records = open(os.path.join(folder, RECORDS_FILE), "a", encoding="utf-8")
+        self._write_header()
+
+    def _write_header(self):
+        with open(os.path.join(self.folder, RUN_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.header, f, indent=2)
+
+    def append(self, raw, preambles=None, **meta):
+        """Store one record.
+
+        raw is a Waveform, or a (rows, samples) array of ADC codes (1-D for a
+        single row) with preambles holding one Preamble per row or a single
+        one shared by all rows; meta (angles, counters, ...) is kept with the
+        record.
+        """
+        if isinstance(raw, Waveform):
+            raw, preambles = raw.raw, raw.preambles
+        raw = np.atleast_2d(np.asarray(raw))
+        if isinstance(preambles, Preamble):
+            preambles = [preambles]
+
+        if self.header["shape"] is None:
+            self.header["dtype"] = raw.dtype.str
+            self.header["shape"] = list(raw.shape)
+            self._write_header()
+        elif list(raw.shape) != self.header["shape"]:
+            raise ValueError(
+                f"Record shape {raw.shape} does not match run shape "
+                f"{tuple(self.header['shape'])}"
+            )
+
+        raw.astype(np.dtype(self.header["dtype"]), copy=False).tofile(self._raw)
+        record = {
+            "index": self.count,
+            "time": time.time(),
+            "preambles": [p._asdict() for p in preambles],
+            "meta": _jsonable(meta),
+        }
+        self._records.write(json.dumps(record) + "\n")
+        self._raw.flush()
+        self._records.flush()
+        self.count += 1
+        return record["index"]
+
+    def close(self):
+        self._raw.close()
+        self._records.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ============================================================
+# Reader
+# ============================================================
+
+class RunReader:
+    """Random access to a run folder written by RunStore."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        with open(os.path.join(folder, RUN_FILE), encoding="utf-8") as f:
+            self.header = json.load(f)
+        with open(os.path.join(folder, RECORDS_FILE), encoding="utf-8") as f:
+            self.records = [json.loads(line) for line in f if line.strip()]
+
+        self.kind = self.header["kind"]
+        self.labels = self.header["labels"]
+        if self.header["shape"] is None:
+            self.raw = np.empty((0, 0, 0))
+            return
+
+        shape = tuple(self.header["shape"])
+        dtype = np.dtype(self.header["dtype"])
+        record_bytes = dtype.itemsize * int(np.prod(shape))
+        size = os.path.getsize(os.path.join(folder, RAW_FILE))
+        # a record still being written is not listed yet
+        n = min(len(self.records), size // record_bytes)
+        self.records = self.records[:n]
+        self.raw = np.memmap(os.path.join(folder, RAW_FILE), dtype=dtype,
+                             mode="r", shape=(n,) + shape)
+
+    def __len__(self):
+        return len(self.records)
+
+    def meta(self, i):
+        return self.records[i]["meta"]
+
+    def preambles(self, i):
+        return [Preamble(**p) for p in self.records[i]["preambles"]]
+
+    def waveform(self, i):
+        """Record i as a Waveform backed by the memory-mapped raw codes."""
+        return Waveform(self.raw[i], self.preambles(i))
+
+    def time_axis(self, i):
+        return self.waveform(i).time_axis()
+
+    def volts(self, i, dtype=np.float64):
+        """Record i as a (rows, samples) array in volts."""
+        return self.waveform(i).volts(dtype=dtype)
+
+    def find(self, **meta):
+        """Indices of the records whose metadata matches every key given."""
+        return [i for i, r in enumerate(self.records)
+                if all(np.isclose(r["meta"].get(k, np.nan), v)
+                       if isinstance(v, (int, float)) else r["meta"].get(k) == v
+                       for k, v in meta.items())]
+
+    def index_by(self, key):
+        """Map metadata value -> list of record indices, e.g. by motor angle."""
+        out = {}
+        for i, r in enumerate(self.records):
+            out.setdefault(r["meta"].get(key), []).append(i)
+        return out
+
+    def points(self, key="batch"):
+        """Record indices grouped by measurement point.
+
+        A point averaged over several segmented acquisitions is stored as one
+        record per batch, tagged with a batch number in key; records that
+        only differ in key form one group.  Untagged records stay single.
+        """
+        groups = {}
+        out = []
+        for i, r in enumerate(self.records):
+            meta = r["meta"]
+            if key not in meta:
+                out.append([i])
+                continue
+            point = json.dumps({k: v for k, v in meta.items() if k != key},
+                               sort_keys=True)
+            if point not in groups:
+                groups[point] = []
+                out.append(groups[point])
+            groups[point].append(i)
+        return out
+
+    def point_volts(self, indices, dtype=np.float64):
+        """Rows of several records (the batches of one point) stacked."""
+        return np.vstack([self.volts(i, dtype) for i in indices])
+
+
+# ============================================================
+# Raster scans
+# ============================================================
+
+RASTER_FILE = "raster.json"
+RASTER_DATA = "raster.npy"
+RASTER_MASK = "filled.npy"
+
+
+class RasterStore:
+    """Preallocated, disk-backed (z, x, samples) array for raster scans.
+
+    The sample array is created as a memory-mapped .npy on the first write,
+    once the record length is known, so memory use does not grow with the
+    scan. filled.npy marks the pixels written so far; both files and
+    raster.json are flushed every flush_every pixels so open_raster() can
+    follow a scan that is still running.
+    """
+
+    def __init__(self, folder, shape, dtype=np.int8, flush_every=1000, attrs=None):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.flush_every = flush_every
+        self.count = 0
+        self.data = None
+        self.header = {
+            "shape": list(self.shape),
+            "dtype": self.dtype.str,
+            "samples": None,
+            "preamble": None,
+            "filled": 0,
+            "created": time.time(),
+            "attrs": _jsonable(attrs or {}),
+        }
+        self.mask = np.lib.format.open_memmap(
+            os.path.join(folder, RASTER_MASK), mode="w+", dtype=np.uint8,
+            shape=self.shape)
+        self._write_header()
+
+    def _write_header(self):
+        self.header["filled"] = self.count
+        self.header["updated"] = time.time()
+        path = os.path.join(self.folder, RASTER_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.header, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def write(self, z, x, samples, preamble=None):
+        samples = np.asarray(samples)
+        if self.data is None:
+            self.header["samples"] = len(samples)
+            self.data = np.lib.format.open_memmap(
+                os.path.join(self.folder, RASTER_DATA), mode="w+",
+                dtype=self.dtype, shape=self.shape + (len(samples),))
+        if preamble is not None and self.header["preamble"] is None:
+            self.header["preamble"] = preamble._asdict()
+
+        self.data[z, x, :] = samples
+        self.mask[z, x] = 1
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self.flush()
+
+    def flush(self):
+        if self.data is not None:
+            self.data.flush()
+        self.mask.flush()
+        self._write_header()
+
+    def close(self):
+        self.flush()
+        self.data = None
+        self.mask = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_raster(folder):
+    """Open a raster scan read-only and lazily: (data, filled mask, header).
+
+    data is None until the first pixel has been flushed.
+    """
+    with open(os.path.join(folder, RASTER_FILE), encoding="utf-8") as f:
+        header = json.load(f)
+    mask = np.load(os.path.join(folder, RASTER_MASK), mmap_mode="r")
+    data_path = os.path.join(folder, RASTER_DATA)
+    data = np.load(data_path, mmap_mode="r") if os.path.exists(data_path) else None
+    return data, mask, header
+
+
+# ============================================================
+# CSV export
+# ============================================================
+
+def export_csv(folder, out_folder=None, filename=None,
+               time_label="Time (s)", baseline_points=50):
+    """Write every record of a run as a CSV file in the sweep-script layout.
+
+    Channel records become time plus one column per channel; segmented
+    records become time, shot std and the shot mean (after outlier
+    rejection); the batches of an adaptively averaged point are merged
+    first. With baseline_points the last column has the mean of its first
+    samples removed, as the sweep scripts do. filename is formatted with the
+    record metadata and its index; by default segmented records are named
+    record_<index>_shots.csv so the two column layouts are never confused.
+    """
+    from shot_stats import summarize_shots
+
+    run = RunReader(folder)
+    if filename is None:
+        filename = "record_{index}_shots.csv" if run.kind == "segments" \
+            else "record_{index}.csv"
+    out_folder = out_folder or folder
+    os.makedirs(out_folder, exist_ok=True)
+
+    paths = []
+    for group in run.points():
+        i = group[0]
+        t = run.time_axis(i)
+        volts = run.point_volts(group)
+        if run.kind == "segments":
+            stats = summarize_shots(volts)
+            columns = [stats.std, stats.mean]
+            labels = ["Shot std (V)", run.labels[-1]]
+        else:
+            columns = list(volts)
+            labels = run.labels
+        if baseline_points:
+            columns[-1] = columns[-1] - np.mean(columns[-1][:baseline_points])
+
+        path = os.path.join(out_folder, filename.format(index=i, **run.meta(i)))
+        np.savetxt(path, np.column_stack([t] + columns), delimiter=",",
+                   header=", ".join([time_label] + labels), comments="")
+        paths.append(path)
+    return paths
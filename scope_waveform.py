@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""Waveform preamble layer for the Keysight EXR scripts.
+
+The scope classes in the acquisition scripts wrap their pyvisa resource in a
+ScopeLink.  The link counts every write and query, watches the commands that
+go past to know when the waveform setup or the scaling may have changed, and
+keeps a per-channel cache of the :WAVeform:PREamble? result so an acquisition
+only pays for the data query unless something actually changed.
+"""
+
+import re
+from collections import namedtuple
+
+import numpy as np
+
+# ============================================================
+# Preamble
+# ============================================================
+
+# First ten fields of the Infiniium :WAVeform:PREamble? response
+Preamble = namedtuple(
+    "Preamble",
+    "format type points count xinc xorg xref yinc yorg yref"
+)
+
+
+def parse_preamble(text):
+    """Parse the comma separated :WAVeform:PREamble? response."""
+    fields = text.strip().split(",")
+    if len(fields) < 10:
+        raise ValueError(f"Unexpected preamble response: {text!r}")
+    return Preamble(
+        format=int(float(fields[0])),
+        type=int(float(fields[1])),
+        points=int(float(fields[2])),
+        count=int(float(fields[3])),
+        xinc=float(fields[4]),
+        xorg=float(fields[5]),
+        xref=float(fields[6]),
+        yinc=float(fields[7]),
+        yorg=float(fields[8]),
+        yref=float(fields[9]),
+    )
+
+
+# ============================================================
+# Waveform setup cache
+# ============================================================
+
+_CHANNEL_NODE = re.compile(r"CHAN(?:NEL)?(\d+)")
+
+
+class WaveformCache:
+    """Tracks what the scope's :WAVeform subsystem is currently set to.
+
+    The cache is driven by observe(), which sees every command sent to the
+    scope.  Anything that can change the record length or the scaling drops
+    the affected preambles; *RST forgets everything.  Queries (headers
+    ending in "?") only read settings and leave the cache alone.
+    """
+
+    def __init__(self):
+        self.format = None
+        self.source = None
+        self.preambles = {}
+
+    def reset(self):
+        self.format = None
+        self.source = None
+        self.preambles.clear()
+
+    def invalidate(self, channel=None):
+        if channel is None:
+            self.preambles.clear()
+        else:
+            self.preambles.pop(channel, None)
+
+    def observe(self, command):
+        header = command.strip().split(" ", 1)[0].lstrip(":").upper()
+        if header.endswith("?"):
+            return
+        nodes = header.split(":")
+        root = nodes[0]
+
+        if root.startswith("*RST") or root.startswith("AUT"):
+            self.reset()
+        elif root.startswith("TIM") or root.startswith("ACQ"):
+            self.invalidate()
+        elif root.startswith("CHAN"):
+            match = _CHANNEL_NODE.match(root)
+            self.invalidate(int(match.group(1)) if match else None)
+        elif root.startswith("WAV") and len(nodes) > 1:
+            if nodes[1].startswith("SOUR"):
+                match = _CHANNEL_NODE.search(command.upper().split(" ", 1)[-1])
+                self.source = int(match.group(1)) if match else None
+            elif nodes[1].startswith(("FORM", "UNS", "POIN", "BYT")):
+                self.format = None
+                self.invalidate()
+
+
+# ============================================================
+# Counting link
+# ============================================================
+
+class ScopeLink:
+    """Wraps a pyvisa resource, counting round trips and feeding the cache."""
+
+    def __init__(self, resource):
+        self.resource = resource
+        self.cache = WaveformCache()
+        self.writes = 0
+        self.queries = 0
+
+    @property
+    def timeout(self):
+        return self.resource.timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        self.resource.timeout = value
+
+    def __getattr__(self, name):
+        return getattr(self.resource, name)
+
+    def write(self, command):
+        self.writes += 1
+        self.cache.observe(command)
+        return self.resource.write(command)
+
+    def query(self, command):
+        self.queries += 1
+        self.cache.observe(command)
+        return self.resource.query(command)
+
+    def query_binary_values(self, command, **kwargs):
+        self.queries += 1
+        return self.resource.query_binary_values(command, **kwargs)
+
+    def counters(self):
+        return {"writes": self.writes, "queries": self.queries}
+
+    # --------------------------------------------------------
+    # Cached waveform setup
+    # --------------------------------------------------------
+
+    def ensure_format(self, fmt, unsigned):
+        """Send the :WAVeform format block only if it is not already set."""
+        key = (fmt, int(unsigned))
+        if self.cache.format == key:
+            return
+        self.write(f":WAVeform:FORMat {fmt}")
+        self.write(f":WAVeform:UNSigned {int(unsigned)}")
+        self.write(":WAVeform:POINts:MODE RAW")
+        self.write(":WAVeform:POINts MAX")
+        self.cache.format = key
+
+    def ensure_source(self, channel):
+        if self.cache.source != channel:
+            self.write(f":WAVeform:SOURce CHAN{channel}")
+
+    def preamble(self, channel):
+        """Return the scaling for channel, querying the scope only on a miss."""
+        pre = self.cache.preambles.get(channel)
+        if pre is None:
+            self.ensure_source(channel)
+            pre = parse_preamble(self.query(":WAVeform:PREamble?"))
+            self.cache.preambles[channel] = pre
+        return pre
+
+
+# ============================================================
+# Scaling helpers
+# ============================================================
+
+def to_volts(raw, pre, dtype=np.float64):
+    dtype = np.dtype(dtype).type
+    return (np.asarray(raw).astype(dtype) - dtype(pre.yref)) * dtype(pre.yinc) \
+        + dtype(pre.yorg)
+
+
+def time_axis(pre, n_points):
+    return pre.xorg + np.arange(n_points) * pre.xinc
+
+
+def window_range(pre, t_start, t_stop):
+    """(first, size) of the samples of pre's record inside t_start..t_stop."""
+    first = max(int(np.floor((t_start - pre.xorg) / pre.xinc)), 0)
+    last = min(int(np.ceil((t_stop - pre.xorg) / pre.xinc)), pre.points - 1)
+    if last < first:
+        raise ValueError(f"Window {t_start:g}..{t_stop:g} s lies outside the record")
+    return first, last - first + 1
+
+
+def window_preamble(pre, first, size):
+    """Scaling of a start,size transfer: same volts, shifted time origin."""
+    return pre._replace(points=size, xorg=pre.xorg + first * pre.xinc)
+
+
+# ============================================================
+# Raw waveform result
+# ============================================================
+
+class Waveform:
+    """Raw ADC codes as transferred, plus the scaling to turn them into volts.
+
+    raw is (samples,) or (rows, samples), where rows are channels (one
+    Preamble each) or segments of one channel (a single shared Preamble).
+    Keeping the integer codes costs 1-2 bytes per sample instead of 8; volts
+    are only computed when asked for, in float32 unless stated otherwise.
+    """
+
+    def __init__(self, raw, preambles):
+        self.raw = np.asarray(raw)
+        if isinstance(preambles, Preamble):
+            preambles = [preambles]
+        self.preambles = list(preambles)
+
+    @property
+    def samples(self):
+        return self.raw.shape[-1]
+
+    @property
+    def nbytes(self):
+        return self.raw.nbytes
+
+    def time_axis(self):
+        return time_axis(self.preambles[0], self.samples)
+
+    def volts(self, row=None, dtype=np.float32):
+        """Volts of one row, or of the whole block when row is None."""
+        if row is not None:
+            pre = self.preambles[row] if len(self.preambles) > 1 else self.preambles[0]
+            return to_volts(self.raw[row], pre, dtype)
+        if len(self.preambles) == 1:
+            return to_volts(self.raw, self.preambles[0], dtype)
+        return np.vstack([to_volts(r, p, dtype)
+                          for r, p in zip(self.raw, self.preambles)])
+
+    def segments(self, count):
+        """View a one-channel segmented transfer as (count, samples)."""
+        return Waveform(self.raw.reshape(count, -1), self.preambles[0])
+
+
+def round_trips_since(link, before):
+    """Difference between two ScopeLink.counters() snapshots."""
+    now = link.counters()
+    return {key: now[key] - before[key] for key in now}
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""Opt-in per-command latency metrics for SCPI instruments.
+
+InstrumentedResource sits between the scope code and the pyvisa resource
+and times every write, query and binary transfer.  ScpiMetrics keeps, per
+command header (arguments stripped, so ":CHANnel8:INVert ON" and
+":CHANnel8:INVert OFF" share one entry), a latency histogram, the bytes
+sent and received, errors, and how many calls came close to the resource
+timeout; binary blocks also get their throughput in MB/s.  At the end of a
+run the metrics go to a JSON file or a Prometheus text-format file.
+
+    metrics = ScpiMetrics()
+    scope = ScopeLink(InstrumentedResource(rm.open_resource(addr), metrics))
+    ...
+    metrics.report()
+    metrics.to_json("scpi_metrics.json")
+    metrics.to_prometheus("scpi_metrics.prom")
+"""
+
+import copy
+import json
+import math
+import threading
+import time
+
+# histogram bucket upper bounds in seconds (Prometheus "le")
+BUCKETS = (1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1,
+           0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+
+
+def command_key(command):
+    """Command header without arguments, e.g. ':WAVeform:DATA?'."""
+    return command.strip().split(" ", 1)[0]
+
+
+class CommandStats:
+    """Latency histogram and byte counts of one command header."""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.count = 0
+        self.seconds = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.errors = 0
+        self.near_timeout = 0
+        self.max_timeout_fraction = 0.0
+
+    def add(self, seconds, sent, received, timeout_s, near, failed):
+        self.count += 1
+        self.seconds += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        self.bytes_sent += sent
+        self.bytes_received += received
+        self.errors += int(failed)
+        if timeout_s:
+            fraction = seconds / timeout_s
+            self.max_timeout_fraction = max(self.max_timeout_fraction, fraction)
+            self.near_timeout += int(fraction >= near)
+
+    def quantile(self, q):
+        """Upper bucket bound below which a fraction q of the calls fell."""
+        if self.count == 0:
+            return math.nan
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS, self.buckets):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def throughput(self):
+        """Received MB/s over the time spent in this command."""
+        if self.seconds == 0 or self.bytes_received == 0:
+            return 0.0
+        return self.bytes_received / self.seconds / 1e6
+
+    def as_dict(self):
+        return {
+            "kind": self.kind,
+            "count": self.count,
+            "seconds": self.seconds,
+            "mean": self.seconds / self.count if self.count else math.nan,
+            "min": self.min if self.count else math.nan,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": {("+Inf" if math.isinf(b) else repr(b)): n
+                        for b, n in zip(BUCKETS, self.buckets)},
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "throughput_MBps": self.throughput(),
+            "errors": self.errors,
+            "near_timeout": self.near_timeout,
+            "max_timeout_fraction": self.max_timeout_fraction,
+        }
+
+
+class ScpiMetrics:
+    """Collected per-command statistics of one or more instruments.
+
+    A call counts as near the timeout when it took at least near_timeout
+    times the resource's timeout setting.
+    """
+
+    def __init__(self, near_timeout=0.5):
+        self.near = near_timeout
+        self.commands = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, kind, command, seconds, sent=0, received=0, timeout_ms=None,
+               failed=False):
+        key = command_key(command)
+        timeout_s = timeout_ms / 1000.0 if timeout_ms else None
+        with self._lock:
+            stats = self.commands.get(key)
+            if stats is None:
+                stats = self.commands[key] = CommandStats(kind)
+            stats.add(seconds, sent, received, timeout_s, self.near, failed)
+
+    def _snapshot(self):
+        """Copies of the per-command stats, sorted by command."""
+        with self._lock:
+            return [(k, copy.deepcopy(s)) for k, s in sorted(self.commands.items())]
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "started": self.started,
+                "finished": time.time(),
+                "near_timeout": self.near,
+                "commands": {k: s.as_dict() for k, s in self.commands.items()},
+            }
+
+    def report(self):
+        """Print the commands, slowest total first."""
+        rows = sorted(self._snapshot(), key=lambda kv: -kv[1].seconds)
+        print(f"{'command':<28}{'calls':>7}{'total s':>9}{'mean ms':>9}"
+              f"{'max ms':>9}{'MB/s':>8}{'near TO':>8}{'err':>5}")
+        for key, s in rows:
+            mbps = f"{s.throughput():8.1f}" if s.bytes_received and s.kind == "binary" \
+                else f"{'':>8}"
+            print(f"{key[:27]:<28}{s.count:>7}{s.seconds:>9.3f}"
+                  f"{s.seconds / s.count * 1e3:>9.3f}{s.max * 1e3:>9.3f}{mbps}"
+                  f"{s.near_timeout:>8}{s.errors:>5}")
+
+    def to_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+    def to_prometheus(self, path, instrument="scope"):
+        """Write the metrics in the Prometheus text exposition format."""
+        def label(key, **extra):
+            key = key.replace("\\", "\\\\").replace('"', '\\"')
+            parts = [f'instrument="{instrument}"', f'command="{key}"']
+            parts += [f'{k}="{v}"' for k, v in extra.items()]
+            return "{" + ",".join(parts) + "}"
+
+        lines = [
+            "# HELP scpi_command_duration_seconds SCPI call latency.",
+            "# TYPE scpi_command_duration_seconds histogram",
+        ]
+        items = self._snapshot()
+        for key, s in items:
+            cumulative = 0
+            for bound, n in zip(BUCKETS, s.buckets):
+                cumulative += n
+                le = "+Inf" if math.isinf(bound) else repr(bound)
+                lines.append(f"scpi_command_duration_seconds_bucket{label(key, le=le)} "
+                             f"{cumulative}")
+            lines.append(f"scpi_command_duration_seconds_sum{label(key)} {s.seconds!r}")
+            lines.append(f"scpi_command_duration_seconds_count{label(key)} {s.count}")
+
+        for name, help_text, kind, attr in (
+                ("scpi_bytes_sent_total", "Bytes written.", "counter", "bytes_sent"),
+                ("scpi_bytes_received_total", "Bytes read.", "counter", "bytes_received"),
+                ("scpi_errors_total", "Failed calls (timeouts, I/O errors).", "counter",
+                 "errors"),
+                ("scpi_near_timeout_total", "Calls above the near-timeout fraction.",
+                 "counter", "near_timeout"),
+                ("scpi_max_timeout_fraction", "Slowest call over the timeout.", "gauge",
+                 "max_timeout_fraction")):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, s in items:
+                lines.append(f"{name}{label(key)} {getattr(s, attr)!r}")
+
+        lines.append("# HELP scpi_throughput_megabytes_per_second Binary block throughput.")
+        lines.append("# TYPE scpi_throughput_megabytes_per_second gauge")
+        for key, s in items:
+            if s.kind == "binary":
+                lines.append(f"scpi_throughput_megabytes_per_second{label(key)} "
+                             f"{s.throughput()!r}")
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+class InstrumentedResource:
+    """pyvisa resource proxy that records every call in a ScpiMetrics."""
+
+    def __init__(self, resource, metrics):
+        self.resource = resource
+        self.metrics = metrics
+
+    @property
+    def timeout(self):
+        return self.resource.timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        self.resource.timeout = value
+
+    def __getattr__(self, name):
+        return getattr(self.resource, name)
+
+    def _timed(self, kind, command, call, size, sent=None):
+        timeout = getattr(self.resource, "timeout", None)
+        sent = len(command) + 1 if sent is None else sent
+        t0 = time.perf_counter()
+        try:
+            result = call()
+        except Exception:
+            self.metrics.record(kind, command, time.perf_counter() - t0,
+                                sent, 0, timeout, failed=True)
+            raise
+        self.metrics.record(kind, command, time.perf_counter() - t0,
+                            sent, size(result), timeout)
+        return result
+
+    def write(self, command):
+        return self._timed("write", command, lambda: self.resource.write(command),
+                           lambda r: 0)
+
+    def query(self, command):
+        return self._timed("query", command, lambda: self.resource.query(command),
+                           lambda r: len(r))
+
+    def query_binary_values(self, command, **kwargs):
+        return self._timed(
+            "binary", command,
+            lambda: self.resource.query_binary_values(command, **kwargs),
+            lambda r: getattr(r, "nbytes", None) or
+            len(r) * _itemsize(kwargs.get("datatype", "f")))
+
+    def write_ascii_values(self, command, values, **kwargs):
+        return self._timed(
+            "write", command,
+            lambda: self.resource.write_ascii_values(command, values, **kwargs),
+            lambda r: 0,
+            sent=len(command) + len(_ascii_block(values, **kwargs)) + 1)
+
+
+def _ascii_block(values, converter="f", separator=",", **kwargs):
+    """The values as pyvisa's write_ascii_values formats them."""
+    if isinstance(separator, str):
+        separator = separator.join
+    if isinstance(converter, str):
+        return separator(("%" + converter) % v for v in values)
+    return separator(converter(v) for v in values)
+
+
+def _itemsize(datatype):
+    return {"b": 1, "B": 1, "h": 2, "H": 2, "i": 4, "I": 4, "f": 4, "d": 8}.get(datatype, 1)
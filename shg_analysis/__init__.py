@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+"""Analysis of SHG waveform folders (polarization and power sweeps)."""
+
+from .integration import (
+    BatchResult, batch_integrate, group_by_grid, integrate_all, window_indices
+)
+from .ingest import CsvCache, load_files, load_folder, read_columns
+from .extractors import FieldExtractor, MetadataExtractor, RegexExtractor
+from .pipeline import (
+    Sweep, analyze, choose_window, integrate_sweep, load_sweep, pick_window
+)
+from .reducers import REDUCERS, PolarPlot, PowerLawFit
+from .window import METHODS, WindowChoice, detect_window, mean_waveform, plot_window
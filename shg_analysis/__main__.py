@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Command line for batch analysis of SHG sweep folders.
+
+    python -m shg_analysis DATA_FOLDER [...] --field 5 --reducer polar \\
+        --out results
+
+Every folder is processed in the same process.  The integration window is
+detected on each folder's mean waveform unless --window or --pick is given;
+without --show and --pick the plots are only written to --out, so the command
+runs unattended on a headless machine.
+"""
+
+import argparse
+import sys
+
+
+def build_parser():
+    p = argparse.ArgumentParser(prog="python -m shg_analysis",
+                                description="Integrate and reduce SHG sweep folders.")
+    p.add_argument("folders", nargs="+",
+                   help="CSV folders or run folders written by RunStore")
+
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--field", type=int,
+                     help="underscore-separated file-name field holding the sweep value")
+    src.add_argument("--regex", help="regular expression whose first group is the value")
+    src.add_argument("--meta", help="run-store metadata key holding the value")
+    p.add_argument("--label", default=None, help="name of the sweep variable")
+
+    p.add_argument("--reducer", choices=["polar", "power"], default="polar")
+    p.add_argument("--exponent", type=float, default=2.0,
+                   help="power-law exponent (power reducer)")
+    p.add_argument("--fit-exponent", action="store_true",
+                   help="fit the exponent too (power reducer)")
+    p.add_argument("--title", default=None, help="plot title")
+
+    p.add_argument("--baseline-end", type=float, default=0.5e-12,
+                   help="end of the pre-pulse baseline region (s)")
+    win = p.add_mutually_exclusive_group()
+    win.add_argument("--window", type=float, nargs=2, metavar=("START", "END"),
+                     help="integration window (s); overrides the detection")
+    win.add_argument("--pick", action="store_true",
+                     help="click the window on the first waveform")
+    p.add_argument("--detect", choices=["threshold", "fwhm", "matched"],
+                   default="threshold", help="automatic window method")
+    p.add_argument("--n-sigma", type=float, default=5.0,
+                   help="pulse threshold in baseline noise sigmas")
+    p.add_argument("--squared", action="store_true",
+                   help="integrate the squared signal (detector ~ |E|^2)")
+
+    p.add_argument("--pattern", default="*.csv")
+    p.add_argument("--source", choices=["run", "csv"], default=None,
+                   help="read run folders from the run store or from their CSV "
+                        "files (default: run store for --meta, CSV otherwise)")
+    p.add_argument("--workers", type=int, default=None, help="CSV parsing processes")
+    p.add_argument("--no-cache", action="store_true", help="ignore the .shg_cache sidecar")
+    p.add_argument("--out", default=None, help="folder for CSV/JSON/PNG results")
+    p.add_argument("--show", action="store_true", help="show each plot")
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    import matplotlib
+    if not args.show and not args.pick:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    from .extractors import FieldExtractor, MetadataExtractor, RegexExtractor
+    from .pipeline import analyze
+    from .reducers import PolarPlot, PowerLawFit
+
+    label = args.label or ("angle" if args.reducer == "polar" else "power")
+    if args.field is not None:
+        extractor = FieldExtractor(args.field, label=label)
+    elif args.regex is not None:
+        extractor = RegexExtractor(args.regex, label=label)
+    else:
+        extractor = MetadataExtractor(args.meta, label=args.label)
+
+    if args.reducer == "polar":
+        reducer = PolarPlot(**({"title": args.title} if args.title else {}))
+    else:
+        reducer = PowerLawFit(exponent=args.exponent, fit_exponent=args.fit_exponent,
+                              **({"title": args.title} if args.title else {}))
+
+    failed = []
+    for folder in args.folders:
+        print(f"=== {folder}")
+        try:
+            result = analyze(folder, extractor, reducer, args.baseline_end,
+                             window="pick" if args.pick else args.window,
+                             window_method=args.detect, n_sigma=args.n_sigma,
+                             squared=args.squared,
+                             out_folder=args.out, pattern=args.pattern,
+                             source=args.source,
+                             workers=args.workers, cache=not args.no_cache)
+        except Exception as e:
+            print(f"FAILED {folder}: {e}")
+            failed.append(folder)
+            continue
+        print(f"{result['count']} points: {result['summary']}")
+        if args.show:
+            plt.show()
+        plt.close("all")
+
+    if failed:
+        print(f"{len(failed)} of {len(args.folders)} folders failed")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Sweep-variable extractors.
+
+An extractor is called as extractor(name, meta) for every waveform of a
+folder and returns the sweep value (angle, power, ...) as a float, or None
+when the waveform has none.  name is the file name for CSV folders and
+"record_<index>" for run folders, where meta is the record's metadata.
+Extractors with uses_metadata = True are given the run store records of a
+run folder; the others are given its CSV files.
+"""
+
+import os
+import re
+
+
+class FieldExtractor:
+    """Value from an underscore-separated field of the file name.
+
+    MoS2_SHG_60_power10.csv with index=2 gives 60.0.
+    """
+
+    uses_metadata = False
+
+    def __init__(self, index, sep="_", label="value"):
+        self.index = index
+        self.sep = sep
+        self.label = label
+
+    def __call__(self, name, meta=None):
+        parts = os.path.splitext(name)[0].split(self.sep)
+        try:
+            return float(parts[self.index])
+        except (IndexError, ValueError):
+            return None
+
+
+class RegexExtractor:
+    """Value from a regular expression group matched against the file name.
+
+    RegexExtractor(r"_(\\d+)deg") reads the angle of waveform_45deg.csv.
+    """
+
+    uses_metadata = False
+
+    def __init__(self, pattern, group=1, label="value"):
+        self.pattern = re.compile(pattern)
+        self.group = group
+        self.label = label
+
+    def __call__(self, name, meta=None):
+        m = self.pattern.search(name)
+        if m is None:
+            return None
+        try:
+            return float(m.group(self.group))
+        except (IndexError, ValueError):
+            return None
+
+
+class MetadataExtractor:
+    """Value of a key in the run-store metadata (e.g. "A" for motor A)."""
+
+    uses_metadata = True
+
+    def __init__(self, key, label=None):
+        self.key = key
+        self.label = label or key
+
+    def __call__(self, name, meta=None):
+        if not meta or meta.get(self.key) is None:
+            return None
+        try:
+            return float(meta[self.key])
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Parallel, cached loading of waveform CSV folders.
+
+Only the needed columns are parsed (time and signal, columns 0 and 2 by
+default).  Parsed columns are kept next to the data in a .shg_cache folder,
+one .npy per file, with an index keyed by file name, size and modification
+time, so re-running an analysis only parses files that are new or changed.
+Files that do need parsing are spread over a process pool.
+
+On Windows the pool re-imports the calling script in every worker, so
+scripts that call load_files() must keep their work under
+if __name__ == "__main__".
+"""
+
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = ".shg_cache"
+INDEX_FILE = "index.json"
+
+
+def read_columns(path, usecols=(0, 2)):
+    """Parse the given columns of one CSV file into a (columns, samples) array."""
+    df = pd.read_csv(path, usecols=list(usecols), engine="c")
+    return np.ascontiguousarray(df.to_numpy(dtype=np.float64).T)
+
+
+def _file_key(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+class CsvCache:
+    """Sidecar cache of parsed CSV columns for one folder."""
+
+    def __init__(self, folder, usecols=(0, 2)):
+        self.dir = os.path.join(folder, CACHE_DIR)
+        self.usecols = [int(c) for c in usecols]
+        self.suffix = ".c" + "-".join(str(c) for c in self.usecols) + ".npy"
+        self.changed = False
+        try:
+            with open(os.path.join(self.dir, INDEX_FILE), encoding="utf-8") as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def _entry(self, path):
+        return os.path.basename(path) + self.suffix
+
+    def get(self, path):
+        """Cached columns of path, or None if missing or stale."""
+        name = self._entry(path)
+        if self.index.get(name) != _file_key(path):
+            return None
+        try:
+            return np.load(os.path.join(self.dir, name))
+        except (OSError, ValueError):
+            return None
+
+    def put(self, path, data):
+        name = self._entry(path)
+        try:
+            os.makedirs(self.dir, exist_ok=True)
+            np.save(os.path.join(self.dir, name), data)
+        except OSError as e:
+            print(f"Could not cache {os.path.basename(path)}: {e}")
+            return
+        self.index[name] = _file_key(path)
+        self.changed = True
+
+    def save(self):
+        if not self.changed:
+            return
+        path = os.path.join(self.dir, INDEX_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.index, f)
+        os.replace(path + ".tmp", path)
+        self.changed = False
+
+
+def load_files(paths, usecols=(0, 2), workers=None, cache=True):
+    """Columns of every file as a list of (columns, samples) arrays.
+
+    Cached files are read from their sidecar; the rest are parsed in a
+    process pool of `workers` processes (os.cpu_count() by default, 1 parses
+    in this process) and cached for next time.
+    """
+    paths = list(paths)
+    caches = {}
+    out = [None] * len(paths)
+    missing = []
+    for i, path in enumerate(paths):
+        if cache:
+            folder = os.path.dirname(os.path.abspath(path))
+            if folder not in caches:
+                caches[folder] = CsvCache(folder, usecols)
+            out[i] = caches[folder].get(path)
+        if out[i] is None:
+            missing.append(i)
+
+    if len(missing) > 1 and workers != 1:
+        workers = workers or os.cpu_count() or 1
+        chunk = max(1, len(missing) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = pool.map(read_columns, [paths[i] for i in missing],
+                              [usecols] * len(missing), chunksize=chunk)
+            for i, data in zip(missing, parsed):
+                out[i] = data
+    else:
+        for i in missing:
+            out[i] = read_columns(paths[i], usecols)
+
+    if cache:
+        for i in missing:
+            caches[os.path.dirname(os.path.abspath(paths[i]))].put(paths[i], out[i])
+        for c in caches.values():
+            c.save()
+
+    print(f"Loaded {len(paths)} files ({len(missing)} parsed, "
+          f"{len(paths) - len(missing)} from cache)")
+    return out
+
+
+def load_folder(folder, pattern="*.csv", **kwargs):
+    """Sorted file list of a folder and the columns of every file."""
+    paths = sorted(glob.glob(os.path.join(folder, pattern)))
+    return paths, load_files(paths, **kwargs)
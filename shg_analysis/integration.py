@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Vectorized baseline subtraction and window integration.
+
+Waveforms that share a time grid are stacked into one (n, samples) array.
+The baseline region (t < baseline_end) and the integration window
+(t_start < t < t_end) become index ranges once, via searchsorted on the
+shared grid, and every baseline, integral and squared integral is computed in
+a single pass over the stack.  Waveforms on different grids are grouped by
+grid and each group is handled the same way.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+BatchResult = namedtuple("BatchResult", "baseline integral integral_sq")
+
+
+def window_indices(t, baseline_end, t_start, t_end):
+    """Index ranges matching t < baseline_end and t_start < t < t_end.
+
+    t must be increasing. Returns (baseline_stop, window_start, window_stop).
+    """
+    baseline_stop = np.searchsorted(t, baseline_end, side="left")
+    window_start = np.searchsorted(t, t_start, side="right")
+    window_stop = np.searchsorted(t, t_end, side="left")
+    return baseline_stop, window_start, window_stop
+
+
+def batch_integrate(t, signals, baseline_end, t_start, t_end):
+    """Baseline, integral and squared integral of every row of signals.
+
+    t is the shared time grid and signals an (n, samples) array. Rows get
+    NaN where the baseline region or the integration window is empty.
+    """
+    signals = np.atleast_2d(signals)
+    n = len(signals)
+    b_stop, w_start, w_stop = window_indices(t, baseline_end, t_start, t_end)
+
+    if b_stop == 0:
+        baseline = np.full(n, np.nan)
+    else:
+        baseline = signals[:, :b_stop].mean(axis=1)
+    if w_stop - w_start < 1:
+        nan = np.full(n, np.nan)
+        return BatchResult(baseline, nan, nan.copy())
+
+    window = signals[:, w_start:w_stop] - baseline[:, None]
+    tw = t[w_start:w_stop]
+    return BatchResult(
+        baseline,
+        np.trapezoid(window, tw, axis=1),
+        np.trapezoid(window ** 2, tw, axis=1),
+    )
+
+
+def group_by_grid(times):
+    """Group indices of time arrays that are the same grid.
+
+    Returns a list of (grid, [indices]) in order of first appearance.
+    """
+    groups = []
+    keys = {}
+    for i, t in enumerate(times):
+        t = np.asarray(t)
+        key = (len(t), float(t[0]), float(t[-1])) if len(t) else (0, 0.0, 0.0)
+        for g in keys.get(key, ()):
+            if np.array_equal(groups[g][0], t):
+                groups[g][1].append(i)
+                break
+        else:
+            keys.setdefault(key, []).append(len(groups))
+            groups.append((t, [i]))
+    return groups
+
+
+def integrate_all(times, signals, baseline_end, t_start, t_end):
+    """batch_integrate over waveforms that may sit on different grids.
+
+    times and signals are sequences of 1-D arrays (one pair per waveform).
+    Returns a BatchResult of arrays in the original order.
+    """
+    n = len(signals)
+    baseline = np.full(n, np.nan)
+    integral = np.full(n, np.nan)
+    integral_sq = np.full(n, np.nan)
+    for grid, idx in group_by_grid(times):
+        stack = np.vstack([signals[i] for i in idx])
+        res = batch_integrate(grid, stack, baseline_end, t_start, t_end)
+        baseline[idx] = res.baseline
+        integral[idx] = res.integral
+        integral_sq[idx] = res.integral_sq
+    return BatchResult(baseline, integral, integral_sq)
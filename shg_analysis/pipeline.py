@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""Shared load -> baseline -> integrate -> reduce pipeline.
+
+A folder is either a folder of waveform CSV files (time in column 0, signal
+in column 2) or a run folder written by run_store.RunStore.  The extractor
+gives every waveform its sweep value, all waveforms are integrated in one
+batch, and the reducer (polar plot, power-law fit, ...) makes the result.
+Run folders usually also hold the CSV copies written by export_csv; the run
+store is read for extractors that use the record metadata, the CSV files for
+the ones that read file names.
+"""
+
+import glob
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from .ingest import load_files
+from .integration import integrate_all
+from .window import WindowChoice, detect_window, mean_waveform, plot_window
+
+Sweep = namedtuple("Sweep", "values names times signals")
+
+
+def _is_run_folder(folder):
+    from run_store import RUN_FILE
+    return os.path.exists(os.path.join(folder, RUN_FILE))
+
+
+def _load_run(folder, extractor):
+    from run_store import RunReader
+    from shot_stats import summarize_shots
+
+    run = RunReader(folder)
+    values, names, times, signals = [], [], [], []
+    for group in run.points():
+        i = group[0]
+        name = f"record_{i}"
+        value = extractor(name, run.meta(i))
+        if value is None:
+            print(f"Skipping {name}: no {extractor.label} in its metadata")
+            continue
+        volts = run.point_volts(group)
+        # the SHG signal is the last row, as in export_csv
+        signal = summarize_shots(volts).mean if run.kind == "segments" else volts[-1]
+        values.append(value)
+        names.append(name)
+        times.append(run.time_axis(i))
+        signals.append(signal)
+    return Sweep(values, names, times, signals)
+
+
+def _source(folder, extractor, source):
+    if source not in (None, "run", "csv"):
+        raise ValueError(f"Unknown source {source!r}; use 'run' or 'csv'")
+    if source is None:
+        uses_meta = getattr(extractor, "uses_metadata", False)
+        source = "run" if uses_meta and _is_run_folder(folder) else "csv"
+    if source == "run" and not _is_run_folder(folder):
+        raise RuntimeError(f"{folder} is not a run folder")
+    return source
+
+
+def load_sweep(folder, extractor, pattern="*.csv", usecols=(0, 2), workers=None,
+               cache=True, source=None):
+    """Sweep values and waveforms of a CSV folder or a run folder.
+
+    source is "run" for the run store, "csv" for the CSV files, or None to
+    read the run store only for a metadata extractor.
+    """
+    if not os.path.isdir(folder):
+        raise FileNotFoundError(f"No such folder: {folder}")
+    if _source(folder, extractor, source) == "run":
+        sweep = _load_run(folder, extractor)
+    else:
+        values, paths = [], []
+        for path in sorted(glob.glob(os.path.join(folder, pattern))):
+            value = extractor(os.path.basename(path))
+            if value is None:
+                print(f"Skipping {os.path.basename(path)}: no {extractor.label} in the name")
+                continue
+            values.append(value)
+            paths.append(path)
+        columns = load_files(paths, usecols=usecols, workers=workers, cache=cache)
+        sweep = Sweep(values, [os.path.basename(p) for p in paths],
+                      [c[0] for c in columns], [c[1] for c in columns])
+    if len(sweep.values) == 0:
+        hint = " (a run folder: a metadata key may work)" \
+            if _is_run_folder(folder) and source is None else ""
+        raise RuntimeError(f"No waveforms with a {extractor.label} found in "
+                           f"{folder}{hint}")
+    return sweep
+
+
+def check_baseline(sweep, baseline_end, min_samples=2):
+    """Raise if no waveform has min_samples before baseline_end.
+
+    The baseline noise and offset come from those samples, so the window
+    detection and the integration cannot run without them.
+    """
+    counts = [np.searchsorted(t, baseline_end) for t in sweep.times]
+    if max(counts) >= min_samples:
+        return
+    t = np.asarray(sweep.times[int(np.argmax(counts))])
+    suggest = t[min(50, len(t) - 1)]
+    raise RuntimeError(
+        f"Only {max(counts)} sample(s) before the baseline end {baseline_end:g} s "
+        f"(records start at {t[0]:.4g} s, {t[1] - t[0]:.3g} s per sample); set "
+        f"baseline_end (--baseline-end) to the end of the pre-pulse region, "
+        f"e.g. {suggest:.3g} s for 50 samples")
+
+
+def pick_window(t, signal, baseline_end, xlim=None):
+    """Let the user click the start and end of the pulse; (t_start, t_end)."""
+    import matplotlib.pyplot as plt
+
+    baseline = np.mean(signal[t < baseline_end])
+    plt.figure(figsize=(7, 4))
+    plt.plot(t, signal - baseline)
+    if xlim:
+        plt.xlim(*xlim)
+    plt.xlabel("Time (s)")
+    plt.ylabel("Signal (baseline subtracted)")
+    plt.title("Click START then END of SHG pulse")
+    points = plt.ginput(2)
+    plt.close()
+    return min(p[0] for p in points), max(p[0] for p in points)
+
+
+def integrate_sweep(sweep, baseline_end, window, squared=False):
+    """Integrated intensity per sweep value, sorted by value.
+
+    Waveforms whose window or baseline is empty are reported and dropped.
+    """
+    result = integrate_all(sweep.times, sweep.signals, baseline_end, *window)
+    intensities = result.integral_sq if squared else result.integral
+
+    valid = np.isfinite(intensities)
+    no_baseline = ~np.isfinite(result.baseline)
+    for name, empty_base in zip(np.array(sweep.names)[~valid], no_baseline[~valid]):
+        if empty_base:
+            print(f"WARNING: no baseline samples before {baseline_end:g} s in {name}")
+        else:
+            print(f"WARNING: empty window for {name}")
+    values = np.asarray(sweep.values, dtype=float)[valid]
+    intensities = intensities[valid]
+    if len(intensities) == 0:
+        raise RuntimeError("No intensities integrated")
+
+    order = np.argsort(values, kind="stable")
+    return values[order], intensities[order]
+
+
+def choose_window(sweep, baseline_end, window=None, method="threshold",
+                  n_sigma=5.0, preview_xlim=None):
+    """Integration window for a sweep and how it was chosen.
+
+    window=None detects it on the mean waveform, "pick" asks for two clicks
+    on the first waveform, and a (t_start, t_end) pair is used as given.
+    Returns ((t_start, t_end), WindowChoice or None).
+    """
+    if window is None:
+        t, mean = mean_waveform(sweep.times, sweep.signals)
+        try:
+            choice = detect_window(t, mean, baseline_end, method, n_sigma)
+        except ValueError as e:
+            raise RuntimeError(f"Window detection failed ({e}); pass the window "
+                               f"explicitly or pick it") from e
+        print(f"Detected window ({choice.method}): {choice.start:.4g} – "
+              f"{choice.end:.4g} s, peak at {choice.peak:.4g} s, SNR {choice.snr:.1f}")
+        return (choice.start, choice.end), choice
+    if isinstance(window, str) and window == "pick":
+        window = pick_window(sweep.times[0], sweep.signals[0], baseline_end,
+                             preview_xlim)
+    print(f"Integration window: {window[0]:.4g} – {window[1]:.4g} s")
+    return tuple(window), None
+
+
+def analyze(folder, extractor, reducer, baseline_end, window=None, squared=False,
+            out_folder=None, preview_xlim=None, window_method="threshold",
+            n_sigma=5.0, **load_kwargs):
+    """Run the whole pipeline on one folder; returns the result dict.
+
+    window is None to detect it automatically (see shg_analysis.window),
+    "pick" to click it on the first waveform, or (t_start, t_end) in
+    seconds. With out_folder, the intensities (CSV), the summary (JSON), the
+    reducer's figure and the window plot (PNG) are written there, named
+    after the folder.
+    """
+    sweep = load_sweep(folder, extractor, **load_kwargs)
+    check_baseline(sweep, baseline_end)
+    window, choice = choose_window(sweep, baseline_end, window, window_method,
+                                   n_sigma, preview_xlim)
+
+    values, intensities = integrate_sweep(sweep, baseline_end, window, squared)
+    summary, fig = reducer(values, intensities)
+    result = {
+        "folder": os.path.abspath(folder),
+        "reducer": reducer.name,
+        "window": [float(window[0]), float(window[1])],
+        "window_method": choice.method if choice else "manual",
+        "baseline_end": baseline_end,
+        "squared": squared,
+        "count": len(values),
+        "summary": summary,
+    }
+
+    if out_folder:
+        os.makedirs(out_folder, exist_ok=True)
+        stem = os.path.join(out_folder, f"{os.path.basename(os.path.normpath(folder))}"
+                                        f"_{reducer.name}")
+        np.savetxt(stem + ".csv", np.column_stack([values, intensities]),
+                   delimiter=",", header=f"{extractor.label},intensity", comments="")
+        with open(stem + ".json", "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        fig.savefig(stem + ".png", dpi=150)
+        t, mean = mean_waveform(sweep.times, sweep.signals)
+        window_fig = plot_window(t, mean, baseline_end, choice or
+                                 WindowChoice(*window, "manual", np.nan, np.nan))
+        window_fig.savefig(stem + "_window.png", dpi=150)
+    result["values"] = values
+    result["intensities"] = intensities
+    result["figure"] = fig
+    return result
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Reducers turning (sweep values, integrated intensities) into a result.
+
+A reducer is called as reducer(values, intensities) with values sorted and
+returns (summary, figure): a dict of fitted or derived numbers and the
+matplotlib figure it drew.  pyplot is imported on use so a headless caller
+can select its backend first.
+"""
+
+import numpy as np
+
+
+class PolarPlot:
+    """Normalized polar plot of the intensity against polarization angle."""
+
+    name = "polar"
+
+    def __init__(self, title="SHG Polarization – Monolayer MoS₂", normalize=True):
+        self.title = title
+        self.normalize = normalize
+
+    def __call__(self, values, intensities):
+        import matplotlib.pyplot as plt
+
+        if self.normalize:
+            intensities = intensities / intensities.max()
+        theta = np.deg2rad(values)
+
+        fig = plt.figure(figsize=(6, 6))
+        ax = fig.add_subplot(111, projection="polar")
+        ax.plot(theta, intensities, "o-", lw=2)
+        ax.set_theta_zero_location("E")
+        ax.set_theta_direction(-1)
+        ax.set_title(self.title)
+
+        peak = int(np.argmax(intensities))
+        summary = {"max_angle": float(values[peak]),
+                   "contrast": float(intensities.min() / intensities.max())}
+        return summary, fig
+
+
+class PowerLawFit:
+    """Fit of the intensity against power with A + B * x**n.
+
+    n is fixed to `exponent` (2 for SHG) unless fit_exponent is set, in
+    which case it is fitted as well.
+    """
+
+    name = "power"
+
+    def __init__(self, exponent=2.0, fit_exponent=False, normalize=True,
+                 title="SHG Power Dependence", xlabel="Power [uw]"):
+        self.exponent = exponent
+        self.fit_exponent = fit_exponent
+        self.normalize = normalize
+        self.title = title
+        self.xlabel = xlabel
+
+    def model(self, x, A, B, n=None):
+        return A + B * x ** (self.exponent if n is None else n)
+
+    def __call__(self, values, intensities):
+        import matplotlib.pyplot as plt
+        from scipy.optimize import curve_fit
+
+        if self.normalize:
+            intensities = intensities / intensities.max()
+
+        p0 = [0.0, 1.0 / max(np.max(values) ** self.exponent, 1e-300)]
+        if self.fit_exponent:
+            p0.append(self.exponent)
+        popt, pcov = curve_fit(self.model, values, intensities, p0=p0, maxfev=10000)
+        perr = np.sqrt(np.diag(pcov))
+
+        summary = {"A": float(popt[0]), "B": float(popt[1]),
+                   "A_err": float(perr[0]), "B_err": float(perr[1]),
+                   "n": float(popt[2]) if self.fit_exponent else self.exponent}
+        if self.fit_exponent:
+            summary["n_err"] = float(perr[2])
+
+        print("Fit parameters:")
+        for key in ("A", "B", "n"):
+            print(f"{key} = {summary[key]:.5f}")
+
+        fig = plt.figure(figsize=(6, 5))
+        ax = fig.add_subplot(111)
+        ax.scatter(values, intensities, s=60, label="Data")
+        x_fit = np.linspace(min(values), max(values), 500)
+        ax.plot(x_fit, self.model(x_fit, *popt), "r-", lw=2,
+                label=f"Fit: A + Bx^{summary['n']:.2g}")
+        ax.set_xlabel(self.xlabel)
+        ax.set_ylabel("Normalized SHG Intensity [a.u]")
+        ax.set_title(self.title)
+        ax.legend()
+        ax.grid(True)
+        fig.tight_layout()
+        return summary, fig
+
+
+REDUCERS = {"polar": PolarPlot, "power": PowerLawFit}
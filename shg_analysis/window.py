@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""Automatic choice of the integration window.
+
+The window is found on the mean waveform of a folder, after subtracting the
+baseline (t < baseline_end) and estimating its noise with a robust (MAD)
+standard deviation.  Three methods:
+
+    threshold   the contiguous run of samples around the peak that stays
+                above n_sigma times the baseline noise
+    fwhm        the peak's full width at half maximum, widened by `widths`
+    matched     the boxcar with the highest signal-to-noise ratio, i.e. a
+                matched filter for a flat-topped pulse in white noise
+
+Every window is padded by `pad` times its width on both sides so the pulse
+tails are kept.  For a negative-going pulse the signal is flipped first.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .integration import group_by_grid
+
+WindowChoice = namedtuple("WindowChoice", "start end method peak snr")
+
+METHODS = ("threshold", "fwhm", "matched")
+
+
+def mean_waveform(times, signals):
+    """(t, mean signal) over the waveforms on the most common time grid."""
+    grid, idx = max(group_by_grid(times), key=lambda g: len(g[1]))
+    return grid, np.mean([signals[i] for i in idx], axis=0)
+
+
+def _prepare(t, signal, baseline_end):
+    t = np.asarray(t, dtype=float)
+    signal = np.asarray(signal, dtype=float)
+    base = signal[t < baseline_end]
+    if len(base) < 2:
+        raise ValueError(f"No baseline samples before {baseline_end:g} s")
+    y = signal - np.mean(base)
+    sigma = 1.4826 * np.median(np.abs(base - np.median(base)))
+    if sigma == 0:
+        sigma = np.std(base) or np.finfo(float).eps
+    if abs(y.min()) > abs(y.max()):
+        y = -y
+    return t, y, sigma
+
+
+def _threshold(y, sigma, peak, n_sigma):
+    above = y > n_sigma * sigma
+    if not above[peak]:
+        return peak, peak + 1
+    lo = peak - np.argmin(above[peak::-1]) + 1 if not above[:peak + 1].all() else 0
+    hi = peak + np.argmin(above[peak:]) if not above[peak:].all() else len(y)
+    return lo, hi
+
+
+def _fwhm(y, peak, widths):
+    half = y[peak] / 2.0
+    above = y > half
+    lo = peak - np.argmin(above[peak::-1]) + 1 if not above[:peak + 1].all() else 0
+    hi = peak + np.argmin(above[peak:]) if not above[peak:].all() else len(y)
+    extra = int(round((hi - lo) * (widths - 1) / 2.0))
+    return lo - extra, hi + extra
+
+
+def _matched(y, sigma, max_width):
+    """Boxcar [lo, hi) maximising sum(y) / (sigma * sqrt(width))."""
+    c = np.concatenate(([0.0], np.cumsum(y)))
+    best = (-np.inf, 0, 1)
+    width = 1
+    while width <= max_width:
+        sums = c[width:] - c[:-width]
+        i = int(np.argmax(sums))
+        snr = sums[i] / (sigma * np.sqrt(width))
+        if snr > best[0]:
+            best = (snr, i, i + width)
+        width = max(width + 1, int(width * 1.25))
+    return best[1], best[2]
+
+
+def detect_window(t, signal, baseline_end, method="threshold", n_sigma=5.0,
+                  widths=1.5, pad=0.25, max_width=None):
+    """Integration window (start, end) in seconds for one waveform.
+
+    Returns a WindowChoice with the method used, the time of the peak and
+    the SNR of the pulse area in the window. Raises ValueError when the
+    baseline region is empty or no pulse rises above n_sigma.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown window method {method!r}, use one of {METHODS}")
+    t, y, sigma = _prepare(t, signal, baseline_end)
+    search = t >= baseline_end
+    if not search.any():
+        raise ValueError(f"No samples after the baseline end {baseline_end:g} s")
+    first = int(np.argmax(search))
+    ys = y[first:]
+    peak = int(np.argmax(ys))
+    if ys[peak] < n_sigma * sigma:
+        raise ValueError(f"No pulse above {n_sigma:g} sigma of the baseline noise")
+
+    if method == "threshold":
+        lo, hi = _threshold(ys, sigma, peak, n_sigma)
+    elif method == "fwhm":
+        lo, hi = _fwhm(ys, peak, widths)
+    else:
+        lo, hi = _matched(ys, sigma, max_width or len(ys) // 4)
+
+    extra = int(np.ceil((hi - lo) * pad))
+    lo = max(lo - extra, 0) + first
+    hi = min(hi + extra, len(ys)) + first
+    snr = y[lo:hi].sum() / (sigma * np.sqrt(hi - lo))
+    # integrate_all keeps samples strictly inside (start, end)
+    start = t[lo - 1] if lo > 0 else t[0] - (t[1] - t[0])
+    end = t[hi] if hi < len(t) else t[-1] + (t[-1] - t[-2])
+    return WindowChoice(float(start), float(end), method, float(t[first + peak]),
+                        float(snr))
+
+
+def plot_window(t, signal, baseline_end, choice, ax=None):
+    """Mean waveform with the baseline region and chosen window shaded."""
+    import matplotlib.pyplot as plt
+
+    if ax is None:
+        fig, ax = plt.subplots(figsize=(7, 4))
+    base = np.mean(np.asarray(signal)[np.asarray(t) < baseline_end])
+    ax.plot(t, np.asarray(signal) - base, lw=1)
+    ax.axvspan(t[0], baseline_end, color="0.85", label="baseline")
+    ax.axvspan(choice.start, choice.end, color="tab:orange", alpha=0.3,
+               label=f"window ({choice.method})")
+    ax.set_xlabel("Time (s)")
+    ax.set_ylabel("Signal (baseline subtracted)")
+    ax.set_title(f"Integration window, SNR {choice.snr:.1f}")
+    ax.legend()
+    return ax.figure
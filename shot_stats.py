@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Host-side statistics for batches of single-shot waveforms.
+
+Used with segmented-memory acquisitions, where the scope hands back every
+trigger of a batch as one (shots, samples) array instead of the on-scope mean.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+ShotSummary = namedtuple("ShotSummary", "mean std sem kept metric")
+
+
+def reject_outliers(values, n_sigma=5.0):
+    """Boolean mask of values within n_sigma robust deviations of the median."""
+    values = np.asarray(values, dtype=float)
+    median = np.median(values)
+    mad = 1.4826 * np.median(np.abs(values - median))
+    if mad == 0:
+        return np.ones(values.shape, dtype=bool)
+    return np.abs(values - median) <= n_sigma * mad
+
+
+def summarize_shots(shots, n_sigma=5.0, baseline_points=50):
+    """Average a (shots, samples) batch after dropping outlier shots.
+
+    Shots are judged on their baseline-subtracted sum, which tracks the pulse
+    area. Pass n_sigma=None to keep every shot.
+    """
+    shots = np.asarray(shots)
+    baseline = shots[:, :baseline_points].mean(axis=1, keepdims=True)
+    metric = (shots - baseline).sum(axis=1)
+
+    if n_sigma is None:
+        kept = np.ones(len(shots), dtype=bool)
+    else:
+        kept = reject_outliers(metric, n_sigma)
+
+    good = shots[kept]
+    mean = good.mean(axis=0)
+    std = good.std(axis=0, ddof=1) if len(good) > 1 else np.zeros_like(mean)
+    sem = std / np.sqrt(len(good))
+    return ShotSummary(mean, std, sem, kept, metric)
+
+
+def shot_integrals(shots, dt, baseline_points=50):
+    """Baseline-subtracted integral of every shot of a (shots, samples) batch."""
+    shots = np.asarray(shots)
+    baseline = shots[:, :baseline_points].mean(axis=1, keepdims=True)
+    return (shots - baseline).sum(axis=1) * dt
+
+
+def integral_noise(shots, dt, baseline_points=50):
+    """Per-shot spread of shot_integrals due to the baseline noise alone.
+
+    The sample noise is taken from the pre-pulse points of every shot; with
+    n samples per shot the baseline-subtracted sum of shot_integrals has a
+    variance of sigma^2 * n * (n - baseline_points) / baseline_points.
+    """
+    shots = np.asarray(shots)
+    sigma = np.median(shots[:, :baseline_points].std(axis=1, ddof=1))
+    n = shots.shape[1]
+    return float(sigma * np.sqrt(n * (n - baseline_points) / baseline_points) * dt)
+
+
+class ShotTarget:
+    """Decides when a point has been averaged enough.
+
+    Per-shot integrals are added batch by batch; the point is done once the
+    standard error of their mean is at or below target (a fraction of |mean|
+    with relative=True) and at least min_shots were taken, or once max_shots
+    is reached.  Outlier shots are left out as in summarize_shots.
+
+    floor is an absolute SEM that is always good enough: with relative=True
+    a point whose mean is near zero (a node of the polar pattern) would
+    otherwise always run to max_shots.
+    """
+
+    def __init__(self, target, min_shots=64, max_shots=4096, relative=False,
+                 n_sigma=5.0, floor=0.0):
+        self.target = target
+        self.floor = floor
+        self.min_shots = min_shots
+        self.max_shots = max_shots
+        self.relative = relative
+        self.n_sigma = n_sigma
+        self.integrals = np.empty(0)
+
+    def add(self, integrals):
+        self.integrals = np.concatenate((self.integrals, np.ravel(integrals)))
+
+    @property
+    def count(self):
+        return len(self.integrals)
+
+    def _kept(self):
+        if self.n_sigma is None or self.count < 3:
+            return self.integrals
+        return self.integrals[reject_outliers(self.integrals, self.n_sigma)]
+
+    @property
+    def mean(self):
+        kept = self._kept()
+        return float(kept.mean()) if len(kept) else np.nan
+
+    @property
+    def sem(self):
+        kept = self._kept()
+        if len(kept) < 2:
+            return np.inf
+        return float(kept.std(ddof=1) / np.sqrt(len(kept)))
+
+    def limit(self):
+        """SEM the point has to reach."""
+        limit = self.target * abs(self.mean) if self.relative else self.target
+        return max(limit, self.floor)
+
+    def done(self):
+        if self.count >= self.max_shots:
+            return True
+        return self.count >= self.min_shots and self.sem <= self.limit()
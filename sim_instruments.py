@@ -0,0 +1,727 @@
+# -*- coding: utf-8 -*-
+"""Simulated instruments for running the acquisition code without hardware.
+
+PtyGrbl is a GRBL stand-in on a pseudo-terminal (Linux/macOS): it answers the
+streaming protocol ("ok" per line), real-time "?" status reports, and takes
+as long to finish a move as a real stage would at the configured rate.  As
+on GRBL, a G4 dwell is acknowledged only once the motion before it is done,
+and with start_delay a move still reports Idle for a while after its "ok".
+
+SimScope is a pyvisa resource answering the SCPI subset the Oscilloscope
+classes use, with IEEE 488.2 binary blocks and modelled round-trip, transfer
+and acquisition times; SimResourceManager hands it out in place of
+pyvisa.ResourceManager.  SimElliptecDll provides the Thorlabs ELLO_DLL names
+(ELLDevicePort, ELLDevices, ELLBaseDevice, NetDecimal) with mounts that take
+a configurable time to move, so the ElliptecController code runs unchanged.
+SimDelayGenerator is a delay generator on a local TCP port.
+
+The sweep scripts switch to these when SHG_SIMULATE=1 is set.
+"""
+
+import os
+import re
+import socket
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+try:
+    import tty
+except ImportError:     # Windows: no pseudo-terminals, PtyGrbl is unavailable
+    tty = None
+
+# ============================================================
+# GRBL stage
+# ============================================================
+
+_WORD = re.compile(r"([A-Z])([-+]?\d*\.?\d+)")
+
+
+class PtyGrbl:
+    """GRBL 1.1 stand-in; open GrblStage(PtyGrbl().port) against it."""
+
+    def __init__(self, rapid_mm_per_min=500.0, accel_time=0.005, start_delay=0.0):
+        self.rapid = rapid_mm_per_min
+        self.accel_time = accel_time
+        self.start_delay = start_delay
+        self.position = [0.0, 0.0, 0.0]
+        self.absolute = True
+        self.lines = []
+        self._moves = deque()       # (start, end time, position after the move)
+        self._busy_until = 0.0
+        self._lock = threading.Lock()
+
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._running = False
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --------------------------------------------------------
+
+    def _reply(self, text):
+        os.write(self._master, (text + "\r\n").encode("ascii"))
+
+    def _state(self):
+        now = time.perf_counter()
+        with self._lock:
+            while self._moves and self._moves[0][1] <= now:
+                _, _, self.position = self._moves.popleft()
+            state = "Run" if self._moves and self._moves[0][0] <= now else "Idle"
+            pos = ",".join(f"{p:.3f}" for p in self.position)
+        return f"<{state}|MPos:{pos}|FS:0,0>"
+
+    def _execute(self, line):
+        """Plan one line; returns the time its "ok" is due."""
+        self.lines.append(line)
+        words = dict(_WORD.findall(line.upper()))
+        codes = re.findall(r"G(\d+)", line.upper())
+        if "90" in codes:
+            self.absolute = True
+        if "91" in codes:
+            self.absolute = False
+        if "4" in codes and "P" in words:
+            # a dwell waits for the planner to run empty before its "ok"
+            with self._lock:
+                done = self._busy_until
+            self._schedule(None, float(words["P"]))
+            return done
+        if any(c in ("0", "1", "00", "01") for c in codes):
+            with self._lock:
+                start = self._moves[-1][2] if self._moves else self.position
+            target = list(start)
+            for i, axis in enumerate("XYZ"):
+                if axis in words:
+                    value = float(words[axis])
+                    target[i] = value if self.absolute else start[i] + value
+            distance = sum((a - b) ** 2 for a, b in zip(target, start)) ** 0.5
+            rate = float(words["F"]) if "F" in words and "1" in codes else self.rapid
+            self._schedule(target, distance / (rate / 60.0) + self.accel_time)
+        return 0.0
+
+    def _schedule(self, target, duration):
+        with self._lock:
+            now = time.perf_counter()
+            # only motion has a delay before it starts, not a dwell
+            start = self._busy_until if self._busy_until > now \
+                else now + (self.start_delay if target is not None else 0.0)
+            self._busy_until = start + duration
+            if target is None:
+                target = self._moves[-1][2] if self._moves else list(self.position)
+            self._moves.append((start, self._busy_until, target))
+
+    def _serve(self):
+        self._reply("")
+        self._reply("Grbl 1.1h ['$' for help]")
+        buffer = b""
+        while self._running:
+            try:
+                data = os.read(self._master, 1024)
+            except OSError:
+                return
+            for byte in data:
+                char = bytes([byte])
+                if char == b"?":
+                    self._reply(self._state())
+                elif char == b"\x18":
+                    self._reply("Grbl 1.1h ['$' for help]")
+                elif char in (b"\n", b"\r"):
+                    line = buffer.decode("ascii", errors="replace").strip()
+                    buffer = b""
+                    if line:
+                        _sleep(self._execute(line) - time.perf_counter())
+                        self._reply("ok")
+                else:
+                    buffer += char
+
+
+# ============================================================
+# Oscilloscope (pyvisa resource)
+# ============================================================
+
+_FORMAT_CODES = {"ASC": 0, "BYTE": 1, "WORD": 2}
+_DATATYPES = {"b": "i1", "B": "u1", "h": "i2", "H": "u2"}
+
+
+def _sleep(seconds):
+    if seconds > 0:
+        time.sleep(seconds)
+
+
+class SimScope:
+    """Infiniium EXR stand-in with the pyvisa resource interface.
+
+    Every capture is a Gaussian pulse of amplitude(channel) volts (negative
+    on the PMT channel 8 by default, as before inversion) plus white noise,
+    reduced by sqrt(count) when averaging.  Time is spent as on the real
+    link: round_trip per query, write_time per write, the block size over
+    bandwidth for :WAVeform:DATA?, and count / trigger_rate per acquisition
+    (generating the data is counted against that acquisition time).
+    :WAVeform:DATA? start,size returns part of the record (start counts
+    from 1); :MEASure:AREA? integrates and :MEASure:VAVerage? averages the
+    last capture over the :MEASure:GATing window.
+    """
+
+    def __init__(self, points=4000, xinc=20e-12, v_range=1.0, noise=0.01,
+                 pulse_at=20e-9, pulse_width=1e-9, amplitude=None,
+                 trigger_rate=1000.0, round_trip=200e-6, write_time=50e-6,
+                 bandwidth=60e6, seed=None):
+        self.points = points
+        self.xinc = xinc
+        self.v_range = v_range
+        self.noise = noise
+        self.pulse_at = pulse_at
+        self.pulse_width = pulse_width
+        self.amplitude = amplitude or (lambda ch: -0.3 if ch == 8 else 0.5)
+        self.trigger_rate = trigger_rate
+        self.round_trip = round_trip
+        self.write_time = write_time
+        self.bandwidth = bandwidth
+        self.rng = np.random.default_rng(seed)
+        self.timeout = 2000
+        self.log = []
+        self.unknown = []
+        self.captures = 0
+        self.bytes_sent = 0
+        self._bank = None
+        self._pulse = None
+        self._pulse_key = None
+        self.reset()
+
+    def reset(self):
+        self.format = "ASC"
+        self.unsigned = False
+        self.source = 1
+        self.displayed = {1, 2, 3, 4}
+        self.inverted = set()
+        self.average = False
+        self.count = 1
+        self.segmented = False
+        self.segment_count = 1
+        self.all_segments = False
+        self.captured = {}
+        self.gating = False
+        self.gate = (-np.inf, np.inf)
+
+    # --------------------------------------------------------
+    # pyvisa resource interface
+    # --------------------------------------------------------
+
+    def write(self, command):
+        _sleep(self.write_time)
+        self._handle(command)
+        return len(command) + 1
+
+    def write_ascii_values(self, command, values, **kwargs):
+        text = command + ",".join(str(v) for v in values)
+        _sleep(self.write_time + len(text) / self.bandwidth)
+        self.log.append(command)
+        return len(text) + 1
+
+    def query(self, command):
+        _sleep(self.round_trip)
+        reply = self._handle(command)
+        return ("" if reply is None else str(reply)) + "\n"
+
+    def query_binary_values(self, command, datatype="f", is_big_endian=False,
+                            container=list, **kwargs):
+        _sleep(self.round_trip)
+        block = self._handle(command)
+        if not isinstance(block, bytes):
+            raise ValueError(f"{command!r} does not return a binary block")
+        _sleep(len(block) / self.bandwidth)
+        self.bytes_sent += len(block)
+
+        digits = int(block[1:2])
+        length = int(block[2:2 + digits])
+        dtype = np.dtype(_DATATYPES.get(datatype, datatype))
+        dtype = dtype.newbyteorder(">" if is_big_endian else "<")
+        values = np.frombuffer(block, dtype=dtype, count=length // dtype.itemsize,
+                               offset=2 + digits)
+        return values.copy() if container is np.array else container(values)
+
+    def close(self):
+        pass
+
+    # --------------------------------------------------------
+    # Acquisition model
+    # --------------------------------------------------------
+
+    def _shots(self):
+        return self.segment_count if self.segmented else (self.count if self.average else 1)
+
+    def _noise(self, rows):
+        """rows of unit white noise, cut at random offsets from one bank."""
+        n = self.points
+        if self._bank is None or len(self._bank) != n + 4096:
+            self._bank = self.rng.standard_normal(n + 4096, dtype=np.float32)
+        starts = self.rng.integers(0, 4096, size=rows)
+        return np.stack([self._bank[s:s + n] for s in starts])
+
+    def _acquire(self, channels):
+        start = time.perf_counter()
+        key = (self.points, self.xinc, self.pulse_at, self.pulse_width)
+        if self._pulse_key != key:
+            t = np.arange(self.points) * self.xinc
+            self._pulse = np.exp(-0.5 * ((t - self.pulse_at) / self.pulse_width) ** 2)
+            self._pulse = self._pulse.astype(np.float32)
+            self._pulse_key = key
+        rows = self.segment_count if self.segmented else 1
+        sigma = self.noise / np.sqrt(self.count if self.average and not self.segmented else 1)
+        for ch in channels:
+            a = self.amplitude(ch) * (-1 if ch in self.inverted else 1)
+            v = self._noise(rows)
+            v *= np.float32(sigma)
+            v += np.float32(a) * self._pulse
+            self.captured[ch] = v
+        self.captures += 1
+        _sleep(self._shots() / self.trigger_rate - (time.perf_counter() - start))
+
+    def _scaling(self):
+        bits = 16 if self.format == "WORD" else 8
+        yinc = self.v_range / 2 ** bits
+        yref = 2 ** (bits - 1) if self.unsigned else 0
+        return bits, yinc, yref
+
+    def _preamble(self):
+        _, yinc, yref = self._scaling()
+        kind = 2 if self.average and not self.segmented else 1
+        return (f"{_FORMAT_CODES.get(self.format, 0)},{kind},{self.points},"
+                f"{self.count if kind == 2 else 1},{self.xinc:E},0.0E+00,0,"
+                f"{yinc:E},0.0E+00,{yref}")
+
+    def _data(self, arg=""):
+        v = self.captured.get(self.source)
+        if v is None:
+            v = np.zeros((1, self.points), dtype=np.float32)
+        if not (self.segmented and self.all_segments):
+            v = v[-1:]
+        if arg:
+            # start,size of every row (the scope counts points from 1)
+            start, _, size = arg.partition(",")
+            first = max(int(float(start)) - 1, 0)
+            size = int(float(size)) if size else self.points - first
+            v = v[:, first:first + size]
+        bits, yinc, yref = self._scaling()
+        lo, hi = -2 ** (bits - 1), 2 ** (bits - 1) - 1
+        codes = np.clip(np.rint(v.ravel() / yinc), lo, hi) + yref
+        dtype = {(8, False): "i1", (8, True): "u1",
+                 (16, False): ">i2", (16, True): ">u2"}[(bits, self.unsigned)]
+        payload = codes.astype(dtype).tobytes()
+        size = str(len(payload)).encode()
+        return b"#" + str(len(size)).encode() + size + payload + b"\n"
+
+    def _gated(self, arg):
+        """(t, v) of the last capture of the measured channel inside the gate."""
+        m = re.search(r"CHAN(?:NEL)?(\d+)", arg)
+        v = self.captured.get(int(m.group(1)) if m else self.source)
+        if v is None:
+            return None, None
+        t = np.arange(self.points) * self.xinc
+        inside = (t >= self.gate[0]) & (t <= self.gate[1]) if self.gating \
+            else np.ones(self.points, dtype=bool)
+        return t[inside], v[-1][inside]
+
+    def _area(self, arg):
+        t, v = self._gated(arg)
+        if v is None or len(v) < 2:
+            return "9.99999E+37"
+        return f"{np.trapezoid(v, t):E}"
+
+    def _average(self, arg):
+        t, v = self._gated(arg)
+        if v is None or len(v) == 0:
+            return "9.99999E+37"
+        return f"{v.mean():E}"
+
+    # --------------------------------------------------------
+    # SCPI
+    # --------------------------------------------------------
+
+    def _handle(self, command):
+        self.log.append(command)
+        header, _, arg = command.strip().partition(" ")
+        header = header.lstrip(":").upper()
+        arg = arg.strip().upper()
+        nodes = header.rstrip("?").split(":")
+        root = nodes[0]
+        sub = nodes[1] if len(nodes) > 1 else ""
+
+        if header == "*RST":
+            self.reset()
+        elif header == "*OPC?":
+            return "1"
+        elif header == "*IDN?":
+            return "KEYSIGHT TECHNOLOGIES,EXR-SIM,SIM0001,1.0"
+        elif header in ("*CLS", "*OPC", "*WAI"):
+            pass
+        elif root.startswith("DIG"):
+            chans = [int(c) for c in re.findall(r"CHAN(?:NEL)?(\d+)", arg)]
+            self._acquire(chans or sorted(self.displayed))
+        elif root.startswith("SING") or root == "RUN":
+            self._acquire(sorted(self.displayed))
+        elif root.startswith("CHAN"):
+            ch = int(re.match(r"CHAN(?:NEL)?(\d+)", root).group(1))
+            on = arg in ("ON", "1")
+            if sub.startswith("DISP"):
+                (self.displayed.add if on else self.displayed.discard)(ch)
+            elif sub.startswith("INV"):
+                (self.inverted.add if on else self.inverted.discard)(ch)
+        elif root.startswith("ACQ"):
+            if sub.startswith("TYPE"):
+                self.average = arg.startswith("AVER")
+            elif sub.startswith("AVER"):
+                self.average = arg in ("ON", "1")
+            elif sub.startswith("COUN"):
+                self.count = max(1, int(float(arg)))
+            elif sub.startswith("MODE"):
+                self.segmented = arg.startswith("SEGM")
+            elif sub.startswith("SEGM") and len(nodes) > 2:
+                self.segment_count = max(1, int(float(arg)))
+        elif root.startswith("WAV"):
+            if header.endswith("?"):
+                if sub.startswith("PRE"):
+                    return self._preamble()
+                if sub.startswith("DATA"):
+                    return self._data(arg)
+                if sub.startswith("POIN"):
+                    return str(self.points)
+            elif sub.startswith("FORM"):
+                self.format = "WORD" if arg.startswith("WORD") else \
+                    "BYTE" if arg.startswith("BYTE") else "ASC"
+            elif sub.startswith("UNS"):
+                self.unsigned = arg in ("ON", "1")
+            elif sub.startswith("SOUR"):
+                m = re.search(r"CHAN(?:NEL)?(\d+)", arg)
+                self.source = int(m.group(1)) if m else self.source
+            elif sub.startswith("SEGM"):
+                self.all_segments = arg in ("ON", "1")
+        elif root.startswith("MEAS"):
+            if sub.startswith("AREA") and header.endswith("?"):
+                return self._area(arg)
+            if sub.startswith("VAV") and header.endswith("?"):
+                return self._average(arg)
+            if sub.startswith("GAT"):
+                leaf = nodes[2] if len(nodes) > 2 else ""
+                if leaf.startswith("STAR"):
+                    self.gate = (float(arg), self.gate[1])
+                elif leaf.startswith("STOP"):
+                    self.gate = (self.gate[0], float(arg))
+                else:
+                    self.gating = arg in ("ON", "1")
+        elif header.endswith("?"):
+            self.unknown.append(command)
+            return "0"
+        return None
+
+
+class SimResourceManager:
+    """pyvisa.ResourceManager stand-in; every resource is a SimScope."""
+
+    def __init__(self, *args, **scope_options):
+        self.scope_options = scope_options
+        self.opened = {}
+
+    def open_resource(self, name, **kwargs):
+        scope = SimScope(**self.scope_options)
+        self.opened[name] = scope
+        return scope
+
+    def list_resources(self, query="?*::INSTR"):
+        return tuple(self.opened)
+
+    def close(self):
+        pass
+
+
+# ============================================================
+# Elliptec rotation mounts (ELLO_DLL names)
+# ============================================================
+
+class _Decimal:
+    @staticmethod
+    def Parse(text):
+        return float(text)
+
+
+class _Direction:
+    Clockwise = "Clockwise"
+    AntiClockwise = "AntiClockwise"
+
+
+class _BaseDevice:
+    DeviceDirection = _Direction
+
+
+class SimEllMotor:
+    """One rotation mount; MoveAbsolute blocks until done, as the DLL does.
+
+    A move takes overhead + distance / speed seconds; GetPosition costs
+    poll_time on the bus. With blocking=False, or when started with a raw
+    command through the port's SendString, moves return at once and the
+    position is interpolated while the mount travels.  Mounts given the same
+    bus share one serial line: a call made while another is still waiting
+    for its reply raises RuntimeError, as it would garble the real traffic.
+    """
+
+    def __init__(self, address, speed=180.0, overhead=0.05, poll_time=0.005,
+                 blocking=True, bus=None):
+        self.address = address
+        self.bus = bus or threading.Lock()
+        self.speed = speed
+        self.overhead = overhead
+        self.poll_time = poll_time
+        self.blocking = blocking
+        self.Position = 0.0
+        self._from = 0.0
+        self._to = 0.0
+        self._t0 = self._t1 = 0.0
+        self.moves = 0
+
+    def _now(self):
+        now = time.perf_counter()
+        if now >= self._t1:
+            return self._to
+        frac = (now - self._t0) / (self._t1 - self._t0)
+        return self._from + frac * (self._to - self._from)
+
+    def _claim_bus(self):
+        if not self.bus.acquire(blocking=False):
+            raise RuntimeError(f"Elliptec bus collision at mount {self.address}: "
+                               "another call is still waiting for its reply")
+
+    def MoveAbsolute(self, angle):
+        self._claim_bus()
+        try:
+            return self._move(angle)
+        finally:
+            self.bus.release()
+
+    def _move(self, angle, blocking=None):
+        target = float(angle) % 360.0
+        start = self._now()
+        self._from, self._to = start, target
+        self._t0 = time.perf_counter()
+        self._t1 = self._t0 + self.overhead + abs(target - start) / self.speed
+        self.moves += 1
+        if self.blocking if blocking is None else blocking:
+            _sleep(self._t1 - time.perf_counter())
+            self.Position = target
+        return True
+
+    def Home(self, direction=None):
+        return self.MoveAbsolute(0.0)
+
+    def GetPosition(self):
+        self._claim_bus()
+        try:
+            _sleep(self.poll_time)
+            self.Position = round(self._now(), 4)
+            return self.Position
+        finally:
+            self.bus.release()
+
+
+class _Devices:
+    def __init__(self, dll):
+        self.dll = dll
+
+    def ScanAddresses(self, min_address, max_address):
+        lo, hi = int(str(min_address), 16), int(str(max_address), 16)
+        return [f"{a}IN0E1140000{a}2021" for a in self.dll.addresses
+                if lo <= int(a, 16) <= hi]
+
+    def Configure(self, device):
+        return device[0] in self.dll.addresses
+
+    def AddressedDevice(self, address):
+        return self.dll.motors[address]
+
+
+class _Port:
+    def __init__(self, dll):
+        self.dll = dll
+
+    def Connect(self, port):
+        self.dll.port = port
+
+    def Disconnect(self):
+        self.dll.port = None
+
+    def SendString(self, text):
+        """Raw "<address>ma<pulses>" / "<address>ho<direction>" command."""
+        m = re.fullmatch(r"([0-9a-fA-F])(ma|ho)([0-9a-fA-F]*)", str(text).strip())
+        if m is None:
+            raise ValueError(f"Unsupported Elliptec command {text!r}")
+        motor = self.dll.motors[m.group(1).lower()]
+        angle = 0.0
+        if m.group(2) == "ma":
+            pulses = int(m.group(3), 16)
+            pulses -= (pulses >> 31) << 32      # 32-bit two's complement
+            angle = pulses * 360.0 / self.dll.pulses_per_rev
+        motor._claim_bus()
+        try:
+            _sleep(motor.poll_time)     # the write; the move runs on its own
+            motor._move(angle, blocking=False)
+        finally:
+            motor.bus.release()
+
+
+class SimElliptecDll:
+    """The ELLO_DLL objects the ElliptecController needs, backed by SimEllMotors.
+
+        dll = SimElliptecDll(n_motors=3, speed=90.0)
+        ELLDevicePort, ELLDevices = dll.ELLDevicePort, dll.ELLDevices
+        ELLBaseDevice, NetDecimal = dll.ELLBaseDevice, dll.NetDecimal
+    """
+
+    NetDecimal = _Decimal
+    ELLBaseDevice = _BaseDevice
+    pulses_per_rev = 143360
+
+    def __init__(self, n_motors=3, **motor_options):
+        self.addresses = [format(a, "x") for a in range(n_motors)]
+        self.bus = threading.Lock()     # all mounts hang off one serial port
+        self.motors = {a: SimEllMotor(a, bus=self.bus, **motor_options)
+                       for a in self.addresses}
+        self.port = None
+        self.ELLDevicePort = _Port(self)
+
+    def ELLDevices(self):
+        return _Devices(self)
+
+
+# ============================================================
+# Delay generator (TCP)
+# ============================================================
+
+class SimDelayGenerator:
+    """Delay generator on a local TCP port, speaking DG645-style commands.
+
+    Connect to .address. Lines may hold several ";"-separated commands;
+    every query ("?") is answered with one CRLF-terminated line. Settings
+    are kept by command name and read back by the matching query; unknown
+    commands queue error 110 for LERR?. Every command costs command_time.
+    """
+
+    COMMANDS = {"TSRC", "TRAT", "TLVL", "TSLP", "TRIG", "DLAY", "LAMP", "LOFF",
+                "LPOL", "BURM", "BURC", "BURD", "BURP", "BURT", "INHB", "HOLD",
+                "PRES", "ADVT"}
+
+    def __init__(self, host="127.0.0.1", port=0, command_time=0.5e-3):
+        self.command_time = command_time
+        self.settings = {}
+        self.delays = {}
+        self.errors = deque()
+        self.lines = []
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((host, port))
+        self._server.listen(4)
+        self.address = self._server.getsockname()
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._running = False
+        try:
+            self._server.close()
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _serve(self):
+        while self._running:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._client, args=(conn,), daemon=True).start()
+
+    def _client(self, conn):
+        buffer = b""
+        with conn:
+            while self._running:
+                try:
+                    data = conn.recv(4096)
+                except OSError:
+                    return
+                if not data:
+                    return
+                buffer += data
+                while b"\n" in buffer:
+                    line, buffer = buffer.split(b"\n", 1)
+                    line = line.decode("ascii", errors="replace").strip()
+                    if not line:
+                        continue
+                    self.lines.append(line)
+                    for command in line.split(";"):
+                        reply = self._execute(command.strip())
+                        if reply is not None:
+                            conn.sendall((reply + "\r\n").encode("ascii"))
+
+    def _execute(self, command):
+        _sleep(self.command_time)
+        if not command:
+            return None
+        name, _, args = command.partition(" ")
+        name = name.upper()
+        # DG645 queries may carry the channel right after the "?", e.g. DLAY?2
+        query = "?" in name
+        if query:
+            name, _, first = name.partition("?")
+            args = ",".join(a for a in (first, args.strip()) if a)
+        args = args.strip()
+
+        if name == "*IDN":
+            return "Stanford Research Systems,DG645,s/n SIM,ver1.000"
+        if name == "LERR":
+            return str(self.errors.popleft() if self.errors else 0)
+        if name == "*OPC":
+            return "1" if query else None
+        if name in ("*RST", "*CLS"):
+            self.settings.clear()
+            self.delays.clear()
+            self.errors.clear()
+            return None
+        if name not in self.COMMANDS:
+            self.errors.append(110)
+            return None
+
+        if name == "DLAY":
+            if query:
+                return self.delays.get(args.strip(), "0,+0.000000000000")
+            channel, _, rest = args.partition(",")
+            self.delays[channel.strip()] = rest.strip()
+            return None
+        if query:
+            return self.settings.get((name, args) if args else name, "0")
+        if "," in args:
+            key, _, value = args.partition(",")
+            self.settings[(name, key.strip())] = value.strip()
+        else:
+            self.settings[name] = args
+        return None
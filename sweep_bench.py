@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""Sweep benchmarks against the simulated instruments.
+
+Runs the polarization sweep (SweepPipeline: move, trigger, transfer, raw
+store, conversion, live-view publish, CSV export) and the raster scan
+(RasterScheduler on a PtyGrbl stage: stage wait, trigger, transfer, raster
+store, live-view publish) with sim_instruments stand-ins, and reports the
+latency distribution of every stage and the points per second of every case.
+
+    python sweep_bench.py                       quick cases, compared to the baseline
+    python sweep_bench.py --cases full          1k-16M point waveforms, 36-1e5 point sweeps
+    python sweep_bench.py --profile realistic   modelled instrument times instead of none
+    python sweep_bench.py --save-baseline       store this run as the new baseline
+
+With the "ideal" profile the instruments answer instantly, so the numbers are
+the orchestration and host-side cost alone.  A case whose points per second
+drop, or whose stage median grows, by more than --tolerance against the
+stored baseline is reported as a regression and the exit code is 1.
+Baselines are machine specific: record one on the machine that compares.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from elliptec_motion import wait_for_position
+from live_view import LiveView
+from raster_scheduler import RasterScheduler, serpentine_path
+from run_store import RasterStore, RunStore
+from scope_waveform import ScopeLink, Waveform
+from sweep_pipeline import SweepPipeline
+from sim_instruments import SimEllMotor, SimScope
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "sweep_bench_baseline.json")
+
+Case = namedtuple("Case", "name kind points n")
+
+CASES = {
+    "quick": [
+        Case("polar_1k_x36", "polar", 1_000, 36),
+        Case("polar_64k_x36", "polar", 65_536, 36),
+        Case("polar_1M_x36", "polar", 1_048_576, 36),
+        Case("polar_1k_x1000", "polar", 1_000, 1_000),
+        Case("raster_1k_x1024", "raster", 1_000, 1_024),
+    ],
+    "full": [
+        Case("polar_1k_x36", "polar", 1_000, 36),
+        Case("polar_16k_x36", "polar", 16_384, 36),
+        Case("polar_256k_x36", "polar", 262_144, 36),
+        Case("polar_4M_x36", "polar", 4_194_304, 36),
+        Case("polar_16M_x36", "polar", 16_777_216, 36),
+        Case("polar_1k_x1000", "polar", 1_000, 1_000),
+        Case("polar_1k_x100k", "polar", 1_000, 100_000),
+        Case("raster_1k_x1024", "raster", 1_000, 1_024),
+        Case("raster_1k_x10k", "raster", 1_000, 10_000),
+        Case("raster_1k_x100k", "raster", 1_000, 100_000),
+        Case("raster_64k_x1024", "raster", 65_536, 1_024),
+    ],
+}
+
+# instrument times per profile; "ideal" leaves only the host-side cost
+PROFILES = {
+    "ideal": {
+        "scope": dict(round_trip=0.0, write_time=0.0, bandwidth=math.inf,
+                      trigger_rate=math.inf),
+        "motor": dict(speed=math.inf, overhead=0.0, poll_time=0.0),
+        "grbl": dict(rapid_mm_per_min=1e9, accel_time=0.0),
+    },
+    "realistic": {
+        "scope": dict(round_trip=200e-6, write_time=50e-6, bandwidth=60e6,
+                      trigger_rate=1000.0),
+        "motor": dict(speed=180.0, overhead=0.05, poll_time=0.005),
+        "grbl": dict(rapid_mm_per_min=500.0, accel_time=0.005),
+    },
+}
+
+# np.savetxt of longer records takes minutes per point; they are not exported
+EXPORT_LIMIT = 262_144
+
+
+# ============================================================
+# Timing helpers
+# ============================================================
+
+class StageTimes:
+    """Per-stage duration samples, filled by wrapped stage functions."""
+
+    def __init__(self):
+        self.samples = {}
+
+    def add(self, name, seconds):
+        self.samples.setdefault(name, []).append(seconds)
+
+    def wrap(self, name, fn):
+        def timed(*args):
+            t0 = time.perf_counter()
+            out = fn(*args)
+            self.add(name, time.perf_counter() - t0)
+            return out
+        return timed
+
+    def extend(self, timings, keys):
+        for row in timings:
+            for key in keys:
+                self.add(key, row[key])
+
+
+def distribution(samples):
+    a = np.asarray(samples, dtype=float)
+    return {
+        "n": int(len(a)),
+        "mean": float(a.mean()),
+        "p50": float(np.percentile(a, 50)),
+        "p90": float(np.percentile(a, 90)),
+        "p99": float(np.percentile(a, 99)),
+        "max": float(a.max()),
+    }
+
+
+# ============================================================
+# Sweeps
+# ============================================================
+
+def _scope(points, profile, fmt, unsigned):
+    link = ScopeLink(SimScope(points=points, **PROFILES[profile]["scope"]))
+    link.write("*RST")
+    link.ensure_format(fmt, unsigned)
+    return link
+
+
+def _fetch(link, channel, datatype, big_endian):
+    link.ensure_source(channel)
+    pre = link.preamble(channel)
+    raw = link.query_binary_values(":WAVeform:DATA?", datatype=datatype,
+                                   is_big_endian=big_endian, container=np.array)
+    return Waveform(raw[np.newaxis], [pre])
+
+
+def run_polar(case, profile, folder):
+    """Polarization sweep as in the automated scripts: one mount, WORD data."""
+    link = _scope(case.points, profile, "WORD", False)
+    motor = SimEllMotor("1", **PROFILES[profile]["motor"])
+    store = RunStore(os.path.join(folder, "run"), labels=["Voltage (V)"])
+    view = LiveView()          # not started: publish() cost without a window
+    times = StageTimes()
+    export = case.points <= EXPORT_LIMIT
+
+    def move(angle):
+        motor.MoveAbsolute(angle)
+        wait_for_position(motor.GetPosition, angle % 360.0, poll_interval=0.0)
+
+    def trigger():
+        link.write(":DIGitize CHANnel8")
+        link.query("*OPC?")
+
+    def save(angle, wf):
+        store.append(wf, A=angle)
+        return wf
+
+    def convert(angle, wf):
+        v = wf.volts(0)
+        return wf.time_axis(), v - np.mean(v[:50])
+
+    def plot(angle, tv):
+        # last stage: SweepPipeline keeps what it returns, so keep nothing
+        view.publish(*tv, title=f"A={angle:.2f}")
+
+    def write_csv(angle, tv):
+        np.savetxt(os.path.join(folder, f"A_{angle:.3f}.csv"), np.column_stack(tv),
+                   delimiter=",", header="Time (s),Voltage (V)", comments="")
+        return tv
+
+    stages = [times.wrap("store", save), times.wrap("convert", convert)]
+    if export:
+        stages.append(times.wrap("export", write_csv))
+    stages.append(times.wrap("plot", plot))
+
+    angles = np.linspace(0.0, 180.0, case.n, endpoint=False)
+    sweep = SweepPipeline(move=times.wrap("move", move), trigger=trigger,
+                          fetch=lambda: _fetch(link, 8, "h", True), stages=stages)
+    try:
+        sweep.run(angles)
+    finally:
+        store.close()
+        view.close()
+    times.extend(sweep.timings, ("move_wait", "trigger", "fetch", "queue_wait", "total"))
+    return times, sweep.elapsed
+
+
+def run_raster(case, profile, folder):
+    """Raster scan as in EXR_Scope.py: GRBL stage, BYTE data, raster store."""
+    from grbl_stage import GrblStage
+    from sim_instruments import PtyGrbl
+
+    n_z = int(math.sqrt(case.n))
+    n_x = int(math.ceil(case.n / n_z))
+    link = _scope(case.points, profile, "BYTE", False)
+    grbl = PtyGrbl(**PROFILES[profile]["grbl"])
+    stage = GrblStage(grbl.port)
+    raster = RasterStore(os.path.join(folder, "raster"), shape=(n_z, n_x),
+                         dtype=np.int8, flush_every=n_x)
+    view = LiveView()
+    times = StageTimes()
+
+    def trigger():
+        link.write(":DIGitize CHANnel8")
+        link.query("*OPC?")
+
+    def store(pixel, wf):
+        raster.write(pixel.z, pixel.x, wf.raw[0], wf.preambles[0])
+
+    def show(pixel, wf):
+        view.publish(np.arange(wf.samples), wf.raw[0], f"z={pixel.z}, x={pixel.x}")
+
+    scheduler = RasterScheduler(
+        stage, trigger, lambda: _fetch(link, 8, "b", False),
+        process=[times.wrap("store", store), times.wrap("plot", show)],
+        report_every=0, keep_timings=True)
+    start = time.perf_counter()
+    try:
+        scheduler.run(serpentine_path(n_z, n_x, step_x=0.0025, step_z=0.0025))
+    finally:
+        elapsed = time.perf_counter() - start
+        raster.close()
+        view.close()
+        stage.close()
+        grbl.close()
+    times.extend(scheduler.timings, ("stage_wait", "trigger", "fetch", "process", "total"))
+    return times, elapsed
+
+
+def run_case(case, profile):
+    runner = run_polar if case.kind == "polar" else run_raster
+    with tempfile.TemporaryDirectory(prefix="sweep_bench_") as folder:
+        times, elapsed = runner(case, profile, folder)
+    count = len(times.samples["total"])
+    return {
+        "kind": case.kind,
+        "points": case.points,
+        "n": count,
+        "elapsed": elapsed,
+        "points_per_s": count / elapsed if elapsed else float("nan"),
+        "stages": {k: distribution(v) for k, v in times.samples.items()},
+    }
+
+
+# ============================================================
+# Report and baseline
+# ============================================================
+
+def print_case(name, result):
+    print(f"\n{name}: {result['n']} points of {result['points']} samples, "
+          f"{result['elapsed']:.2f} s, {result['points_per_s']:.1f} points/s")
+    print(f"  {'stage':<11}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}  (ms)")
+    for stage, d in result["stages"].items():
+        print(f"  {stage:<11}" + "".join(f"{d[k] * 1e3:>10.3f}"
+                                         for k in ("mean", "p50", "p90", "p99", "max")))
+
+
+def compare(results, baseline, tolerance, floor=0.5e-3):
+    """Regression messages for every case slower than the baseline.
+
+    Stage medians only count when they grew by more than floor seconds as
+    well, so sub-millisecond jitter does not trip the check.
+    """
+    problems = []
+    for name, res in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if res["points_per_s"] < base["points_per_s"] * (1.0 - tolerance):
+            problems.append(
+                f"{name}: {res['points_per_s']:.1f} points/s, baseline "
+                f"{base['points_per_s']:.1f} "
+                f"({res['points_per_s'] / base['points_per_s'] - 1:+.0%})")
+        for stage, d in res["stages"].items():
+            b = base["stages"].get(stage)
+            if b and d["p50"] > b["p50"] * (1.0 + tolerance) and \
+                    d["p50"] - b["p50"] > floor:
+                problems.append(
+                    f"{name}: {stage} median {d['p50'] * 1e3:.3f} ms, baseline "
+                    f"{b['p50'] * 1e3:.3f} ms")
+    return problems
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    p.add_argument("--cases", choices=sorted(CASES), default="quick")
+    p.add_argument("--only", nargs="*", default=None, help="case names to run")
+    p.add_argument("--profile", choices=sorted(PROFILES), default="ideal")
+    p.add_argument("--baseline", default=BASELINE_FILE)
+    p.add_argument("--save-baseline", action="store_true")
+    p.add_argument("--tolerance", type=float, default=0.25,
+                   help="allowed slowdown as a fraction (0.25 = 25%%)")
+    p.add_argument("--json", default=None, help="write the results to this file")
+    args = p.parse_args(argv)
+
+    cases = [c for c in CASES[args.cases] if not args.only or c.name in args.only]
+    if not hasattr(os, "openpty"):
+        print("No pseudo-terminals on this OS: raster cases skipped.")
+        cases = [c for c in cases if c.kind != "raster"]
+
+    results = {}
+    for case in cases:
+        results[case.name] = run_case(case, args.profile)
+        print_case(case.name, results[case.name])
+
+    report = {
+        "profile": args.profile,
+        "machine": f"{platform.node()} {platform.machine()} {platform.python_version()}",
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "cases": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    stored = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            stored = json.load(f)
+
+    if args.save_baseline:
+        stored.setdefault("profiles", {})[args.profile] = report
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(stored, f, indent=2)
+        print(f"\nBaseline for profile {args.profile!r} saved to {args.baseline}")
+        return 0
+
+    baseline = stored.get("profiles", {}).get(args.profile)
+    if baseline is None:
+        print(f"\nNo {args.profile!r} baseline in {args.baseline}; "
+              f"run with --save-baseline to create one.")
+        return 0
+
+    problems = compare(results, baseline["cases"], args.tolerance)
+    print(f"\nCompared with the baseline from {baseline['created']} "
+          f"({baseline['machine']}), tolerance {args.tolerance:.0%}:")
+    if problems:
+        print("\n".join("  REGRESSION " + msg for msg in problems))
+        return 1
+    print("  no regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""Pipelined sweep engine for the acquisition scripts.
+
+A plain sweep runs move -> settle -> trigger -> transfer -> reduce -> save ->
+plot strictly in series.  Here the only ordering that is kept is the physical
+one: a trigger waits for the motors, and the next move waits for the trigger.
+As soon as the scope has captured a point the motors are sent to the next one,
+the waveform is transferred while they travel, and reduction/saving run on
+worker threads fed through bounded queues.  Per-point time then approaches
+max(move, acquire) instead of the sum of every stage.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_DONE = object()
+
+
+class SweepPipeline:
+    """Run a sweep with motion, transfer and processing overlapped.
+
+    move(point)         blocking move of the motors to point
+    trigger()           blocking acquisition (returns once the scope captured)
+    fetch()             transfer of the captured data, returns any object
+    stages              functions stage(point, item) -> item, each run on its
+                        own worker thread, chained through bounded queues
+    on_result           optional on_result(point, item) called on the
+                        calling thread with the newest finished item (plots
+                        must stay on the GUI thread); stale items are skipped
+    stop                optional stop() checked after every trigger; once it
+                        returns True the sweep ends with that point (e.g. a
+                        running fit has converged)
+    """
+
+    def __init__(self, move, trigger, fetch, stages=(), on_result=None,
+                 queue_size=4, stop=None):
+        self.move = move
+        self.trigger = trigger
+        self.fetch = fetch
+        self.stages = list(stages)
+        self.on_result = on_result
+        self.queue_size = queue_size
+        self.stop = stop
+        self.stopped_early = False
+
+        self.timings = []
+        self.results = []
+        self.elapsed = 0.0
+        self._latest = None
+        self._latest_lock = threading.Lock()
+        self._error = None
+
+    # --------------------------------------------------------
+    # Workers
+    # --------------------------------------------------------
+
+    def _worker(self, stage, inbox, outbox):
+        while True:
+            job = inbox.get()
+            if job is _DONE:
+                if outbox is not None:
+                    outbox.put(_DONE)
+                return
+            if self._error is not None:
+                continue    # drain so the producer never blocks
+            point, item = job
+            try:
+                item = stage(point, item)
+            except Exception as exc:
+                self._error = exc
+                continue
+            if outbox is not None:
+                outbox.put((point, item))
+            else:
+                self._finish(point, item)
+
+    def _finish(self, point, item):
+        with self._latest_lock:
+            self.results.append((point, item))
+            self._latest = (point, item)
+
+    def _show_latest(self):
+        if self.on_result is None:
+            return
+        with self._latest_lock:
+            latest, self._latest = self._latest, None
+        if latest is not None:
+            self.on_result(*latest)
+
+    # --------------------------------------------------------
+    # Sweep
+    # --------------------------------------------------------
+
+    def run(self, points):
+        points = list(points)
+        self.timings = []
+        self.results = []
+        self._error = None
+        self.stopped_early = False
+        if not points:
+            return self.results
+
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        workers = []
+        for i, stage in enumerate(self.stages):
+            outbox = queues[i + 1] if i + 1 < len(queues) else None
+            worker = threading.Thread(
+                target=self._worker, args=(stage, queues[i], outbox),
+                daemon=True,
+            )
+            worker.start()
+            workers.append(worker)
+
+        mover = ThreadPoolExecutor(max_workers=1)
+        start = time.perf_counter()
+        try:
+            pending = mover.submit(self.move, points[0])
+            for i, point in enumerate(points):
+                if self._error is not None:
+                    raise self._error
+
+                t0 = time.perf_counter()
+                pending.result()
+                t1 = time.perf_counter()
+                self.trigger()
+                t2 = time.perf_counter()
+
+                if i + 1 < len(points) and self.stop is not None and self.stop():
+                    self.stopped_early = True
+
+                # motors travel to the next point while this one transfers
+                if i + 1 < len(points) and not self.stopped_early:
+                    pending = mover.submit(self.move, points[i + 1])
+                item = self.fetch()
+                t3 = time.perf_counter()
+
+                if queues:
+                    queues[0].put((point, item))
+                else:
+                    self._finish(point, item)
+                t4 = time.perf_counter()
+
+                self._show_latest()
+                self.timings.append({
+                    "point": point,
+                    "move_wait": t1 - t0,
+                    "trigger": t2 - t1,
+                    "fetch": t3 - t2,
+                    "queue_wait": t4 - t3,
+                    "total": time.perf_counter() - t0,
+                })
+                if self.stopped_early:
+                    break
+        finally:
+            mover.shutdown(wait=True)
+            if queues:
+                queues[0].put(_DONE)
+            for worker in workers:
+                worker.join()
+
+        self.elapsed = time.perf_counter() - start
+        if self._error is not None:
+            raise self._error
+        self._show_latest()
+        return self.results
+
+    def summary(self):
+        """Mean time per stage and overall points per second."""
+        n = len(self.timings)
+        if n == 0:
+            return {}
+        keys = ("move_wait", "trigger", "fetch", "queue_wait", "total")
+        out = {k: sum(t[k] for t in self.timings) / n for k in keys}
+        out["points"] = n
+        out["points_per_s"] = n / self.elapsed if self.elapsed else float("nan")
+        return out
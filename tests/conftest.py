@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+# The shared modules live flat in the repository root, next to the scripts.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
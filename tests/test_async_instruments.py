@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""AsyncSweep and AsyncDelayGenerator against local stand-ins."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from async_instruments import AsyncDelayGenerator, AsyncElliptec, AsyncSweep
+from delay_generator import DelayGeneratorError
+from sim_instruments import SimDelayGenerator
+
+
+def _sweep(stages, points, move_time=0.0):
+    order = []
+
+    async def move(point):
+        await asyncio.sleep(move_time)
+        order.append(("move", point))
+
+    async def trigger():
+        order.append(("trigger", order[-1][1]))
+
+    async def fetch():
+        return order[-1][1] * 10
+
+    sweep = AsyncSweep(move, trigger, fetch, stages=stages, queue_size=2)
+    return sweep, order
+
+
+def test_sweep_keeps_point_order_through_stages():
+    async def slow_first(point, item):
+        await asyncio.sleep(0.01 if point == 0 else 0.0)
+        return item + 1
+
+    def plain(point, item):     # runs on the default executor
+        return item * 2
+
+    sweep, order = _sweep([slow_first, plain], range(8))
+    results = asyncio.run(sweep.run(range(8)))
+
+    assert results == [(p, (p * 10 + 1) * 2) for p in range(8)]
+    assert len(sweep.timings) == 8
+    # every trigger follows the move to its own point
+    triggers = [p for kind, p in order if kind == "trigger"]
+    assert triggers == list(range(8))
+
+
+def test_sweep_starts_next_move_before_processing_finishes():
+    seen = []
+
+    async def stage(point, item):
+        seen.append(point)
+        await asyncio.sleep(0.05)
+        return item
+
+    sweep, order = _sweep([stage], range(4), move_time=0.0)
+    t0 = time.perf_counter()
+    asyncio.run(sweep.run(range(4)))
+    # four 50 ms stage calls in series, overlapped with the moves
+    assert time.perf_counter() - t0 < 0.4
+    assert seen == list(range(4))
+
+
+def test_sweep_stage_error_ends_the_sweep():
+    def failing(point, item):
+        if point == 3:
+            raise ValueError("boom")
+        return item
+
+    sweep, _ = _sweep([failing, lambda p, x: x], range(100))
+    with pytest.raises(ValueError, match="boom"):
+        asyncio.run(sweep.run(range(100)))
+    assert len(sweep.timings) < 100
+
+
+def test_sweep_move_error_propagates():
+    async def move(point):
+        if point == 2:
+            raise TimeoutError("mount stuck")
+
+    async def nothing():
+        return None
+
+    sweep = AsyncSweep(move, nothing, nothing)
+    with pytest.raises(TimeoutError):
+        asyncio.run(sweep.run(range(5)))
+
+
+def test_elliptec_calls_never_overlap_on_one_bus():
+    busy = threading.Lock()
+
+    class Controller:
+        def move_motor_absolute(self, motor, angle):
+            assert busy.acquire(blocking=False), "two calls on the bus"
+            time.sleep(0.01)
+            busy.release()
+            return 0.01
+
+    mounts = AsyncElliptec(Controller())
+    try:
+        asyncio.run(mounts.move_many([("1", 10), ("2", 20), ("3", 30)]))
+    finally:
+        mounts.close()
+
+
+# ============================================================
+# Delay generator
+# ============================================================
+
+def _with_delay_generator(body):
+    async def run():
+        with SimDelayGenerator() as server:
+            dg = await AsyncDelayGenerator(*server.address).connect()
+            try:
+                return await body(dg, server)
+            finally:
+                await dg.close()
+    return asyncio.run(run())
+
+
+def test_delay_generator_batches_and_reads_back():
+    async def body(dg, server):
+        await dg.set_delay("A", 12.5e-9)
+        replies = await dg.send("TSRC 0", "TRAT 50", "TRAT?", "DLAY?2")
+        return replies, list(server.lines)
+
+    replies, lines = _with_delay_generator(body)
+    assert replies[0] == "50"
+    assert replies[1].startswith("0,") and float(replies[1][2:]) == 12.5e-9
+    # one line, i.e. one write, per batch, each with its error check
+    assert lines == ["DLAY 2,0,1.250000000000e-08;LERR?",
+                     "TSRC 0;TRAT 50;TRAT?;DLAY?2;LERR?"]
+
+
+def test_delay_generator_raises_instrument_errors():
+    async def body(dg, server):
+        with pytest.raises(DelayGeneratorError, match="110"):
+            await dg.send("BOGUS 1")
+        # the connection is still usable afterwards
+        return await dg.query("*IDN?")
+
+    assert "DG645" in _with_delay_generator(body)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Concurrent Elliptec moves on one simulated bus."""
+
+import threading
+import time
+
+import pytest
+
+from elliptec_motion import (
+    home_command, move_command, move_concurrently, wait_for_position)
+from sim_instruments import SimElliptecDll
+
+
+class Controller:
+    """The bus handling of the sweep scripts' ElliptecController."""
+
+    home_timeout = 5.0
+
+    def __init__(self, dll):
+        self.dll = dll
+        self.port = dll.ELLDevicePort
+        self.bus_lock = threading.Lock()
+
+    def move_motor_absolute(self, motor, angle, wait=True):
+        with self.bus_lock:
+            self.port.SendString(move_command(motor.address, angle))
+
+    def read_position(self, motor):
+        with self.bus_lock:
+            return motor.GetPosition()
+
+    def wait_settled(self, motor, angle, timeout=5.0):
+        return wait_for_position(lambda: self.read_position(motor), angle,
+                                 timeout=timeout)[1]
+
+
+def test_commands():
+    assert move_command("1", 90) == "1ma00008C00"
+    assert move_command("2", -90) == move_command("2", 270)
+    assert move_command("0", 359.9999) == "0ma00000000"
+    assert home_command("3") == "3ho1"
+
+
+def test_mounts_on_one_bus_move_together():
+    dll = SimElliptecDll(n_motors=3, speed=180.0, overhead=0.0)
+    ctrl = Controller(dll)
+    motors = [dll.motors[a] for a in ("1", "2")]
+
+    t0 = time.perf_counter()
+    move_concurrently([(ctrl, motors[0], 90.0), (ctrl, motors[1], 90.0)])
+    elapsed = time.perf_counter() - t0
+
+    # one 0.5 s move time, not two
+    assert 0.45 < elapsed < 0.9
+    for motor in motors:
+        assert motor.GetPosition() == pytest.approx(90.0, abs=0.01)
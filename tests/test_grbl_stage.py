@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""GrblStage against the PtyGrbl stand-in."""
+
+import time
+
+import pytest
+
+pytest.importorskip("serial")
+
+import sim_instruments
+from grbl_stage import GrblStage
+from sim_instruments import PtyGrbl
+
+pytestmark = pytest.mark.skipif(sim_instruments.tty is None,
+                                reason="PtyGrbl needs pseudo-terminals")
+
+
+@pytest.fixture
+def grbl():
+    # a move still reports Idle for 50 ms after its "ok", as a real
+    # controller can while it plans
+    with PtyGrbl(rapid_mm_per_min=60.0, accel_time=0.0, start_delay=0.05) as sim:
+        stage = GrblStage(sim.port)
+        yield stage, sim
+        stage.close()
+
+
+def test_wait_idle_covers_the_whole_move(grbl):
+    stage, sim = grbl
+    t0 = time.perf_counter()
+    stage.move_relative(x=0.1)          # 0.1 mm at 1 mm/s
+    elapsed = time.perf_counter() - t0
+    assert elapsed >= 0.05 + 0.1
+    assert stage.position()[0] == pytest.approx(0.1)
+    assert sim.lines[-1] == "G4 P0"
+
+
+def test_wait_idle_after_queued_moves(grbl):
+    stage, sim = grbl
+    for _ in range(3):
+        stage.move_relative(wait=False, x=0.02)
+    stage.wait_idle()
+    assert stage.position()[0] == pytest.approx(0.06)
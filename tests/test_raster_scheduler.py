@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Serpentine path and RasterScheduler with a stand-in stage."""
+
+import pytest
+
+from raster_scheduler import RasterScheduler, project, serpentine_path
+
+
+def test_serpentine_path_order_and_moves():
+    path = serpentine_path(3, 3, step_x=1.0, step_z=2.0)
+    assert len(path) == 9
+    pixels = list(path)
+    assert [(p.z, p.x) for p in pixels] == [
+        (0, 0), (0, 1), (0, 2), (1, 2), (1, 1), (1, 0), (2, 0), (2, 1), (2, 2)]
+    assert [dict(p.move) if p.move else None for p in pixels[2:4]] == [
+        {"z": 2.0}, {"x": -1.0}]
+    assert pixels[-1].move is None
+    # the moves are shared, not one dict per pixel
+    assert pixels[0].move is pixels[6].move
+    with pytest.raises(TypeError):
+        pixels[0].move["x"] = 5.0
+
+
+def test_scheduler_visits_every_pixel_and_keeps_the_stage_in_step():
+    class Stage:
+        def __init__(self):
+            self.position = [0.0, 0.0]
+            self.waits = 0
+
+        def move_relative(self, wait=True, **offsets):
+            self.position[0] += offsets.get("x", 0.0)
+            self.position[1] += offsets.get("z", 0.0)
+
+        def wait_idle(self):
+            self.waits += 1
+
+    stage = Stage()
+    captured, seen = [], []
+    scheduler = RasterScheduler(
+        stage, lambda: captured.append(tuple(stage.position)), lambda: captured[-1],
+        process=[lambda px, pos: seen.append((px, pos))], report_every=0)
+    scheduler.run(serpentine_path(4, 5, step_x=1.0, step_z=1.0))
+
+    assert len(seen) == 20 and scheduler.count == 20
+    # every pixel was triggered at its own stage position
+    assert all(pos == (px.x, px.z) for px, pos in seen)
+    assert set(scheduler.breakdown()) >= {"trigger", "fetch", "total"}
+
+
+def test_project_overlaps_transfer_with_the_move():
+    # transfer shorter than the move: every pixel costs trigger + move
+    assert project(2, 3, trigger=1.0, transfer=0.5, move=2.0) == pytest.approx(
+        2 * 2 * 3.0 + 1 * 3.0 + 1.5)
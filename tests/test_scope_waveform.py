@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""ScopeLink's waveform setup cache."""
+
+from scope_waveform import ScopeLink
+from sim_instruments import SimScope
+
+
+def _link():
+    link = ScopeLink(SimScope(points=100))
+    link.ensure_format("WORD", False)
+    link.preamble(8)
+    return link
+
+
+def test_queries_leave_the_cache_alone():
+    link = _link()
+    for query in (":TIMebase:RANGe?", ":CHANnel8:RANGe?", ":WAVeform:SOURce?"):
+        link.query(query)
+    assert link.cache.source == 8
+    assert 8 in link.cache.preambles
+    assert link.cache.format == ("WORD", 0)
+
+    writes = link.writes
+    link.preamble(8)
+    link.ensure_source(8)
+    assert link.writes == writes
+
+
+def test_setting_commands_still_invalidate():
+    link = _link()
+    link.write(":CHANnel8:RANGe 2")
+    assert 8 not in link.cache.preambles
+    link.preamble(8)
+    link.write(":TIMebase:RANGe 1E-7")
+    assert not link.cache.preambles
+    link.write(":WAVeform:SOURce CHANnel7")
+    assert link.cache.source == 7
+    link.write("*RST")
+    assert link.cache.source is None and link.cache.format is None
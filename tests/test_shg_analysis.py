@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""shg_analysis on a run folder written by RunStore and export_csv."""
+
+import numpy as np
+import pytest
+
+matplotlib = pytest.importorskip("matplotlib")
+matplotlib.use("Agg")
+
+from run_store import RunStore, export_csv
+from scope_waveform import Preamble
+from shg_analysis.extractors import FieldExtractor, MetadataExtractor
+from shg_analysis.pipeline import analyze, load_sweep
+from shg_analysis.reducers import PolarPlot
+
+ANGLES = [0, 45, 90, 135]
+PRE = Preamble(format=1, type=2, points=2000, count=1, xinc=20e-12, xorg=0.0,
+               xref=0.0, yinc=0.01, yorg=0.0, yref=0.0)
+
+
+@pytest.fixture
+def run_folder(tmp_path):
+    """A v1 sweep output folder: the run store plus its CSV copies."""
+    t = np.arange(PRE.points) * PRE.xinc
+    pulse = np.exp(-0.5 * ((t - 20e-9) / 1e-9) ** 2)
+    with RunStore(str(tmp_path), labels=["Ch7 (V)", "Ch8 (V)"]) as store:
+        for a in ANGLES:
+            signal = 100 * np.cos(np.radians(a)) ** 2 * pulse
+            raw = np.rint(np.vstack([pulse * 50, signal])).astype(np.int8)
+            store.append(raw, PRE, A=a, B=0)
+    export_csv(str(tmp_path), filename="B_{B}_A_{A}.csv")
+    return str(tmp_path)
+
+
+def test_name_extractor_reads_the_exported_csv_files(run_folder):
+    sweep = load_sweep(run_folder, FieldExtractor(3, label="angle"), cache=False,
+                       workers=1)
+    assert sorted(sweep.values) == ANGLES
+    assert all(n.endswith(".csv") for n in sweep.names)
+
+
+def test_field_extractor_analysis_of_a_run_folder(run_folder):
+    result = analyze(run_folder, FieldExtractor(3, label="angle"), PolarPlot(),
+                     10e-9, cache=False, workers=1)
+    assert list(result["values"]) == ANGLES
+    assert result["intensities"][0] > 10 * result["intensities"][2]
+
+
+def test_metadata_extractor_reads_the_run_store(run_folder):
+    sweep = load_sweep(run_folder, MetadataExtractor("A"))
+    assert sweep.values == ANGLES
+    assert sweep.names[0] == "record_0"
+    # the same signal as in the CSV copy
+    csv = load_sweep(run_folder, FieldExtractor(3), cache=False, workers=1)
+    i = csv.values.index(90.0)
+    np.testing.assert_allclose(csv.signals[i], sweep.signals[2], atol=1e-6)
+
+
+def test_too_short_baseline_gives_an_actionable_error(run_folder):
+    # the records start at t = 0: 0.5 ps before the baseline end is one sample
+    with pytest.raises(RuntimeError, match="--baseline-end"):
+        analyze(run_folder, FieldExtractor(3, label="angle"), PolarPlot(),
+                0.5e-12, cache=False, workers=1)